@@ -1,21 +1,29 @@
 import os
+import sys
 import uuid
 import json
 import time
+from pathlib import Path
 from dotenv import load_dotenv
 from azure.identity import DefaultAzureCredential
 from azure.ai.projects import AIProjectClient
-from azure.monitor.opentelemetry import configure_azure_monitor
 from opentelemetry import trace
 from opentelemetry.instrumentation.openai_v2 import OpenAIInstrumentor
 
+# Shared helpers from src/tests (tokenizer-based token counts, stream stats, telemetry setup)
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent.parent / "tests"))
+from token_accounting import count_tokens
+from latency_stats import summarize_stream
+from telemetry_config import configure_telemetry
+
 # Load environment and set session ID
 load_dotenv()
 project_endpoint = os.getenv("PROJECT_ENDPOINT")
 model_deployment =  os.getenv("MODEL_DEPLOYMENT")
 tracer = trace.get_tracer(__name__)
 SESSION_ID = str(uuid.uuid4())
-os.environ['OTEL_INSTRUMENTATION_GENAI_CAPTURE_MESSAGE_CONTENT'] = 'true'
+# Set STREAM_RESPONSES=true to stream replies and trace time to first token
+STREAM_RESPONSES = os.getenv("STREAM_RESPONSES", "false").lower() == "true"
 
 # Initialize AI Project
 project_client = AIProjectClient(            
@@ -27,7 +35,7 @@ project_client = AIProjectClient(
 )
 # Configure telemetry and instrument tracing
 ai_conn_str = project_client.telemetry.get_application_insights_connection_string()
-configure_azure_monitor(connection_string=ai_conn_str)
+configure_telemetry(connection_string=ai_conn_str)
 OpenAIInstrumentor().instrument()
 
 # Prepare chat client
@@ -56,25 +64,59 @@ def call_model(system_prompt, user_prompt, span_name):
         span.set_attribute("session.id", SESSION_ID)
         span.set_attribute("prompt.user", user_prompt)
         start_time = time.time()
-
-        response = chat_client.chat.completions.create(
-            model=model_deployment,
-            messages=[
-                { 
-                    "role": "system", 
-                    "content": system_prompt 
-                },
-                { 
-                    "role": "user", 
-                    "content": user_prompt
-                }
-            ]
-        )
+        messages = [
+            { 
+                "role": "system", 
+                "content": system_prompt 
+            },
+            { 
+                "role": "user", 
+                "content": user_prompt
+            }
+        ]
+
+        if STREAM_RESPONSES:
+            # Stream the reply; usage arrives in the last chunk, which has no choices
+            stream = chat_client.chat.completions.create(
+                model=model_deployment,
+                messages=messages,
+                stream=True,
+                stream_options={"include_usage": True}
+            )
+            parts, token_times, usage = [], [], None
+            for chunk in stream:
+                if chunk.usage:
+                    usage = chunk.usage
+                if chunk.choices and chunk.choices[0].delta.content:
+                    token_times.append(time.time())
+                    if len(token_times) == 1:
+                        span.add_event("first_token", {"ttft_s": token_times[0] - start_time})
+                    parts.append(chunk.choices[0].delta.content)
+            end_time = time.time()
+            output = "".join(parts)
+
+            # Time to first token, inter-token latency p50/p95 and output tokens/s,
+            # computed the same way as run_monitoring.py does
+            output_tokens = usage.completion_tokens if usage else len(token_times)
+            stats = summarize_stream(start_time, token_times, end_time, output_tokens)
+            for key, value in stats.items():
+                if value is not None:
+                    span.set_attribute(f"response.{key}", value)
+            span.add_event("stream_complete", {"chunks": len(token_times), "completion_tokens": output_tokens})
+        else:
+            response = chat_client.chat.completions.create(
+                model=model_deployment,
+                messages=messages
+            )
+            output = response.choices[0].message.content
+            usage = response.usage
 
         duration = time.time() - start_time
-        output = response.choices[0].message.content
         span.set_attribute("response.time", duration)
-        span.set_attribute("response.tokens", len(output.split()))
+        span.set_attribute("response.tokens", count_tokens(output, model_deployment or ""))
+        if usage:
+            span.set_attribute("response.prompt_tokens", usage.prompt_tokens)
+            span.set_attribute("response.completion_tokens", usage.completion_tokens)
         return output
 
 # Function to recommend a hike based on user preferences
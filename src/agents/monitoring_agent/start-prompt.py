@@ -1,21 +1,25 @@
 import os
+import sys
 import uuid
 import json
 import time
+from pathlib import Path
 from dotenv import load_dotenv
 from azure.identity import DefaultAzureCredential
 from azure.ai.projects import AIProjectClient
-from azure.monitor.opentelemetry import configure_azure_monitor
 from opentelemetry import trace
 from opentelemetry.instrumentation.openai_v2 import OpenAIInstrumentor
 
+# Shared telemetry setup from src/tests (batching, sampling, content capture)
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent.parent / "tests"))
+from telemetry_config import configure_telemetry
+
 # Load environment and set session ID
 load_dotenv()
 project_endpoint = os.getenv("PROJECT_ENDPOINT")
 model_deployment =  os.getenv("MODEL_DEPLOYMENT")
 tracer = trace.get_tracer(__name__)
 SESSION_ID = str(uuid.uuid4())
-os.environ['OTEL_INSTRUMENTATION_GENAI_CAPTURE_MESSAGE_CONTENT'] = 'true'
 
 # Initialize AI Project
 project_client = AIProjectClient(            
@@ -27,7 +31,7 @@ project_client = AIProjectClient(
 )
 # Configure telemetry and instrument tracing
 ai_conn_str = project_client.telemetry.get_application_insights_connection_string()
-configure_azure_monitor(connection_string=ai_conn_str)
+configure_telemetry(connection_string=ai_conn_str)
 OpenAIInstrumentor().instrument()
 
 # Prepare chat client
@@ -1,14 +1,19 @@
 import os
+import sys
 import uuid
+from pathlib import Path
 from dotenv import load_dotenv
 from azure.identity import DefaultAzureCredential
 from azure.ai.projects import AIProjectClient
 from azure.ai.projects.models import ConnectionType
-from azure.monitor.opentelemetry import configure_azure_monitor
 from opentelemetry import trace
 from opentelemetry.trace import Status, StatusCode
 from opentelemetry.instrumentation.openai_v2 import OpenAIInstrumentor
 
+# Shared telemetry setup from src/tests (batching, sampling, content capture)
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent.parent / "tests"))
+from telemetry_config import configure_telemetry
+
 # Load environment variables from a .env file
 load_dotenv()
 project_endpoint = os.getenv("PROJECT_ENDPOINT")
@@ -20,9 +25,6 @@ tracer = trace.get_tracer(__name__)
 # Generate a session ID for this script execution
 SESSION_ID = str(uuid.uuid4())
 
-# Configure the tracer to include session ID in all spans
-os.environ['OTEL_INSTRUMENTATION_GENAI_CAPTURE_MESSAGE_CONTENT'] = 'true'
-
 # Initialize the project
 project_client = AIProjectClient(            
     credential=DefaultAzureCredential(
@@ -34,7 +36,7 @@ project_client = AIProjectClient(
 
 # Setup OpenTelemetry observability with Azure Monitor
 application_insights_connection_string = project_client.telemetry.get_application_insights_connection_string()
-configure_azure_monitor(connection_string=application_insights_connection_string)
+configure_telemetry(connection_string=application_insights_connection_string)
 OpenAIInstrumentor().instrument()
 
 # Set up the chat completion client
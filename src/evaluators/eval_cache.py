@@ -0,0 +1,107 @@
+"""
+Local state kept between evaluation runs.
+
+Everything lives under .cache/evaluation/ at the repository root (ignored by
+git) as small JSON files, so repeat runs can skip work that has already been
+done in Foundry: uploading an unchanged dataset, re-creating an identical
+evaluation definition, and so on.
+"""
+
+import hashlib
+import json
+import os
+from pathlib import Path
+
+CACHE_DIR = Path(__file__).parent.parent.parent / ".cache" / "evaluation"
+
+
+def file_sha256(path) -> str:
+    """SHA-256 of a file's bytes, read in chunks so large datasets stay cheap."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def content_version(path) -> str:
+    """Short, content-derived version string for a dataset file."""
+    return file_sha256(path)[:12]
+
+
+class JsonManifest:
+    """
+    A dict persisted as one JSON file under CACHE_DIR.
+
+    Reads tolerate a missing or corrupt file (treated as empty); writes go
+    through a temp file so an interrupted run never leaves half a manifest.
+    """
+
+    def __init__(self, filename: str):
+        self.path = CACHE_DIR / filename
+
+    def load(self) -> dict:
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def save(self, data: dict) -> None:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_suffix(".tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f, indent=2)
+        os.replace(tmp_path, self.path)
+
+
+def fingerprint(obj) -> str:
+    """Stable SHA-256 of any JSON-serialisable value (key order does not matter)."""
+    canonical = json.dumps(obj, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+class RowScoreCache:
+    """
+    Per-row scores from earlier runs, keyed by a hash of each row's content.
+
+    The cache is valid for exactly one evaluation fingerprint (criteria,
+    item schema, judge). Loading it under a different fingerprint starts
+    empty, so changing the judge or the criteria re-scores every row.
+
+    Args:
+        manifest: JsonManifest the rows are persisted in
+        definition: Fingerprint of the evaluation the scores came from
+        row_fields: Row columns that make up a row's identity
+    """
+
+    def __init__(self, manifest: JsonManifest, definition: str, row_fields):
+        self.manifest = manifest
+        self.definition = definition
+        self.row_fields = list(row_fields)
+        data = manifest.load()
+        self.invalidated = bool(data) and data.get("definition") != definition
+        self.rows = {} if self.invalidated else data.get("rows", {})
+        self._seen = set()
+
+    def row_key(self, row: dict) -> str:
+        return fingerprint({field: row.get(field) for field in self.row_fields})
+
+    def lookup(self, row: dict):
+        """Cached {metric: score} for a row, or None if it needs scoring."""
+        key = self.row_key(row)
+        self._seen.add(key)
+        entry = self.rows.get(key)
+        return entry["scores"] if entry else None
+
+    def record(self, row: dict, status, scores) -> None:
+        """Remember a freshly scored row; errored rows are retried next time."""
+        if status != "error" and scores:
+            key = self.row_key(row)
+            self._seen.add(key)
+            self.rows[key] = {"scores": dict(scores)}
+
+    def save(self) -> None:
+        """Persist the cache, dropping rows that are no longer in the dataset."""
+        rows = {key: entry for key, entry in self.rows.items() if key in self._seen}
+        self.manifest.save({"definition": self.definition, "rows": rows})
@@ -8,21 +8,58 @@ Runs the full evaluation pipeline:
 4. Retrieves and displays results
 
 Evaluates: Intent Resolution, Relevance, and Groundedness
+
+Set EVAL_MODE=local to skip the Foundry queue and score the dataset on this
+machine instead, calling the judge model directly from a thread pool
+(see local_evaluator.py). Both modes write the same evaluation_results.txt.
+
+Set EVAL_SHARDS=N (cloud mode) to split the dataset into N shards that are
+uploaded and evaluated as N parallel runs, then merged into one summary.
+
+Set LOCAL_OPENAI_BASE_URL (see src/tests/mock_openai_server.py) to run either
+mode offline against a local OpenAI-compatible server; the dataset is then
+uploaded through the plain files API instead of Foundry datasets.
+
+Set EVAL_INCREMENTAL=1 to score only rows that are new or changed since the
+last run; unchanged rows reuse their cached scores (either mode). With
+EVAL_SHARDS in cloud mode, the new or changed rows are split into shards.
+
+Before anything is sent, a token estimate for judging the whole dataset (in
+incremental mode: the new or changed rows) is printed; set TPM_QUOTA to the
+judge deployment's tokens-per-minute quota to also get the minimum run time.
 """
 
 import os
 import sys
+import json
 import time
+import random
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from itertools import chain, islice
 from pathlib import Path
+from types import SimpleNamespace
 from dotenv import load_dotenv
+from azure.core.exceptions import ResourceNotFoundError
 from azure.identity import DefaultAzureCredential
 from azure.ai.projects import AIProjectClient
+from openai import NOT_GIVEN, APIError, NotFoundError, OpenAI
 from openai.types.eval_create_params import DataSourceConfigCustom
 from openai.types.evals.create_eval_jsonl_run_data_source_param import (
     CreateEvalJSONLRunDataSourceParam,
     SourceFileID,
 )
 
+from eval_cache import CACHE_DIR, JsonManifest, RowScoreCache, content_version, fingerprint
+from local_evaluator import LocalEvaluator, iter_jsonl, judge_messages, load_jsonl
+from score_aggregator import PASS_THRESHOLD, SCORE_BUCKETS, ScoreAggregator, item_scores
+from score_analytics import analyze_scores
+
+# Shared helpers from src/tests (tokenizer-based token accounting)
+sys.path.insert(0, str(Path(__file__).parent.parent / "tests"))
+from token_accounting import estimate_batch, format_estimate
+
 # ---------------------------------------------------------------------------
 # Configuration
 # ---------------------------------------------------------------------------
@@ -32,14 +69,91 @@ load_dotenv()  # reads variables from the .env file in your project root
 endpoint              = os.environ.get("AZURE_AI_PROJECT_ENDPOINT")
 model_deployment_name = os.environ.get("MODEL_NAME", "gpt-4.1")
 dataset_name          = "trail-guide-evaluation-dataset"
-dataset_version       = "1"
+
+# Offline runs: a local OpenAI-compatible server stands in for the Foundry project
+local_base_url        = os.environ.get("LOCAL_OPENAI_BASE_URL")
+if local_base_url:
+    endpoint = local_base_url
+
+# "cloud" (default) queues a Foundry evaluation run; "local" scores on this machine
+eval_mode             = os.environ.get("EVAL_MODE", "cloud").lower()
+# Local mode only: max concurrent judge calls, and an optional OpenAI-compatible
+# judge endpoint (defaults to the project's endpoint when not set)
+eval_concurrency      = int(os.environ.get("EVAL_CONCURRENCY", "8"))
+judge_base_url        = os.environ.get("EVAL_JUDGE_BASE_URL")
+judge_api_key         = os.environ.get("EVAL_JUDGE_API_KEY", "not-needed")
+# Cloud mode only: split the dataset into N shards evaluated as N parallel runs,
+# and how many times a failed shard is re-run on its own before giving up
+eval_shards           = int(os.environ.get("EVAL_SHARDS", "1"))
+eval_shard_retries    = int(os.environ.get("EVAL_SHARD_RETRIES", "2"))
+# Only score rows that are new or changed since the last run
+eval_incremental      = os.environ.get("EVAL_INCREMENTAL", "").lower() in ("1", "true", "yes")
+
+DATASET_PATH = (
+    Path(__file__).parent.parent.parent
+    / "data"
+    / "trail_guide_evaluation_dataset.jsonl"
+)
+
+# The dataset version is derived from the file contents, so an edited file is
+# always uploaded as a new version and an unchanged file is never re-uploaded.
+dataset_version = content_version(DATASET_PATH) if DATASET_PATH.exists() else None
+
+# Remembers which dataset versions this machine has already uploaded, per
+# project, so repeat runs need no upload traffic at all.
+# Delete .cache/evaluation/datasets.json to force a fresh lookup in Foundry.
+DATASET_MANIFEST = JsonManifest("datasets.json")
+_manifest_lock = threading.Lock()
+
+# Evaluation definitions are reused across runs: fingerprint -> eval ID, per project
+EVAL_DEFINITION_CACHE = JsonManifest("eval_definitions.json")
+EVAL_NAME = "Trail Guide Quality Evaluation"
+# How many of the project's most recent evals to scan for a matching fingerprint
+EVAL_LOOKUP_LIMIT = int(os.environ.get("EVAL_LOOKUP_LIMIT", "200"))
+
+# Incremental mode: row content hash -> scores from earlier runs. The whole file
+# is discarded when the criteria or the judge change. Delete it to re-score everything.
+ROW_SCORE_MANIFEST = JsonManifest("row_scores.json")
+
+# Pre-flight estimate: judge output tokens per (row, criterion) and the judge
+# deployment's tokens-per-minute quota (unset = no time estimate)
+JUDGE_COMPLETION_TOKENS = int(os.environ.get("EVAL_JUDGE_COMPLETION_TOKENS", "60"))
+TPM_QUOTA          = int(os.environ.get("TPM_QUOTA", "0")) or None
+
+# Polling: start fast, back off while the run is queued, give up after the deadline.
+# Set EVAL_STREAM_RESULTS=1 to print each item's scores as soon as it is scored.
+POLL_INITIAL_S     = float(os.environ.get("EVAL_POLL_INITIAL_S", "2"))
+POLL_MAX_S         = float(os.environ.get("EVAL_POLL_MAX_S", "30"))
+POLL_DEADLINE_S    = float(os.environ.get("EVAL_POLL_DEADLINE_S", str(2 * 60 * 60)))
+STREAM_RESULTS     = os.environ.get("EVAL_STREAM_RESULTS", "").lower() in ("1", "true", "yes")
+
+# Optional JSONL file that receives every raw output item while results stream in
+SPILL_FILE = os.environ.get("EVAL_SPILL_FILE")
+
+# Bootstrap confidence intervals for mean score and pass rate
+BOOTSTRAP_SAMPLES  = int(os.environ.get("EVAL_BOOTSTRAP_SAMPLES", "2000"))
+CONFIDENCE_LEVEL   = float(os.environ.get("EVAL_CONFIDENCE_LEVEL", "0.95"))
+
+# Metrics reported in the summary, in display order
+METRIC_LABELS = {
+    "intent_resolution": "Intent Resolution",
+    "relevance":         "Relevance        ",
+    "groundedness":      "Groundedness     ",
+}
 
 # The script writes a plain-text summary here when it finishes.
 # This file is committed to the branch so the GitHub Actions workflow
 # can read it and post results as a PR comment — no re-running needed.
 RESULTS_FILE = Path("evaluation_results.txt")
+# Machine-readable version of the same results (percentiles, distributions, CIs)
+RESULTS_JSON_FILE = RESULTS_FILE.with_suffix(".json")
 
-if not endpoint:
+if eval_mode not in ("cloud", "local"):
+    print(f"ERROR: EVAL_MODE must be 'cloud' or 'local', got '{eval_mode}'.")
+    sys.exit(1)
+
+# A local run against a custom judge endpoint is the only mode without Foundry
+if not endpoint and not (eval_mode == "local" and judge_base_url):
     print("ERROR: AZURE_AI_PROJECT_ENDPOINT is not set.")
     print("       Add it to your .env file and try again.")
     sys.exit(1)
@@ -52,10 +166,65 @@ if not endpoint:
 project_client = AIProjectClient(
     endpoint=endpoint,
     credential=DefaultAzureCredential(),
-)
+) if endpoint and not local_base_url else None
 
 # The OpenAI-compatible client exposes the Evals API
-client = project_client.get_openai_client()
+if local_base_url:
+    client = OpenAI(base_url=local_base_url, api_key=os.environ.get("LOCAL_OPENAI_API_KEY", "not-needed"))
+else:
+    client = project_client.get_openai_client() if project_client else None
+
+
+# ---------------------------------------------------------------------------
+# Evaluation criteria (shared by the cloud and local engines)
+# ---------------------------------------------------------------------------
+
+# The shape of each record in the dataset
+ITEM_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "query":        {"type": "string"},
+        "response":     {"type": "string"},
+        "ground_truth": {"type": "string"},
+    },
+    "required": ["query", "response", "ground_truth"],
+}
+
+# Each entry names a built-in evaluator and maps dataset columns to its
+# expected parameters using the {{item.<column>}} template syntax.
+TESTING_CRITERIA = [
+    {
+        "type": "azure_ai_evaluator",
+        "name": "intent_resolution",
+        "evaluator_name": "builtin.intent_resolution",
+        "initialization_parameters": {"deployment_name": model_deployment_name},
+        "data_mapping": {
+            "query":    "{{item.query}}",
+            "response": "{{item.response}}",
+        },
+    },
+    {
+        "type": "azure_ai_evaluator",
+        "name": "relevance",
+        "evaluator_name": "builtin.relevance",
+        "initialization_parameters": {"deployment_name": model_deployment_name},
+        "data_mapping": {
+            "query":    "{{item.query}}",
+            "response": "{{item.response}}",
+        },
+    },
+    {
+        "type": "azure_ai_evaluator",
+        "name": "groundedness",
+        "evaluator_name": "builtin.groundedness",
+        "initialization_parameters": {"deployment_name": model_deployment_name},
+        "data_mapping": {
+            "query":    "{{item.query}}",
+            "response": "{{item.response}}",
+            "context":  "{{item.ground_truth}}",
+        },
+    },
+]
 
 
 # ---------------------------------------------------------------------------
@@ -81,46 +250,67 @@ def upload_dataset() -> str:
       - query        : the user question sent to the agent
       - response     : the agent's answer
       - ground_truth : the expected correct answer (used by some evaluators)
+
+    The version is a content hash of the file. Before uploading, the local
+    manifest and then a single datasets.get() lookup are checked, so an
+    unchanged file is never uploaded twice.
     """
     section("Step 1: Uploading evaluation dataset")
 
-    dataset_path = (
-        Path(__file__).parent.parent.parent
-        / "data"
-        / "trail_guide_evaluation_dataset.jsonl"
-    )
-
-    if not dataset_path.exists():
+    if not DATASET_PATH.exists():
         raise FileNotFoundError(
-            f"Dataset not found at {dataset_path}.\n"
+            f"Dataset not found at {DATASET_PATH}.\n"
             "Make sure you are running the script from the repository root."
         )
 
-    print(f"\nDataset: {dataset_path.name}")
-    print("Uploading...")
+    return upload_dataset_file(DATASET_PATH, dataset_name)
 
-    try:
-        data_id = project_client.datasets.upload_file(
-            name=dataset_name,
-            version=dataset_version,
-            file_path=str(dataset_path),
-        ).id
-        print(f"\n✓ Dataset uploaded successfully")
-
-    except Exception as upload_error:
-        # If this version was already uploaded in a previous run, reuse it.
-        # Foundry does not allow uploading the same name+version twice.
-        if "already exists" in str(upload_error):
-            print(f"\n  Dataset version {dataset_version} already exists in Foundry.")
-            print(f"  Retrieving existing dataset ID...")
-            dataset_obj = project_client.datasets.get(name=dataset_name, version=dataset_version)
-            data_id = dataset_obj.id
-            print(f"  ✓ Using existing dataset")
-        else:
-            # Any other upload error is unexpected — re-raise so main() catches it
-            raise
 
-    print(f"  Dataset ID: {data_id}")
+def upload_dataset_file(path: Path, name: str) -> str:
+    """
+    Upload one JSONL file as dataset `name`, versioned by its content hash,
+    unless the local manifest or Foundry already has that version.
+
+    The report for the file is printed in one piece once the upload is done,
+    so parallel shard uploads don't interleave each other's lines.
+    """
+    version = content_version(path)
+    report = [f"\nDataset: {path.name}", f"  Version (content hash): {version}"]
+
+    if local_base_url:
+        # The local server keeps files in memory only, so always upload (and don't record it)
+        with open(path, "rb") as f:
+            data_id = client.files.create(file=f, purpose="evals").id
+        report += ["\n✓ Dataset uploaded to local server", f"  Dataset ID: {data_id}"]
+        print("\n".join(report) + "\n", end="")
+        return data_id
+
+    data_id = DATASET_MANIFEST.load().get(endpoint, {}).get(name, {}).get(version)
+    if data_id:
+        # Uploaded from this machine before — no network call needed
+        report.append("\n✓ Dataset unchanged since last upload (local manifest)")
+    else:
+        try:
+            # Cheap lookup: has this exact content already been uploaded?
+            data_id = project_client.datasets.get(name=name, version=version).id
+            report.append("\n✓ Dataset version already exists in Foundry")
+        except ResourceNotFoundError:
+            print(f"Uploading {path.name}...")
+            data_id = project_client.datasets.upload_file(
+                name=name,
+                version=version,
+                file_path=str(path),
+            ).id
+            report.append("\n✓ Dataset uploaded successfully")
+
+        # Re-load right before saving so parallel shard uploads keep each other's entries
+        with _manifest_lock:
+            manifest = DATASET_MANIFEST.load()
+            manifest.setdefault(endpoint, {}).setdefault(name, {})[version] = data_id
+            DATASET_MANIFEST.save(manifest)
+
+    report.append(f"  Dataset ID: {data_id}")
+    print("\n".join(report) + "\n", end="")
     return data_id
 
 
@@ -128,80 +318,82 @@ def upload_dataset() -> str:
 # Step 2 – Create the evaluation definition
 # ---------------------------------------------------------------------------
 
+def definition_fingerprint() -> str:
+    """Hash of everything that makes two evaluation definitions equivalent."""
+    return fingerprint({
+        "item_schema":      ITEM_SCHEMA,
+        "testing_criteria": TESTING_CRITERIA,
+        "judge":            model_deployment_name,
+    })
+
+
+def find_evaluation_definition(definition_id: str):
+    """
+    Return an existing eval whose definition fingerprint matches, or None.
+
+    Checks the local fingerprint -> eval ID cache first (one retrieve call),
+    then the metadata of the project's most recent evals.
+    """
+    cached_id = EVAL_DEFINITION_CACHE.load().get(endpoint, {}).get(definition_id)
+    if cached_id:
+        try:
+            return client.evals.retrieve(cached_id)
+        except NotFoundError:
+            print(f"  Cached evaluation {cached_id} no longer exists in the project")
+
+    for eval_object in islice(client.evals.list(order="desc"), EVAL_LOOKUP_LIMIT):
+        if (eval_object.metadata or {}).get("definition_fingerprint") == definition_id:
+            return eval_object
+    return None
+
+
 def create_evaluation_definition():
     """
-    Register an evaluation definition in Foundry.
+    Register an evaluation definition in Foundry, or reuse an identical one.
 
     This tells the platform:
       - What data schema to expect (query / response / ground_truth)
       - Which built-in evaluators to run and how to map dataset fields to them
 
+    The definition is fingerprinted by (item schema, testing criteria, judge
+    deployment) and stored in the eval's metadata. If an eval with the same
+    fingerprint already exists it is reused, so each run only creates a new
+    run rather than another identical eval.
+
     Returns the evaluation object (its ID is needed in later steps).
     """
-    section("Step 2: Creating evaluation definition")
+    section("Step 2: Preparing evaluation definition")
 
     print(f"\nConfiguration:")
     print(f"  Judge Model: {model_deployment_name}")
     print(f"  Evaluators: Intent Resolution, Relevance, Groundedness")
 
-    # Tell Foundry the shape of each record in the dataset
-    data_source_config = DataSourceConfigCustom(
-        type="custom",
-        item_schema={
-            "type": "object",
-            "properties": {
-                "query":        {"type": "string"},
-                "response":     {"type": "string"},
-                "ground_truth": {"type": "string"},
-            },
-            "required": ["query", "response", "ground_truth"],
-        },
-    )
+    definition_id = definition_fingerprint()
+    print(f"  Fingerprint: {definition_id[:12]}")
+
+    eval_object = find_evaluation_definition(definition_id)
+    if eval_object:
+        print(f"\n✓ Reusing existing evaluation definition")
+    else:
+        # Tell Foundry the shape of each record in the dataset
+        data_source_config = DataSourceConfigCustom(
+            type="custom",
+            item_schema=ITEM_SCHEMA,
+        )
 
-    # Each entry names a built-in evaluator and maps dataset columns to its
-    # expected parameters using the {{item.<column>}} template syntax.
-    testing_criteria = [
-        {
-            "type": "azure_ai_evaluator",
-            "name": "intent_resolution",
-            "evaluator_name": "builtin.intent_resolution",
-            "initialization_parameters": {"deployment_name": model_deployment_name},
-            "data_mapping": {
-                "query":    "{{item.query}}",
-                "response": "{{item.response}}",
-            },
-        },
-        {
-            "type": "azure_ai_evaluator",
-            "name": "relevance",
-            "evaluator_name": "builtin.relevance",
-            "initialization_parameters": {"deployment_name": model_deployment_name},
-            "data_mapping": {
-                "query":    "{{item.query}}",
-                "response": "{{item.response}}",
-            },
-        },
-        {
-            "type": "azure_ai_evaluator",
-            "name": "groundedness",
-            "evaluator_name": "builtin.groundedness",
-            "initialization_parameters": {"deployment_name": model_deployment_name},
-            "data_mapping": {
-                "query":    "{{item.query}}",
-                "response": "{{item.response}}",
-                "context":  "{{item.ground_truth}}",
-            },
-        },
-    ]
+        print("\nCreating evaluation...")
+        eval_object = client.evals.create(
+            name=EVAL_NAME,
+            data_source_config=data_source_config,
+            testing_criteria=TESTING_CRITERIA,
+            metadata={"definition_fingerprint": definition_id},
+        )
+        print(f"\n✓ Evaluation definition created")
 
-    print("\nCreating evaluation...")
-    eval_object = client.evals.create(
-        name="Trail Guide Quality Evaluation",
-        data_source_config=data_source_config,
-        testing_criteria=testing_criteria,
-    )
+    cache = EVAL_DEFINITION_CACHE.load()
+    cache.setdefault(endpoint, {})[definition_id] = eval_object.id
+    EVAL_DEFINITION_CACHE.save(cache)
 
-    print(f"\n✓ Evaluation definition created")
     print(f"  Evaluation ID: {eval_object.id}")
     return eval_object
 
@@ -219,9 +411,20 @@ def run_evaluation(eval_object, data_id):
     """
     section("Step 3: Running cloud evaluation")
 
-    eval_run = client.evals.runs.create(
+    eval_run = start_run(eval_object, data_id)
+
+    print(f"\n✓ Evaluation run started")
+    print(f"  Run ID: {eval_run.id}")
+    print(f"  Status: {eval_run.status}")
+    print(f"\nThis may take 15-60+ minutes for 89 items depending on capacity and quota...")
+    return eval_run
+
+
+def start_run(eval_object, data_id, name="trail-guide-baseline-eval"):
+    """Create one evaluation run over an uploaded dataset."""
+    return client.evals.runs.create(
         eval_id=eval_object.id,
-        name="trail-guide-baseline-eval",
+        name=name,
         data_source=CreateEvalJSONLRunDataSourceParam(
             type="jsonl",
             source=SourceFileID(
@@ -231,27 +434,78 @@ def run_evaluation(eval_object, data_id):
         ),
     )
 
-    print(f"\n✓ Evaluation run started")
-    print(f"  Run ID: {eval_run.id}")
-    print(f"  Status: {eval_run.status}")
-    print(f"\nThis may take 15-60+ minutes for 89 items depending on capacity and quota...")
-    return eval_run
-
 
 # ---------------------------------------------------------------------------
 # Step 4 – Poll until the run finishes
 # ---------------------------------------------------------------------------
 
-def poll_for_results(eval_object, eval_run):
+def count_dataset_rows(path: Path = DATASET_PATH) -> int:
+    """Number of records in the dataset (used for progress and ETA)."""
+    with open(path, "r", encoding="utf-8") as f:
+        return sum(1 for line in f if line.strip())
+
+
+def stream_new_output_items(eval_object, run, after=None):
     """
-    Repeatedly check the run status every 10 seconds until it is 'completed'.
+    Print output items scored since the `after` cursor and return the new cursor.
+
+    Items are listed oldest first, so the ID of the last one printed is the
+    cursor for the next poll.
+    """
+    printed = False
+    for item in client.evals.runs.output_items.list(
+        run_id=run.id,
+        eval_id=eval_object.id,
+        order="asc",
+        after=after if after else NOT_GIVEN,
+    ):
+        if not printed:
+            # End the \r progress line before the first item row
+            print()
+            printed = True
+        after = item.id
+        row = getattr(item, "datasource_item_id", "?")
+        if getattr(item, "status", None) == "error":
+            print(f"    item {row}: error")
+        else:
+            scores = "  ".join(f"{name}={score:g}" for name, score in item_scores(item))
+            print(f"    item {row}: {scores or 'no scores'}")
+    return after
+
+
+def _next_poll_delay(delay, made_progress, eta):
+    """
+    Exponential backoff while the run is queued or stalled; once items are
+    completing, poll at roughly a quarter of the remaining ETA so the end of
+    the run is noticed quickly. Jitter avoids synchronised polling.
+    """
+    if made_progress and eta is not None:
+        delay = eta / 4
+    elif not made_progress:
+        delay = delay * 2
+    delay = min(max(delay, POLL_INITIAL_S), POLL_MAX_S)
+    return delay, delay * random.uniform(0.8, 1.2)
+
+
+def poll_for_results(eval_object, eval_run, expected_items=None):
+    """
+    Poll the run with adaptive backoff until it is 'completed'.
+
+    Progress (items done / total and an ETA) is shown from the run's
+    result_counts. With EVAL_STREAM_RESULTS=1 each item's scores are printed
+    as soon as Foundry has scored it.
 
     Returns the final run object (which contains the report URL and results).
-    Exits with code 1 if the run fails so CI pipelines surface the error.
+    Raises if the run fails or POLL_DEADLINE_S passes, so main() writes
+    RESULTS_FILE and exits with code 1 for CI pipelines.
     """
     section("Step 4: Polling for completion")
+    print(f"\n  Polling every {POLL_INITIAL_S:g}-{POLL_MAX_S:g}s, deadline {POLL_DEADLINE_S:g}s")
 
     start_time = time.time()
+    delay = POLL_INITIAL_S
+    last_done = 0
+    cursor = None
     while True:
         run = client.evals.runs.retrieve(
             run_id=eval_run.id,
@@ -260,23 +514,46 @@ def poll_for_results(eval_object, eval_run):
 
         elapsed = int(time.time() - start_time)
 
+        if STREAM_RESULTS and run.status in ("in_progress", "completed"):
+            cursor = stream_new_output_items(eval_object, run, cursor)
+
         if run.status == "completed":
             print(f"\n\n✓ Evaluation completed in {elapsed} seconds")
             break
-        elif run.status == "failed":
+        elif run.status in ("failed", "canceled"):
             # Raise so main() catches it, writes RESULTS_FILE, then exits
             error_detail = getattr(run, "error", None) or "No additional details available."
             raise RuntimeError(
-                f"Evaluation run failed after {elapsed}s.\n"
+                f"Evaluation run {run.status} after {elapsed}s.\n"
                 f"  Eval ID : {eval_object.id}\n"
                 f"  Run ID  : {eval_run.id}\n"
                 f"  Error   : {error_detail}\n"
                 f"  To inspect: open Azure AI Foundry portal > Evaluations"
             )
-        else:
-            # Overwrite the same line so the terminal isn't flooded
-            print(f"  [{elapsed}s] Status: {run.status}", end="\r", flush=True)
-            time.sleep(10)
+        elif elapsed >= POLL_DEADLINE_S:
+            raise TimeoutError(
+                f"Evaluation run still '{run.status}' after {elapsed}s "
+                f"(EVAL_POLL_DEADLINE_S={POLL_DEADLINE_S:g}).\n"
+                f"  Eval ID : {eval_object.id}\n"
+                f"  Run ID  : {eval_run.id}\n"
+                f"  The run keeps going in Foundry: open Azure AI Foundry portal > Evaluations"
+            )
+
+        counts = getattr(run, "result_counts", None)
+        done = (counts.passed + counts.failed + counts.errored) if counts else 0
+        total = expected_items or (counts.total if counts else 0)
+        eta = None
+        if 0 < done < total:
+            eta = (time.time() - start_time) / done * (total - done)
+
+        progress = f"{done}/{total} items" if total else "waiting for items"
+        eta_text = f" | ETA ~{int(eta)}s" if eta is not None else ""
+        # Overwrite the same line so the terminal isn't flooded
+        print(f"  [{elapsed}s] Status: {run.status} | {progress}{eta_text}    ", end="\r", flush=True)
+
+        delay, sleep_for = _next_poll_delay(delay, done > last_done, eta)
+        last_done = done
+        time.sleep(min(sleep_for, max(POLL_DEADLINE_S - elapsed, 0) + 1))
 
     return run
 
@@ -285,7 +562,7 @@ def poll_for_results(eval_object, eval_run):
 # Step 5 – Collect scores and save results
 # ---------------------------------------------------------------------------
 
-def retrieve_and_display_results(eval_object, run):
+def retrieve_and_display_results(eval_object, *runs, cached_items=(), on_item=None):
     """
     Fetch per-item evaluator outputs, compute aggregate statistics, print a
     human-readable summary, and write the same summary to RESULTS_FILE.
@@ -295,89 +572,134 @@ def retrieve_and_display_results(eval_object, run):
     The written file is intended to be committed to the branch so the
     GitHub Actions workflow can read it without re-running the evaluation.
 
-    Returns the raw list of output items for any further inspection.
+    Items are consumed in a single streaming pass over the paginated list, so
+    memory stays flat however large the run is. Set EVAL_SPILL_FILE to keep
+    every raw item in a JSONL file.
+
+    Pass several runs (sharded mode) to merge their items into one summary.
+    cached_items (incremental mode) are merged in as well, and on_item is
+    called with every item fetched from the run(s).
+
+    Returns the ScoreAggregator holding the per-metric aggregates.
     """
     section("Step 5: Retrieving results")
 
-    print(f"\nEvaluation Summary")
-
-    # Retrieve every scored item from the run
-    output_items = list(
-        client.evals.runs.output_items.list(
-            run_id=run.id,
-            eval_id=eval_object.id,
+    # Stream every scored item from the run(s); pages are fetched lazily
+    with ScoreAggregator(METRIC_LABELS, spill_path=SPILL_FILE) as aggregator:
+        aggregator.consume(cached_items)
+        for item in chain.from_iterable(
+            client.evals.runs.output_items.list(
+                run_id=run.id,
+                eval_id=eval_object.id,
+                limit=100,
+            )
+            for run in runs
+        ):
+            aggregator.add(item)
+            if on_item:
+                on_item(item)
+
+    if len(runs) == 1:
+        run_label = runs[0].id
+        report_url = getattr(runs[0], "report_url", None) or (
+            f"{endpoint.rstrip('/')}/evaluations/{eval_object.id}/runs/{runs[0].id}"
         )
-    )
+    else:
+        run_label = f"{len(runs)} shard runs ({', '.join(run.id for run in runs)})"
+        report_url = f"{endpoint.rstrip('/')}/evaluations/{eval_object.id}"
 
-    # Separate items by status so we can report errors alongside scores
-    errored_items = [
-        item for item in output_items
-        if getattr(item, "status", None) == "error"
-    ]
-    scored_items = [
-        item for item in output_items
-        if getattr(item, "status", None) != "error"
-    ]
+    write_summary(eval_object.id, run_label, aggregator)
 
-    if errored_items:
-        print(f"\n  ⚠ {len(errored_items)} item(s) errored during evaluation.")
-        print(f"    First error: {getattr(errored_items[0], 'error', 'details unavailable')}")
-        print(f"    Open Azure AI Foundry portal > Evaluations to inspect all failed items.")
+    # Emit report_url as a GitHub Actions step output when running in CI
+    github_output = os.environ.get("GITHUB_OUTPUT")
+    if github_output:
+        with open(github_output, "a", encoding="utf-8") as gh_out:
+            gh_out.write(f"report_url={report_url}\n")
+        print(f"  GitHub Actions output set: report_url={report_url}")
+
+    return aggregator
 
-    # Collect individual scores grouped by metric name
-    scores: dict[str, list[float]] = {
-        "intent_resolution": [],
-        "relevance":         [],
-        "groundedness":      [],
-    }
 
-    for item in scored_items:
-        if hasattr(item, "evaluator_outputs"):
-            for output in item.evaluator_outputs:
-                if output.name in scores and hasattr(output, "score"):
-                    scores[output.name].append(output.score)
+def write_summary(eval_id, run_id, aggregator) -> str:
+    """
+    Print the summary held by a ScoreAggregator and write it to RESULTS_FILE.
+
+    The aggregator may have been fed by the cloud run or by the local engine;
+    both produce items with status, error and per-metric scores.
+    """
+    print(f"\nEvaluation Summary")
+
+    if aggregator.errored_items:
+        print(f"\n  ⚠ {aggregator.errored_items} item(s) errored during evaluation.")
+        print(f"    First error: {aggregator.first_error}")
+        print(f"    Open Azure AI Foundry portal > Evaluations to inspect all failed items.")
+    if aggregator.spill_path:
+        print(f"\n  Raw output items written to {aggregator.spill_path}")
 
     # --- Build summary text (printed to console and written to file) ---
     # Everything written to `lines` ends up both on screen and in the file,
     # so the file always has useful content regardless of whether scores loaded.
 
-    metric_labels = {
-        "intent_resolution": "Intent Resolution",
-        "relevance":         "Relevance        ",
-        "groundedness":      "Groundedness     ",
-    }
-
     lines = [
         "=" * 80,
         " Trail Guide Agent - Evaluation Results",
         "=" * 80,
-        f"\n  Eval ID      : {eval_object.id}",
-        f"  Run ID       : {run.id}",
-        f"  Total items  : {len(output_items)}",
-        f"  Errored items: {len(errored_items)}",
-        f"  Scored items : {len(scored_items)}",
+        f"\n  Eval ID      : {eval_id}",
+        f"  Run ID       : {run_id}",
+        f"  Total items  : {aggregator.total_items}",
+        f"  Errored items: {aggregator.errored_items}",
+        f"  Scored items : {aggregator.scored_items}",
         "\nAverage Scores (1-5 scale, threshold: 3)",
     ]
 
     any_scores = False
     pass_lines = ["\nPass Rates (score >= 3)"]
+    histogram_lines = ["\nScore Distribution (items per rounded score)"]
 
-    for key, label in metric_labels.items():
-        values = scores[key]
-        if values:
+    for key, label in METRIC_LABELS.items():
+        stats = aggregator.metrics[key]
+        if stats.count:
             any_scores = True
-            avg  = sum(values) / len(values)
-            rate = sum(1 for v in values if v >= 3) / len(values) * 100
-            lines.append(f"  {label}: {avg:.2f} (n={len(values)})")
-            pass_lines.append(f"  {label}: {rate:.1f}%")
+            lines.append(f"  {label}: {stats.mean:.2f} (n={stats.count})")
+            pass_lines.append(f"  {label}: {stats.pass_rate:.1f}%")
+            histogram_lines.append(
+                f"  {label}: " + "  ".join(f"{b}:{stats.histogram[b]}" for b in SCORE_BUCKETS)
+            )
 
     if not any_scores:
         # Scores missing — the evaluation may have completed but returned no
-        # evaluator_outputs. Open the Report URL above to inspect in the portal.
+        # evaluator outputs. Open the Report URL above to inspect in the portal.
         lines.append("  No scores returned — open Azure AI Foundry portal > Evaluations for details.")
         pass_lines.append("  No scores returned.")
+        histogram_lines = []
 
     lines.extend(pass_lines)
+    lines.extend(histogram_lines)
+
+    # Percentiles and bootstrap confidence intervals, from each metric's score counts
+    analytics = analyze_scores(
+        aggregator.analytics_inputs(),
+        samples=BOOTSTRAP_SAMPLES,
+        confidence=CONFIDENCE_LEVEL,
+    )
+    if any_scores:
+        lines.append(
+            f"\nScore Statistics ({CONFIDENCE_LEVEL:.0%} bootstrap CI, "
+            f"{BOOTSTRAP_SAMPLES} resamples)"
+        )
+        for key, label in METRIC_LABELS.items():
+            stats = analytics["metrics"][key]
+            if stats:
+                p = stats["percentiles"]
+                lines.append(
+                    f"  {label}: mean {stats['mean']:.2f} "
+                    f"[{stats['mean_ci'][0]:.2f}, {stats['mean_ci'][1]:.2f}] | "
+                    f"pass {stats['pass_rate']:.1f}% "
+                    f"[{stats['pass_rate_ci'][0]:.1f}, {stats['pass_rate_ci'][1]:.1f}] | "
+                    f"p5/p25/p50/p75/p95 "
+                    f"{p['p5']:g}/{p['p25']:g}/{p['p50']:g}/{p['p75']:g}/{p['p95']:g}"
+                )
+
     summary = "\n".join(lines)
 
     print(summary)
@@ -387,37 +709,451 @@ def retrieve_and_display_results(eval_object, run):
     print(f"\n  Results saved to {RESULTS_FILE}")
     print(f"  Commit this file so the GitHub Actions workflow can read it.")
 
-    # Emit report_url as a GitHub Actions step output when running in CI
-    report_url = getattr(run, "report_url", None) or (
-        f"{endpoint.rstrip('/')}/evaluations/{eval_object.id}/runs/{run.id}"
+    RESULTS_JSON_FILE.write_text(json.dumps({
+        "eval_id":       eval_id,
+        "run_id":        run_id,
+        "total_items":   aggregator.total_items,
+        "errored_items": aggregator.errored_items,
+        "scored_items":  aggregator.scored_items,
+        **analytics,
+    }, indent=2), encoding="utf-8")
+    print(f"  Machine-readable results saved to {RESULTS_JSON_FILE}")
+
+    return summary
+
+
+# ---------------------------------------------------------------------------
+# Local mode – score the dataset on this machine
+# ---------------------------------------------------------------------------
+
+def run_local_evaluation(items=None, cached_items=(), on_item=None):
+    """
+    Score the dataset locally with the same TESTING_CRITERIA as the cloud run.
+
+    Judge calls go to EVAL_JUDGE_BASE_URL when set (any OpenAI-compatible
+    server, e.g. a local stand-in), otherwise to the project's endpoint.
+    At most EVAL_CONCURRENCY judge calls are in flight at once.
+
+    Incremental mode passes only the rows to score as items, the reused
+    scores as cached_items, and an on_item callback for every new result.
+    """
+    if items is None:
+        section("Step 1: Loading evaluation dataset")
+
+        if not DATASET_PATH.exists():
+            raise FileNotFoundError(
+                f"Dataset not found at {DATASET_PATH}.\n"
+                "Make sure you are running the script from the repository root."
+            )
+        items = load_jsonl(DATASET_PATH)
+        print(f"\nDataset: {DATASET_PATH.name} ({len(items)} items)")
+
+    section("Steps 2-4: Scoring locally with the judge model")
+
+    if judge_base_url:
+        judge_client = OpenAI(base_url=judge_base_url, api_key=judge_api_key)
+    else:
+        judge_client = client
+    print(f"\n  Judge endpoint: {judge_base_url or endpoint}")
+    print(f"  Judge model   : {model_deployment_name}")
+    print(f"  Concurrency   : {eval_concurrency}")
+
+    evaluator = LocalEvaluator(
+        judge_client,
+        model_deployment_name,
+        TESTING_CRITERIA,
+        max_workers=eval_concurrency,
     )
-    github_output = os.environ.get("GITHUB_OUTPUT")
-    if github_output:
-        with open(github_output, "a", encoding="utf-8") as gh_out:
-            gh_out.write(f"report_url={report_url}\n")
-        print(f"  GitHub Actions output set: report_url={report_url}")
 
-    return output_items
+    start_time = time.time()
+
+    with ScoreAggregator(METRIC_LABELS, spill_path=SPILL_FILE) as aggregator:
+        aggregator.consume(cached_items)
+
+        def on_result(index, item):
+            aggregator.add(item)
+            if on_item:
+                on_item(item)
+            print(f"  [{int(time.time() - start_time)}s] Scored {index + 1}/{len(items)}", end="\r", flush=True)
+
+        evaluator.evaluate(items, on_result=on_result)
+    print(f"\n\n✓ Local evaluation completed in {int(time.time() - start_time)} seconds")
+
+    section("Step 5: Summarizing results")
+    run_id = f"local-{datetime.now().strftime('%Y%m%d-%H%M%S')}"
+    write_summary("local", run_id, aggregator)
+    return aggregator
+
+
+# ---------------------------------------------------------------------------
+# Sharded mode – split the dataset across parallel cloud runs
+# ---------------------------------------------------------------------------
+
+def write_shards(shard_count: int, path: Path = DATASET_PATH) -> list[Path]:
+    """
+    Split a JSONL dataset (by default the whole dataset) into shard_count
+    contiguous files under CACHE_DIR.
+
+    Lines are streamed, never loaded all at once. Shard files are named after
+    the dataset's content hash; shards with unchanged content keep their
+    upload version, so re-running with the same data uploads nothing.
+    """
+    total = count_dataset_rows(path)
+    per_shard = -(-total // shard_count)  # ceiling division
+    version = dataset_version if path == DATASET_PATH else content_version(path)
+    shard_dir = CACHE_DIR / "shards"
+    shard_dir.mkdir(parents=True, exist_ok=True)
+
+    paths = [
+        shard_dir / f"{version}-{i + 1}-of-{shard_count}.jsonl"
+        for i in range(shard_count)
+    ]
+    files = [open(shard_path, "w", encoding="utf-8") for shard_path in paths]
+    try:
+        with open(path, "r", encoding="utf-8") as source:
+            rows = (line for line in source if line.strip())
+            for index, line in enumerate(rows):
+                files[index // per_shard].write(line if line.endswith("\n") else line + "\n")
+    finally:
+        for f in files:
+            f.close()
+
+    # Fewer rows than shards leaves trailing files empty; don't upload those
+    return [shard_path for shard_path in paths if shard_path.stat().st_size > 0]
+
+
+def poll_shard_runs(eval_object, shard_runs: dict, expected_items=None) -> dict:
+    """
+    Poll several runs together with the same adaptive backoff as
+    poll_for_results().
+
+    Args:
+        shard_runs: shard index -> run object
+
+    Returns shard index -> final run object. Failed or canceled shards are
+    returned rather than raised, so the caller can re-run just those.
+    """
+    start_time = time.time()
+    delay = POLL_INITIAL_S
+    last_done = 0
+    pending = dict(shard_runs)
+    finished = {}
+    done_items = {}
+    cursors = {}
+
+    while True:
+        for shard, run in list(pending.items()):
+            run = client.evals.runs.retrieve(run_id=run.id, eval_id=eval_object.id)
+            if STREAM_RESULTS and run.status in ("in_progress", "completed"):
+                cursors[shard] = stream_new_output_items(eval_object, run, cursors.get(shard))
+
+            counts = getattr(run, "result_counts", None)
+            done_items[shard] = (counts.passed + counts.failed + counts.errored) if counts else 0
+
+            if run.status in ("completed", "failed", "canceled"):
+                del pending[shard]
+                finished[shard] = run
+                print(f"\n  Shard {shard + 1}: {run.status} (run {run.id})")
+
+        elapsed = int(time.time() - start_time)
+        if not pending:
+            break
+        if elapsed >= POLL_DEADLINE_S:
+            raise TimeoutError(
+                f"{len(pending)} shard run(s) still running after {elapsed}s "
+                f"(EVAL_POLL_DEADLINE_S={POLL_DEADLINE_S:g}).\n"
+                f"  Eval ID : {eval_object.id}\n"
+                f"  Run IDs : {', '.join(run.id for run in pending.values())}\n"
+                f"  The runs keep going in Foundry: open Azure AI Foundry portal > Evaluations"
+            )
+
+        done = sum(done_items.values())
+        eta = None
+        if expected_items and 0 < done < expected_items:
+            eta = (time.time() - start_time) / done * (expected_items - done)
+        progress = f"{done}/{expected_items} items" if expected_items else f"{done} items"
+        eta_text = f" | ETA ~{int(eta)}s" if eta is not None else ""
+        # Overwrite the same line so the terminal isn't flooded
+        print(
+            f"  [{elapsed}s] {len(pending)}/{len(shard_runs)} shards running | {progress}{eta_text}    ",
+            end="\r", flush=True,
+        )
+
+        delay, sleep_for = _next_poll_delay(delay, done > last_done, eta)
+        last_done = done
+        time.sleep(min(sleep_for, max(POLL_DEADLINE_S - elapsed, 0) + 1))
+
+    return finished
+
+
+def run_sharded_evaluation(shard_count: int, path: Path = DATASET_PATH, name: str = None,
+                           cached_items=(), on_item=None):
+    """
+    Evaluate the dataset as shard_count parallel cloud runs and merge the results.
+
+    Each shard is uploaded as its own dataset and scored by its own run under
+    the same evaluation definition, so the service's per-run parallelism
+    applies to every shard. A shard whose run fails, or whose run could not
+    be started (e.g. 429 or a transient 5xx from runs.create), is re-run on
+    its own up to EVAL_SHARD_RETRIES times; completed shards are never re-run.
+
+    Incremental mode passes the delta file as path (uploaded under name), plus
+    cached_items and on_item as for retrieve_and_display_results().
+    """
+    section(f"Step 1: Uploading evaluation dataset in {shard_count} shards")
+
+    if not path.exists():
+        raise FileNotFoundError(
+            f"Dataset not found at {path}.\n"
+            "Make sure you are running the script from the repository root."
+        )
+
+    name = name or dataset_name
+    shard_paths = write_shards(shard_count, path)
+    shard_total = len(shard_paths)
+    with ThreadPoolExecutor(max_workers=shard_total) as pool:
+        data_ids = list(pool.map(
+            lambda i: upload_dataset_file(shard_paths[i], f"{name}-shard-{i + 1}-of-{shard_total}"),
+            range(shard_total),
+        ))
+
+    eval_object = create_evaluation_definition()                # Step 2
+
+    section(f"Steps 3-4: Running {shard_total} shard evaluations in parallel")
+
+    def start_shard(shard):
+        """(run, None) on success, (None, error) when the run could not be created."""
+        try:
+            return start_run(
+                eval_object, data_ids[shard], name=f"trail-guide-eval-shard-{shard + 1}-of-{shard_total}",
+            ), None
+        except APIError as e:
+            return None, e
+
+    expected_items = count_dataset_rows(path)
+    completed = {}
+    to_run = list(range(shard_total))
+    for attempt in range(eval_shard_retries + 1):
+        if attempt:
+            print(f"\n  Re-running {len(to_run)} failed shard(s) (retry {attempt}/{eval_shard_retries})...")
+        with ThreadPoolExecutor(max_workers=len(to_run)) as pool:
+            outcomes = dict(zip(to_run, pool.map(start_shard, to_run)))
+        started = {}
+        not_started = []
+        for shard, (run, error) in outcomes.items():
+            if run is None:
+                print(f"  Shard {shard + 1}: could not start ({type(error).__name__}: {error})")
+                not_started.append(shard)
+            else:
+                print(f"  Shard {shard + 1}: run {run.id} ({run.status})")
+                started[shard] = run
+
+        # Items already scored by completed shards count towards progress
+        remaining = expected_items - sum(
+            r.result_counts.total for r in completed.values() if getattr(r, "result_counts", None)
+        )
+        finished = poll_shard_runs(eval_object, started, expected_items=remaining) if started else {}
+        completed.update({s: r for s, r in finished.items() if r.status == "completed"})
+        to_run = sorted(not_started + [s for s, r in finished.items() if r.status != "completed"])
+        if not to_run:
+            break
+    else:
+        raise RuntimeError(
+            f"{len(to_run)} shard(s) still failing after {eval_shard_retries} retries: "
+            f"shard {', '.join(str(s + 1) for s in sorted(to_run))}.\n"
+            f"  Eval ID : {eval_object.id}\n"
+            f"  To inspect: open Azure AI Foundry portal > Evaluations"
+        )
+
+    print(f"\n\n✓ All {len(completed)} shards completed")
+    runs = [completed[shard] for shard in sorted(completed)]
+    return retrieve_and_display_results(                       # Step 5
+        eval_object, *runs, cached_items=cached_items, on_item=on_item,
+    )
+
+
+# ---------------------------------------------------------------------------
+# Incremental mode – only score new or changed rows
+# ---------------------------------------------------------------------------
+
+def cached_output_item(row: dict, scores: dict):
+    """An output item rebuilt from cached scores, shaped like a fresh result."""
+    return SimpleNamespace(
+        status="completed",
+        error=None,
+        cached=True,
+        datasource_item=row,
+        evaluator_outputs=[
+            SimpleNamespace(name=name, score=score, passed=score >= PASS_THRESHOLD, reason="cached")
+            for name, score in scores.items()
+        ],
+    )
+
+
+def run_incremental_evaluation():
+    """
+    Score only the dataset rows whose content changed since the last run.
+
+    Every row is hashed over the ITEM_SCHEMA columns and looked up in
+    ROW_SCORE_MANIFEST. Rows with cached scores are reused as they are; the
+    rest are written to a delta JSONL file and scored with the current mode
+    (a single cloud run, EVAL_SHARDS parallel runs, or the local engine). The
+    summary merges both, so it always covers the whole dataset; cached rows
+    are re-read from the dataset one at a time, never held in memory.
+
+    The manifest is tied to definition_fingerprint() plus the mode and judge
+    endpoint: changing the judge or the criteria re-scores every row.
+    """
+    section("Step 1: Finding new or changed dataset rows")
+
+    if not DATASET_PATH.exists():
+        raise FileNotFoundError(
+            f"Dataset not found at {DATASET_PATH}.\n"
+            "Make sure you are running the script from the repository root."
+        )
+
+    row_cache = RowScoreCache(
+        ROW_SCORE_MANIFEST,
+        fingerprint({
+            "definition": definition_fingerprint(),
+            "mode":       eval_mode,
+            "judge_url":  judge_base_url if eval_mode == "local" else None,
+            "project":    endpoint,
+        }),
+        ITEM_SCHEMA["properties"],
+    )
+    if row_cache.invalidated:
+        print("\n  Criteria or judge changed since the last run - cached scores discarded")
+
+    cached_rows = changed_rows = 0
+    delta_path = CACHE_DIR / f"{dataset_version}-delta.jsonl"
+    delta_path.parent.mkdir(parents=True, exist_ok=True)
+    with open(DATASET_PATH, "r", encoding="utf-8") as source, \
+            open(delta_path, "w", encoding="utf-8") as delta:
+        for line in source:
+            if not line.strip():
+                continue
+            row = json.loads(line)
+            scores = row_cache.lookup(row)
+            if scores is not None:
+                cached_rows += 1
+            else:
+                delta.write(line if line.endswith("\n") else line + "\n")
+                changed_rows += 1
+
+    print(f"\nDataset: {DATASET_PATH.name} ({cached_rows + changed_rows} items)")
+    print(f"  Unchanged (cached scores): {cached_rows}")
+    print(f"  New or changed (to score): {changed_rows}")
+    if changed_rows:
+        # Only the delta is judged, so only the delta is estimated
+        print()
+        print(format_estimate(estimate_evaluation(iter_jsonl(delta_path))))
+
+    def cached_items():
+        """
+        Second pass over the dataset, yielding the rows with cached scores.
+        The aggregators consume it before any new score is recorded, so only
+        rows that were cached at the start are yielded.
+        """
+        for row in iter_jsonl(DATASET_PATH):
+            scores = row_cache.lookup(row)
+            if scores is not None:
+                yield cached_output_item(row, scores)
+
+    def remember(item):
+        row_cache.record(
+            getattr(item, "datasource_item", None) or {},
+            getattr(item, "status", None),
+            item_scores(item),
+        )
+
+    if not changed_rows:
+        print("\n✓ Nothing to score - every row has cached scores")
+        section("Step 5: Summarizing results")
+        with ScoreAggregator(METRIC_LABELS, spill_path=SPILL_FILE) as aggregator:
+            aggregator.consume(cached_items())
+        write_summary("incremental", "no new run (all rows cached)", aggregator)
+    elif eval_mode == "local":
+        run_local_evaluation(load_jsonl(delta_path), cached_items=cached_items(), on_item=remember)
+    elif eval_shards > 1:
+        run_sharded_evaluation(                                     # Steps 1-5
+            eval_shards, delta_path, f"{dataset_name}-delta",
+            cached_items=cached_items(), on_item=remember,
+        )
+    else:
+        data_id     = upload_dataset_file(delta_path, f"{dataset_name}-delta")
+        eval_object = create_evaluation_definition()
+        eval_run    = run_evaluation(eval_object, data_id)
+        run         = poll_for_results(eval_object, eval_run, expected_items=changed_rows)
+        retrieve_and_display_results(eval_object, run, cached_items=cached_items(), on_item=remember)
+
+    row_cache.save()
 
 
 # ---------------------------------------------------------------------------
 # Main
 # ---------------------------------------------------------------------------
 
+def estimate_evaluation(items) -> dict:
+    """
+    Pre-flight token and time estimate for judging items against TESTING_CRITERIA.
+
+    Counted with the local judge rubrics; the cloud evaluators use their own
+    (similar sized) prompts, so treat cloud figures as approximate.
+    Rows missing a mapped column are skipped - they error without a judge call.
+    items may be a generator: the judge requests are counted as they are built.
+    """
+    def requests():
+        for item in items:
+            for criterion in TESTING_CRITERIA:
+                try:
+                    yield judge_messages(criterion, item)
+                except KeyError:
+                    pass
+
+    return estimate_batch(requests(), model_deployment_name, JUDGE_COMPLETION_TOKENS, TPM_QUOTA)
+
+
 def main() -> None:
     """Orchestrate the full evaluation pipeline step by step."""
-    section(" Trail Guide Agent - Cloud Evaluation")
+    section(f" Trail Guide Agent - {eval_mode.capitalize()} Evaluation")
     print(f"\nConfiguration:")
     print(f"  Project: {endpoint}")
     print(f"  Model:   {model_deployment_name}")
     print(f"  Dataset: {dataset_name} (v{dataset_version})")
 
     try:
-        data_id     = upload_dataset()                          # Step 1
-        eval_object = create_evaluation_definition()            # Step 2
-        eval_run    = run_evaluation(eval_object, data_id)      # Step 3
-        run         = poll_for_results(eval_object, eval_run)   # Step 4
-        retrieve_and_display_results(eval_object, run)          # Step 5
+        # Incremental runs print their estimate once they know which rows will be scored
+        if DATASET_PATH.exists() and not eval_incremental:
+            print()
+            print(format_estimate(estimate_evaluation(iter_jsonl(DATASET_PATH))))
+
+        if eval_incremental:
+            run_incremental_evaluation()
+            section(f"{eval_mode.capitalize()} incremental evaluation complete")
+            print(f"\nNext steps:")
+            print(f"  1. Review the per-metric scores above (cached and new rows combined)")
+            print(f"  2. Commit {RESULTS_FILE} and push so the PR workflow can use it")
+            return
+
+        if eval_mode == "local":
+            run_local_evaluation()
+            section("Local evaluation complete")
+            print(f"\nNext steps:")
+            print(f"  1. Review the per-metric scores above")
+            print(f"  2. Commit {RESULTS_FILE} and push so the PR workflow can use it")
+            return
+
+        if eval_shards > 1:
+            run_sharded_evaluation(eval_shards)                     # Steps 1-5
+        else:
+            data_id     = upload_dataset()                          # Step 1
+            eval_object = create_evaluation_definition()            # Step 2
+            eval_run    = run_evaluation(eval_object, data_id)      # Step 3
+            run         = poll_for_results(                         # Step 4
+                eval_object, eval_run, expected_items=count_dataset_rows()
+            )
+            retrieve_and_display_results(eval_object, run)          # Step 5
 
         section("Cloud evaluation complete")
         print(f"\nNext steps:")
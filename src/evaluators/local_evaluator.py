@@ -0,0 +1,220 @@
+"""
+Local evaluation engine for the Trail Guide Agent
+
+Scores the evaluation dataset with the same testing criteria as the cloud
+run (intent resolution, relevance, groundedness), but sends the judge prompts
+straight to a chat completions endpoint from a bounded thread pool instead of
+queueing a Foundry evaluation run.
+
+The judge is any OpenAI-compatible client, so the engine can be pointed at
+Azure OpenAI, the Foundry project endpoint, or a local stand-in server.
+"""
+
+import json
+import re
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+
+# Scores are on a 1-5 scale; a score >= 3 is considered a pass (same as the cloud run)
+MIN_SCORE = 1
+MAX_SCORE = 5
+PASS_THRESHOLD = 3
+
+# Matches the {{item.<column>}} template syntax used in testing_criteria data_mapping
+ITEM_TEMPLATE = re.compile(r"\{\{\s*item\.(\w+)\s*\}\}")
+
+_OUTPUT_FORMAT = (
+    "\n\nRespond ONLY with a JSON object of the form "
+    '{"score": <integer 1-5>, "reason": "<one sentence>"}.'
+)
+
+# Rubrics for the built-in evaluators referenced by testing_criteria
+JUDGE_PROMPTS = {
+    "builtin.intent_resolution": (
+        "You are an expert evaluator of AI assistants. Rate how well the RESPONSE "
+        "identifies and resolves the user's intent expressed in the QUERY.\n"
+        "5 = intent fully understood and completely resolved\n"
+        "4 = intent resolved with minor gaps\n"
+        "3 = intent partly resolved\n"
+        "2 = intent misunderstood or barely addressed\n"
+        "1 = intent not addressed at all"
+        + _OUTPUT_FORMAT
+    ),
+    "builtin.relevance": (
+        "You are an expert evaluator of AI assistants. Rate how relevant the RESPONSE "
+        "is to the QUERY: does it stay on topic and give the information asked for?\n"
+        "5 = fully relevant, complete and focused\n"
+        "4 = relevant with minor omissions or digressions\n"
+        "3 = partly relevant\n"
+        "2 = mostly irrelevant\n"
+        "1 = completely irrelevant"
+        + _OUTPUT_FORMAT
+    ),
+    "builtin.groundedness": (
+        "You are an expert evaluator of AI assistants. Rate how well the RESPONSE is "
+        "grounded in the CONTEXT: claims must be supported by, or consistent with, the "
+        "CONTEXT and must not contradict it.\n"
+        "5 = fully grounded, no unsupported claims\n"
+        "4 = mostly grounded, minor unsupported details\n"
+        "3 = partly grounded\n"
+        "2 = largely unsupported\n"
+        "1 = contradicts the context or is fabricated"
+        + _OUTPUT_FORMAT
+    ),
+}
+
+
+def iter_jsonl(path):
+    """Yield the dicts of a JSONL file one line at a time, skipping blank lines."""
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+
+def load_jsonl(path):
+    """Read a JSONL file into a list of dicts, skipping blank lines."""
+    return list(iter_jsonl(path))
+
+
+def render_data_mapping(data_mapping: dict, item: dict) -> dict:
+    """
+    Resolve {{item.<column>}} templates in a criterion's data_mapping.
+
+    Raises KeyError if the item is missing a mapped column, which marks the
+    item as errored - the same outcome as in a cloud run.
+    """
+    def substitute(match):
+        column = match.group(1)
+        if column not in item:
+            raise KeyError(f"dataset item has no column '{column}'")
+        return str(item[column])
+
+    return {
+        field: ITEM_TEMPLATE.sub(substitute, template)
+        for field, template in data_mapping.items()
+    }
+
+
+def judge_messages(criterion: dict, item: dict) -> list:
+    """Chat messages sent to the judge to score one item against one criterion."""
+    fields = render_data_mapping(criterion["data_mapping"], item)
+    user_content = "\n\n".join(f"{name.upper()}:\n{value}" for name, value in fields.items())
+    return [
+        {"role": "system", "content": JUDGE_PROMPTS[criterion["evaluator_name"]]},
+        {"role": "user", "content": user_content},
+    ]
+
+
+def _checked_score(value) -> float:
+    """A judge score as a float; raises ValueError unless it is within 1-5."""
+    try:
+        if isinstance(value, bool):
+            raise TypeError
+        score = float(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"judge score is not a number: {value!r}") from None
+    if not MIN_SCORE <= score <= MAX_SCORE:
+        raise ValueError(f"judge score {value!r} is outside {MIN_SCORE}-{MAX_SCORE}")
+    return score
+
+
+def parse_judge_output(text: str):
+    """
+    Extract (score, reason) from the judge's reply.
+
+    Raises ValueError when the reply has no score or the score is outside
+    1-5, so the item counts as errored instead of getting a made-up score.
+    """
+    try:
+        payload = json.loads(text)
+        score, reason = payload["score"], str(payload.get("reason", ""))
+    except (ValueError, KeyError, TypeError):
+        # Fall back to an explicit "score": N in free text (e.g. JSON in a code fence)
+        match = re.search(r'"?score"?\s*[:=]\s*(-?\d+(?:\.\d+)?)', text, re.IGNORECASE)
+        if not match:
+            raise ValueError(f"judge reply has no score: {text[:200]!r}")
+        score, reason = match.group(1), text.strip()
+    return _checked_score(score), reason
+
+
+class LocalEvaluator:
+    """
+    Run testing_criteria against dataset items using a judge model.
+
+    Args:
+        judge_client: OpenAI-compatible client exposing chat.completions.create
+        judge_model: Model / deployment name sent to the judge endpoint
+        testing_criteria: Same list passed to client.evals.create
+        max_workers: Upper bound on concurrent judge calls
+    """
+
+    def __init__(self, judge_client, judge_model, testing_criteria, max_workers=8):
+        unsupported = [
+            c["evaluator_name"] for c in testing_criteria
+            if c["evaluator_name"] not in JUDGE_PROMPTS
+        ]
+        if unsupported:
+            raise ValueError(f"No local judge prompt for evaluator(s): {', '.join(unsupported)}")
+
+        self.judge_client = judge_client
+        self.judge_model = judge_model
+        self.testing_criteria = testing_criteria
+        self.max_workers = max_workers
+
+    def _score(self, criterion, item):
+        """Score one item against one criterion."""
+        completion = self.judge_client.chat.completions.create(
+            model=self.judge_model,
+            temperature=0,
+            messages=judge_messages(criterion, item),
+        )
+        score, reason = parse_judge_output(completion.choices[0].message.content or "")
+        return SimpleNamespace(
+            name=criterion["name"],
+            score=score,
+            passed=score >= PASS_THRESHOLD,
+            reason=reason,
+        )
+
+    def _evaluate_item(self, item):
+        """
+        Score one dataset item against every criterion.
+
+        Returns an object shaped like a cloud output item: status, error,
+        datasource_item and evaluator_outputs (name / score / passed / reason).
+        """
+        outputs = []
+        try:
+            for criterion in self.testing_criteria:
+                outputs.append(self._score(criterion, item))
+        except Exception as e:
+            return SimpleNamespace(
+                status="error",
+                error=f"{type(e).__name__}: {e}",
+                datasource_item=item,
+                evaluator_outputs=outputs,
+            )
+        return SimpleNamespace(
+            status="completed",
+            error=None,
+            datasource_item=item,
+            evaluator_outputs=outputs,
+        )
+
+    def evaluate(self, items, on_result=None):
+        """
+        Score all items with at most max_workers judge calls in flight.
+
+        Results are returned in the same order as items. on_result, if given,
+        is called with (index, output_item) for each item, in input order.
+        """
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            futures = [pool.submit(self._evaluate_item, item) for item in items]
+            results = []
+            for index, future in enumerate(futures):
+                result = future.result()
+                if on_result:
+                    on_result(index, result)
+                results.append(result)
+        return results
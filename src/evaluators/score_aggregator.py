@@ -0,0 +1,163 @@
+"""
+Single-pass, constant-memory aggregation of evaluation output items.
+
+Output items are consumed one at a time straight from the paginated API
+iterator (or from the local engine). Only running totals per metric are kept
+- count, sum, passes, a 1-5 histogram and the count of every distinct score -
+so memory stays flat no matter how many items a run has. Raw items can
+optionally be spilled to a JSONL file for later inspection instead of being
+held in memory.
+
+Percentile and bootstrap analytics (score_analytics.py) work from the
+distinct-score counts. Only when a metric's scores are not discrete (more
+than MAX_DISTINCT_SCORES different values) do they need the scores
+themselves, which keep_scores stores in packed float arrays - 8 bytes per
+score, never the items themselves.
+"""
+
+import json
+from array import array
+from types import SimpleNamespace
+
+# Scores are on a 1-5 scale; a score >= 3 is considered a pass
+PASS_THRESHOLD = 3
+SCORE_BUCKETS = (1, 2, 3, 4, 5)
+
+# Distinct score values counted per metric before it is treated as continuous
+# (the same limit as score_analytics' multinomial bootstrap)
+MAX_DISTINCT_SCORES = 64
+
+
+def item_scores(item):
+    """
+    (metric, score) pairs of one output item.
+
+    Cloud output items list their evaluator results under `results`; the local
+    engine uses `evaluator_outputs`. Both expose name and score.
+    """
+    outputs = getattr(item, "evaluator_outputs", None) or getattr(item, "results", None) or []
+    return [(o.name, o.score) for o in outputs if getattr(o, "score", None) is not None]
+
+
+def _to_jsonable(value):
+    """Convert SDK models / SimpleNamespace trees into plain JSON values."""
+    if hasattr(value, "model_dump"):
+        return value.model_dump(mode="json")
+    if isinstance(value, SimpleNamespace):
+        return {k: _to_jsonable(v) for k, v in vars(value).items()}
+    if isinstance(value, dict):
+        return {k: _to_jsonable(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_to_jsonable(v) for v in value]
+    return value
+
+
+class MetricStats:
+    """
+    Running count / mean / pass rate / histogram for one metric.
+
+    value_counts maps every distinct score to its count; it becomes None once
+    there are more than MAX_DISTINCT_SCORES distinct scores.
+    """
+
+    __slots__ = ("count", "total", "passes", "histogram", "value_counts", "scores")
+
+    def __init__(self, keep_scores=False):
+        self.count = 0
+        self.total = 0.0
+        self.passes = 0
+        self.histogram = dict.fromkeys(SCORE_BUCKETS, 0)
+        self.value_counts = {}
+        self.scores = array("d") if keep_scores else None
+
+    def add(self, score: float) -> None:
+        if self.scores is not None:
+            self.scores.append(score)
+        value_counts = self.value_counts
+        if value_counts is not None:
+            value_counts[score] = value_counts.get(score, 0) + 1
+            if len(value_counts) > MAX_DISTINCT_SCORES:
+                self.value_counts = None
+        self.count += 1
+        self.total += score
+        if score >= PASS_THRESHOLD:
+            self.passes += 1
+        bucket = min(max(int(round(score)), SCORE_BUCKETS[0]), SCORE_BUCKETS[-1])
+        self.histogram[bucket] += 1
+
+    @property
+    def mean(self):
+        return self.total / self.count if self.count else None
+
+    @property
+    def pass_rate(self):
+        return self.passes / self.count * 100 if self.count else None
+
+    @property
+    def analytics_input(self):
+        """What score_analytics.analyze_scores() needs: the score counts, else the kept scores (or None)."""
+        return self.value_counts if self.value_counts is not None else self.scores
+
+
+class ScoreAggregator:
+    """
+    Consume output items one by one and keep per-metric running aggregates.
+
+    Args:
+        metrics: Metric names to track (other evaluator outputs are ignored)
+        spill_path: Optional JSONL file that receives every raw item
+        keep_scores: Also keep each metric's scores in a packed array('d');
+            only needed for analytics over non-discrete scores
+
+    Use as a context manager (or call close()) so the spill file is flushed.
+    """
+
+    def __init__(self, metrics, spill_path=None, keep_scores=False):
+        self.metrics = {name: MetricStats(keep_scores) for name in metrics}
+        self.total_items = 0
+        self.errored_items = 0
+        self.first_error = None
+        self.spill_path = spill_path
+        self._spill = open(spill_path, "w", encoding="utf-8") if spill_path else None
+
+    @property
+    def scored_items(self):
+        return self.total_items - self.errored_items
+
+    def add(self, item) -> None:
+        """Fold one output item into the running aggregates."""
+        self.total_items += 1
+        if self._spill:
+            self._spill.write(json.dumps(_to_jsonable(item)) + "\n")
+
+        if getattr(item, "status", None) == "error":
+            self.errored_items += 1
+            if self.first_error is None:
+                self.first_error = getattr(item, "error", "details unavailable")
+            return
+
+        for name, score in item_scores(item):
+            stats = self.metrics.get(name)
+            if stats is not None:
+                stats.add(score)
+
+    def analytics_inputs(self):
+        """Per-metric input for score_analytics.analyze_scores()."""
+        return {name: stats.analytics_input for name, stats in self.metrics.items()}
+
+    def consume(self, items):
+        """Fold every item of an iterable (e.g. an auto-paginating list call)."""
+        for item in items:
+            self.add(item)
+        return self
+
+    def close(self) -> None:
+        if self._spill:
+            self._spill.close()
+            self._spill = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
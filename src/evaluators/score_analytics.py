@@ -0,0 +1,189 @@
+"""
+Vectorized score analytics for evaluation results.
+
+Turns what ScoreAggregator collects per metric into percentiles, score
+distributions and bootstrap confidence intervals for the mean score and the
+pass rate. With noisy LLM judges, the interval width says whether a change
+between two prompt versions is larger than judge noise.
+
+Judge scores are discrete, so everything is computed from the count of each
+distinct score ({score: count}): the cost and memory do not depend on the
+number of items. Continuous scores (a plain array of values) fall back to
+NumPy over the whole array; no per-item Python loops either way.
+"""
+
+import numpy as np
+
+PERCENTILES = (5, 25, 50, 75, 95)
+
+# Resample matrices are processed in chunks of about this many elements
+_CHUNK_ELEMENTS = 4_000_000
+
+# Above this many distinct score values the exact multinomial shortcut is not used
+_MAX_DISCRETE_VALUES = 64
+
+
+def _multinomial_bootstrap(unique, counts, pass_threshold, samples, rng):
+    """
+    Bootstrap distributions of the mean and the pass rate from score counts.
+
+    Resampling n items with replacement is the same as drawing category counts
+    from a multinomial over the observed frequencies. That costs
+    O(samples x distinct values) instead of O(samples x n).
+    """
+    n = counts.sum()
+    draws = rng.multinomial(n, counts / n, size=samples)            # (samples, k)
+    means = draws @ unique / n
+    pass_rates = draws[:, unique >= pass_threshold].sum(axis=1) / n
+    return means, pass_rates
+
+
+def _resample_bootstrap(values, pass_threshold, samples, rng):
+    """Bootstrap distributions of the mean and the pass rate by chunked index resampling."""
+    n = values.size
+    chunk = max(1, _CHUNK_ELEMENTS // n)
+    means = np.empty(samples)
+    pass_rates = np.empty(samples)
+    for start in range(0, samples, chunk):
+        stop = min(start + chunk, samples)
+        resampled = values[rng.integers(0, n, size=(stop - start, n))]
+        means[start:stop] = resampled.mean(axis=1)
+        pass_rates[start:stop] = (resampled >= pass_threshold).mean(axis=1)
+    return means, pass_rates
+
+
+def _count_percentiles(unique, counts, percentiles):
+    """
+    np.percentile (linear interpolation) of the scores described by unique/counts,
+    read off the cumulative counts instead of the expanded scores.
+    """
+    cumulative = np.cumsum(counts)
+    positions = (cumulative[-1] - 1) * np.asarray(percentiles, dtype=np.float64) / 100
+    lower = np.floor(positions).astype(np.int64)
+    upper = np.minimum(lower + 1, cumulative[-1] - 1)
+    # The i-th smallest score is the first unique value whose cumulative count exceeds i
+    lower_values = unique[np.searchsorted(cumulative, lower, side="right")]
+    upper_values = unique[np.searchsorted(cumulative, upper, side="right")]
+    return lower_values + (upper_values - lower_values) * (positions - lower)
+
+
+def _intervals(means, pass_rates, confidence):
+    tail = (1 - confidence) / 2 * 100
+    mean_ci = np.percentile(means, [tail, 100 - tail])
+    pass_ci = np.percentile(pass_rates, [tail, 100 - tail]) * 100
+    return [float(mean_ci[0]), float(mean_ci[1])], [float(pass_ci[0]), float(pass_ci[1])]
+
+
+def _summarize_counts(unique, counts, pass_threshold, samples, confidence, seed):
+    """analyze_metric()'s result from sorted distinct scores and their counts."""
+    n = int(counts.sum())
+    mean = float(counts @ unique / n)
+    variance = float(counts @ (unique - mean) ** 2 / (n - 1)) if n > 1 else 0.0
+    rng = np.random.default_rng(seed)
+    mean_ci, pass_ci = _intervals(
+        *_multinomial_bootstrap(unique, counts, pass_threshold, samples, rng), confidence,
+    )
+    return {
+        "n": n,
+        "mean": mean,
+        "std": variance ** 0.5,
+        "min": float(unique[0]),
+        "max": float(unique[-1]),
+        "pass_rate": float(counts[unique >= pass_threshold].sum() / n * 100),
+        "percentiles": {
+            f"p{p}": float(v)
+            for p, v in zip(PERCENTILES, _count_percentiles(unique, counts, PERCENTILES))
+        },
+        "distribution": {
+            f"{u:g}": {"count": int(c), "fraction": float(c / n)}
+            for u, c in zip(unique, counts)
+        },
+        "mean_ci": mean_ci,
+        "pass_rate_ci": pass_ci,
+    }
+
+
+def analyze_counts(value_counts, pass_threshold=3, samples=2000, confidence=0.95, seed=0):
+    """
+    Summary statistics for one metric from the count of each distinct score.
+
+    Args:
+        value_counts: Mapping of score → number of items with that score
+            (MetricStats.value_counts)
+
+    Other arguments and the result are as for analyze_metric(), which gives
+    the same numbers for the scores these counts describe.
+    """
+    value_counts = {score: count for score, count in value_counts.items() if count} if value_counts else {}
+    if not value_counts:
+        return None
+    unique = np.array(sorted(value_counts), dtype=np.float64)
+    counts = np.array([value_counts[score] for score in sorted(value_counts)], dtype=np.int64)
+    return _summarize_counts(unique, counts, pass_threshold, samples, confidence, seed)
+
+
+def analyze_metric(values, pass_threshold=3, samples=2000, confidence=0.95, seed=0):
+    """
+    Summary statistics for one metric's scores.
+
+    Args:
+        values: 1-D array-like of scores (any numeric buffer, e.g. array('d'))
+        pass_threshold: Scores at or above this count as a pass
+        samples: Number of bootstrap resamples
+        confidence: Confidence level of the intervals (e.g. 0.95)
+        seed: RNG seed so repeated runs over the same scores agree
+
+    Returns a JSON-serialisable dict, or None when there are no scores.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    if values.size == 0:
+        return None
+
+    unique, counts = np.unique(values, return_counts=True)
+    if unique.size <= _MAX_DISCRETE_VALUES:
+        return _summarize_counts(unique, counts, pass_threshold, samples, confidence, seed)
+
+    rng = np.random.default_rng(seed)
+    mean_ci, pass_ci = _intervals(
+        *_resample_bootstrap(values, pass_threshold, samples, rng), confidence,
+    )
+    return {
+        "n": int(values.size),
+        "mean": float(values.mean()),
+        "std": float(values.std(ddof=1)) if values.size > 1 else 0.0,
+        "min": float(values.min()),
+        "max": float(values.max()),
+        "pass_rate": float((values >= pass_threshold).mean() * 100),
+        "percentiles": {
+            f"p{p}": float(v) for p, v in zip(PERCENTILES, np.percentile(values, PERCENTILES))
+        },
+        "distribution": {
+            f"{u:g}": {"count": int(c), "fraction": float(c / values.size)}
+            for u, c in zip(unique, counts)
+        },
+        "mean_ci": mean_ci,
+        "pass_rate_ci": pass_ci,
+    }
+
+
+def analyze_scores(scores_by_metric, pass_threshold=3, samples=2000, confidence=0.95, seed=0):
+    """
+    Run the analysis for every metric; metrics without scores map to None.
+
+    Each value is either a {score: count} mapping (analyze_counts) or an
+    array of scores (analyze_metric), as ScoreAggregator.analytics_inputs()
+    returns them.
+    """
+    def analyze(scores):
+        if scores is None:
+            return None
+        if isinstance(scores, dict):
+            return analyze_counts(scores, pass_threshold, samples, confidence, seed)
+        return analyze_metric(scores, pass_threshold, samples, confidence, seed)
+
+    return {
+        "pass_threshold": pass_threshold,
+        "bootstrap_samples": samples,
+        "confidence": confidence,
+        "metrics": {name: analyze(scores) for name, scores in scores_by_metric.items()},
+    }
@@ -3,64 +3,64 @@
 Queries Log Analytics directly to confirm spans are being exported,
 bypassing the Azure AI Foundry portal which has a ~5-10 minute display lag.
 
+With --file, reads a local JSONL trace file instead (written when
+TELEMETRY_TRACE_FILE is set, see telemetry_config.py) and prints the same
+trees instantly - no Azure credentials, clients or ingestion lag.
+
+Large windows: the latest run's spans are fetched as time slices queried in
+parallel (--slices). A slice that comes back partial (result-size limit or
+timeout) is split in half and re-queried; spans are de-duplicated on Id.
+
+Startup: the Log Analytics workspace is found from the Application Insights
+instrumentation key and cached in .cache/check-traces/workspace.json. Set
+LOG_ANALYTICS_WORKSPACE_ID (written to .env by azd) to skip the lookup
+entirely.
+
+With --summary, the aggregation runs server-side instead: one KQL summarize
+returns count, success rate, p50/p95/p99 duration and token sums per prompt
+version and test over the whole window, so only the table crosses the wire.
+
+With --watch, it polls while run_monitoring.py runs: each poll fetches only
+the spans ingested after a watermark, merges them into the in-memory trees
+and reprints just the traces that changed.
+
 Usage:
     python src/tests/check_traces.py
+    python src/tests/check_traces.py --file .cache/traces.jsonl
+    python src/tests/check_traces.py --max-depth 4 --max-children 20
+    python src/tests/check_traces.py --summary --hours 24
+    python src/tests/check_traces.py --watch --interval 15
 """
 import os
-from dotenv import load_dotenv
-from azure.identity import DefaultAzureCredential
-from azure.monitor.query import LogsQueryClient, LogsQueryStatus
-from azure.mgmt.applicationinsights import ApplicationInsightsManagementClient
-from azure.mgmt.subscription import SubscriptionClient
-from azure.mgmt.loganalytics import LogAnalyticsManagementClient
-from azure.ai.projects import AIProjectClient
-from datetime import timedelta
-
-load_dotenv()
-
-credential = DefaultAzureCredential()
-
-# Resolve the Application Insights connection string from the Foundry project
-project_endpoint = os.environ["AZURE_AI_PROJECT_ENDPOINT"]
-project_client = AIProjectClient(endpoint=project_endpoint, credential=credential)
-connection_string = project_client.telemetry.get_application_insights_connection_string()
-
-if not connection_string:
-    print("ERROR: No Application Insights connection string found.")
-    print("Ensure Application Insights is linked to your AI Foundry project.")
-    raise SystemExit(1)
+import json
+import time
+import argparse
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
 
-# Extract the InstrumentationKey from the connection string
-instrumentation_key = next(
-    part.split("=", 1)[1]
-    for part in connection_string.split(";")
-    if part.startswith("InstrumentationKey")
+from span_tree import (
+    build_span_tree, merge_spans, print_summary, print_trees, read_span_file,
+    root_ids, span_record_to_row, summarize_rows,
 )
-print(f"Application Insights key: {instrumentation_key}")
 
-# Resolve Log Analytics workspace customer ID (required by LogsQueryClient)
-print("Resolving Log Analytics workspace...")
-sub_client = SubscriptionClient(credential)
-subscription_id = next(sub_client.subscriptions.list()).subscription_id
+# Instrumentation key -> Log Analytics workspace, so startup skips the
+# subscription-wide component scan. Re-resolved after the TTL or when the key changes.
+WORKSPACE_CACHE_FILE = Path(__file__).parent.parent.parent / ".cache" / "check-traces" / "workspace.json"
+WORKSPACE_CACHE_TTL_S = float(os.environ.get("CHECK_TRACES_WORKSPACE_TTL_HOURS", "24")) * 3600
 
-ai_mgmt = ApplicationInsightsManagementClient(credential, subscription_id)
-workspace_resource_id = None
-for component in ai_mgmt.components.list():
-    if instrumentation_key in (component.instrumentation_key or ""):
-        workspace_resource_id = component.workspace_resource_id
-        break
+# How far back the queries look, in hours (--hours)
+LOOKBACK_HOURS = 6
 
-if not workspace_resource_id:
-    print("ERROR: Could not find a matching Application Insights component in your subscription.")
-    raise SystemExit(1)
-
-resource_group = workspace_resource_id.split("/")[4]
-workspace_name = workspace_resource_id.split("/")[-1]
+# Span fetches run as this many time slices in parallel (--slices). A partial
+# slice is halved and re-queried until it is MIN_SLICE long.
+QUERY_SLICES = int(os.environ.get("CHECK_TRACES_QUERY_SLICES", "4"))
+MIN_SLICE = timedelta(seconds=10)
 
-la_client = LogAnalyticsManagementClient(credential, subscription_id)
-workspace = la_client.workspaces.get(resource_group, workspace_name)
-workspace_id = workspace.customer_id
-print(f"Workspace ID: {workspace_id}\n")
+# --watch: seconds between polls, and how far back the first poll reaches so
+# a run that is already in progress is picked up from its start
+WATCH_INTERVAL_S = 30
+WATCH_START_LOOKBACK = timedelta(minutes=15)
 
 # A single run_monitoring.py execution produces one trace per prompt version.
 # Each trace contains a root span (trail_guide_v{n}), test child spans
@@ -69,24 +69,68 @@ print(f"Workspace ID: {workspace_id}\n")
 # Id / ParentId / OperationId are used to reconstruct the tree.
 # Custom attributes (prompt.version, response.* tokens) live in Properties.
 #
-# Note: the query filters to the latest run to avoid mixing multiple executions.
-query = """
+# Note: the queries filter to the latest run to avoid mixing multiple executions.
+# LATEST_RUN_QUERY finds its traces (and when each root started) over the
+# whole window; SPANS_QUERY then fetches their spans, one time slice at a time.
+LATEST_RUN_QUERY = """
 let latest_root_time = toscalar(
     AppDependencies
-    | where TimeGenerated > ago(6h)
+    | where TimeGenerated > ago({hours}h)
     | where Name startswith "trail_guide_"
     | top 1 by TimeGenerated desc
     | project TimeGenerated
 );
-let ops_in_latest_run = AppDependencies
-    | where TimeGenerated between (latest_root_time - 15m .. latest_root_time + 2m)
+AppDependencies
+| where TimeGenerated between (latest_root_time - 15m .. latest_root_time + 2m)
+| where Name startswith "trail_guide_"
+| summarize Started = min(TimeGenerated) by OperationId
+"""
+
+# TimeGenerated comes first so rows can be de-duplicated across slices;
+# query_sliced() drops it again.
+SPANS_QUERY = """
+AppDependencies
+| where OperationId in ({operation_ids})
+| summarize arg_max(TimeGenerated, *) by Id
+| project
+    TimeGenerated,
+    Id,
+    ParentId,
+    OperationId,
+    Name,
+    DurationMs,
+    Success,
+    PromptVersion    = tostring(Properties["prompt.version"]),
+    TestName         = tostring(Properties["test.name"]),
+    TotalTokens      = tostring(Properties["response.total_tokens"]),
+    PromptTokens     = tostring(Properties["response.prompt_tokens"]),
+    CompletionTokens = tostring(Properties["response.completion_tokens"])
+"""
+
+# --watch: spans ingested at or after the watermark. ingestion_time() rather
+# than TimeGenerated, because a span's TimeGenerated is its start time and a
+# long span (e.g. a version root) is ingested well after spans that started
+# later. Rows sharing the watermark timestamp are told apart by Id.
+#
+# Like LATEST_RUN_QUERY, only traces with a trail_guide_ root are returned. A
+# root is ingested after its children, so a span only becomes visible once
+# its root is in: IngestedAt is the later of the span's and its root's
+# ingestion time.
+WATCH_QUERY = """
+let roots = AppDependencies
+    | where TimeGenerated > ago({hours}h)
     | where Name startswith "trail_guide_"
-    | distinct OperationId;
+    | summarize RootIngestedAt = max(ingestion_time()) by OperationId;
 AppDependencies
-| where TimeGenerated > ago(6h)
-| where OperationId in (ops_in_latest_run)
+| where TimeGenerated > ago({hours}h)
+| where OperationId in (roots | project OperationId)
+| extend SpanIngestedAt = ingestion_time()
 | summarize arg_max(TimeGenerated, *) by Id
+| join kind=inner roots on OperationId
+| extend IngestedAt = max_of(SpanIngestedAt, RootIngestedAt)
+| where IngestedAt >= datetime({watermark})
 | project
+    IngestedAt,
     Id,
     ParentId,
     OperationId,
@@ -98,87 +142,432 @@ AppDependencies
     TotalTokens      = tostring(Properties["response.total_tokens"]),
     PromptTokens     = tostring(Properties["response.prompt_tokens"]),
     CompletionTokens = tostring(Properties["response.completion_tokens"])
+| order by IngestedAt asc
 """
 
-print("Querying spans from the past 6 hours and building the tree for the latest run...\n")
-logs_client = LogsQueryClient(credential)
-result = logs_client.query_workspace(
-    workspace_id=workspace_id,
-    query=query,
-    timespan=timedelta(hours=6),
-)
+# KQL datetime literal format (UTC, as in datetime(2024-01-31T12:00:00.000000Z))
+KQL_DATETIME_FORMAT = "%Y-%m-%dT%H:%M:%S.%fZ"
+
+# Server-side aggregate over every test span (v{n}_{test-name}) in the window,
+# not just the latest run. Columns match span_tree.SUMMARY_COLUMNS.
+SUMMARY_QUERY = """
+AppDependencies
+| where TimeGenerated > ago({hours}h)
+| where isnotempty(tostring(Properties["test.name"]))
+| summarize arg_max(TimeGenerated, *) by Id
+| summarize
+    Spans            = count(),
+    SuccessRate      = round(100.0 * countif(Success == true) / count(), 1),
+    P50Ms            = percentile(DurationMs, 50),
+    P95Ms            = percentile(DurationMs, 95),
+    P99Ms            = percentile(DurationMs, 99),
+    PromptTokens     = sum(tolong(Properties["response.prompt_tokens"])),
+    CompletionTokens = sum(tolong(Properties["response.completion_tokens"])),
+    TotalTokens      = sum(tolong(Properties["response.total_tokens"]))
+    by PromptVersion = tostring(Properties["prompt.version"]),
+       TestName      = tostring(Properties["test.name"])
+| order by PromptVersion asc, TestName asc
+"""
+
+
+def get_connection_string(credential):
+    """Application Insights connection string: from the environment (.env), else from the Foundry project."""
+    connection_string = os.environ.get("APPLICATIONINSIGHTS_CONNECTION_STRING")
+    if not connection_string:
+        from azure.ai.projects import AIProjectClient
+
+        # Resolve the Application Insights connection string from the Foundry project
+        project_endpoint = os.environ["AZURE_AI_PROJECT_ENDPOINT"]
+        project_client = AIProjectClient(endpoint=project_endpoint, credential=credential)
+        connection_string = project_client.telemetry.get_application_insights_connection_string()
+
+    if not connection_string:
+        print("ERROR: No Application Insights connection string found.")
+        print("Ensure Application Insights is linked to your AI Foundry project.")
+        raise SystemExit(1)
+    return connection_string
 
-if result.status != LogsQueryStatus.SUCCESS:
-    print(f"Query error: {result.partial_error}")
+
+def load_cached_workspace(instrumentation_key):
+    """Workspace customer ID cached for this instrumentation key, or None if missing, stale or for another key."""
+    try:
+        with open(WORKSPACE_CACHE_FILE, "r", encoding="utf-8") as f:
+            entry = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if entry.get("instrumentation_key") != instrumentation_key:
+        return None
+    if time.time() - entry.get("resolved_at", 0) > WORKSPACE_CACHE_TTL_S:
+        return None
+    return entry.get("workspace_id")
+
+
+def save_cached_workspace(instrumentation_key, workspace_resource_id, workspace_id):
+    WORKSPACE_CACHE_FILE.parent.mkdir(parents=True, exist_ok=True)
+    with open(WORKSPACE_CACHE_FILE, "w", encoding="utf-8") as f:
+        json.dump({
+            "instrumentation_key": instrumentation_key,
+            "workspace_resource_id": workspace_resource_id,
+            "workspace_id": workspace_id,
+            "resolved_at": time.time(),
+        }, f, indent=2)
+
+
+def find_workspace_resource_id(credential, instrumentation_key):
+    """Scan the subscription's Application Insights components for the one with this key (slow)."""
+    from azure.mgmt.applicationinsights import ApplicationInsightsManagementClient
+    from azure.mgmt.subscription import SubscriptionClient
+
+    subscription_id = os.environ.get("AZURE_SUBSCRIPTION_ID")
+    if not subscription_id:
+        sub_client = SubscriptionClient(credential)
+        subscription_id = next(sub_client.subscriptions.list()).subscription_id
+
+    ai_mgmt = ApplicationInsightsManagementClient(credential, subscription_id)
+    for component in ai_mgmt.components.list():
+        if instrumentation_key in (component.instrumentation_key or ""):
+            return component.workspace_resource_id
+
+    print("ERROR: Could not find a matching Application Insights component in your subscription.")
     raise SystemExit(1)
 
-rows = result.tables[0].rows
-if not rows:
-    print("No traces found yet — wait 2-3 more minutes and run again.")
-    raise SystemExit(0)
-
-# Build a lookup of span_id → span dict, and a children map
-spans = {}
-children = {}
-for row in rows:
-    span_id, parent_id, op_id, name, dur, ok, version, test_name, total, prompt, compl = row
-    spans[span_id] = {
-        "id": span_id,
-        "parent": parent_id,
-        "op": op_id,
-        "name": name,
-        "dur": dur,
-        "ok": ok,
-        "version": version or "",
-        "test": test_name or "",
-        "total": total or "",
-        "prompt": prompt or "",
-        "compl": compl or "",
-    }
-    children.setdefault(parent_id, []).append(span_id)
-
-# Identify root spans (ParentId not in any span's Id)
-all_ids = set(spans.keys())
-roots = [s for s in spans.values() if s["parent"] not in all_ids]
-# Sort roots by operation ID so versions appear in order
-roots.sort(key=lambda s: s["op"])
-
-
-def print_span(span_id, prefix="", is_last=True):
-    """Recursively print a span and its children as an ASCII tree."""
-    span = spans[span_id]
-    connector = "└── " if is_last else "├── "
-    name_str = span["name"]
-
-    # Build inline annotation for test child spans
-    details = ""
-    if span["total"]:
-        details = (
-            f"  [{span['dur']}ms | "
-            f"tokens: {span['total']} (↑{span['prompt']} ↓{span['compl']})]"
-        )
-    elif span["dur"]:
-        details = f"  [{span['dur']}ms]"
-
-    print(f"{prefix}{connector}{name_str}{details}")
-
-    kids = sorted(children.get(span_id, []), key=lambda k: spans[k]["name"])
-    child_prefix = prefix + ("    " if is_last else "│   ")
-    for i, kid in enumerate(kids):
-        print_span(kid, child_prefix, is_last=(i == len(kids) - 1))
-
-
-# Print one tree per trace (operation)
-seen_ops = []
-for root in roots:
-    if root["op"] in seen_ops:
-        continue
-    seen_ops.append(root["op"])
-    print(f"Trace: {root['op']}")
-    # Find all root spans for this operation
-    op_roots = [s for s in roots if s["op"] == root["op"]]
-    for i, r in enumerate(op_roots):
-        print_span(r["id"], prefix="", is_last=(i == len(op_roots) - 1))
-    print()
-
-print(f"Total spans found: {len(spans)}")
\ No newline at end of file
+
+def get_workspace_customer_id(credential, workspace_resource_id):
+    """Customer ID (required by LogsQueryClient) of the workspace with this resource ID."""
+    from azure.mgmt.loganalytics import LogAnalyticsManagementClient
+
+    parts = workspace_resource_id.split("/")
+    subscription_id, resource_group, workspace_name = parts[2], parts[4], parts[-1]
+
+    la_client = LogAnalyticsManagementClient(credential, subscription_id)
+    workspace = la_client.workspaces.get(resource_group, workspace_name)
+    return workspace.customer_id
+
+
+def resolve_workspace_id(credential, refresh=False):
+    """
+    Find the Log Analytics workspace behind the Foundry project's Application Insights.
+
+    Fastest first: LOG_ANALYTICS_WORKSPACE_ID (no lookups at all), then
+    LOG_ANALYTICS_WORKSPACE_RESOURCE_ID (one workspace lookup), then the
+    on-disk cache for the current instrumentation key, and only then the
+    subscription-wide component scan, whose result is cached for next time.
+    refresh skips the cache.
+    """
+    workspace_id = os.environ.get("LOG_ANALYTICS_WORKSPACE_ID")
+    if workspace_id:
+        print(f"Workspace ID: {workspace_id} (from LOG_ANALYTICS_WORKSPACE_ID)\n")
+        return workspace_id
+
+    workspace_resource_id = os.environ.get("LOG_ANALYTICS_WORKSPACE_RESOURCE_ID")
+    if workspace_resource_id:
+        workspace_id = get_workspace_customer_id(credential, workspace_resource_id)
+        print(f"Workspace ID: {workspace_id} (from LOG_ANALYTICS_WORKSPACE_RESOURCE_ID)\n")
+        return workspace_id
+
+    connection_string = get_connection_string(credential)
+
+    # Extract the InstrumentationKey from the connection string
+    instrumentation_key = next(
+        part.split("=", 1)[1]
+        for part in connection_string.split(";")
+        if part.startswith("InstrumentationKey")
+    )
+    print(f"Application Insights key: {instrumentation_key}")
+
+    if not refresh:
+        workspace_id = load_cached_workspace(instrumentation_key)
+        if workspace_id:
+            print(f"Workspace ID: {workspace_id} (cached, --refresh-workspace to look it up again)\n")
+            return workspace_id
+
+    # Resolve Log Analytics workspace customer ID (required by LogsQueryClient)
+    print("Resolving Log Analytics workspace...")
+    workspace_resource_id = find_workspace_resource_id(credential, instrumentation_key)
+    workspace_id = get_workspace_customer_id(credential, workspace_resource_id)
+    save_cached_workspace(instrumentation_key, workspace_resource_id, workspace_id)
+    print(f"Workspace ID: {workspace_id}\n")
+
+    return workspace_id
+
+
+def connect_log_analytics(refresh_workspace=False):
+    """(LogsQueryClient, workspace ID); Azure imports are deferred so --file needs none."""
+    from dotenv import load_dotenv
+    from azure.identity import DefaultAzureCredential
+    from azure.monitor.query import LogsQueryClient
+
+    load_dotenv()
+
+    credential = DefaultAzureCredential()
+    workspace_id = resolve_workspace_id(credential, refresh=refresh_workspace)
+    return LogsQueryClient(credential), workspace_id
+
+
+def run_query(logs_client, workspace_id, query, hours=LOOKBACK_HOURS, **params):
+    """Rows of a KQL query over the last `hours`; params fill the query's other placeholders."""
+    from azure.monitor.query import LogsQueryStatus
+
+    result = logs_client.query_workspace(
+        workspace_id=workspace_id,
+        query=query.format(hours=f"{hours:g}", **params),
+        timespan=timedelta(hours=hours),
+    )
+
+    if result.status != LogsQueryStatus.SUCCESS:
+        print(f"Query error: {result.partial_error}")
+        print("If the workspace has changed, run again with --refresh-workspace.")
+        raise SystemExit(1)
+
+    return result.tables[0].rows
+
+
+def query_log_analytics(query, hours=LOOKBACK_HOURS, refresh_workspace=False):
+    """Rows of a single KQL query over the last `hours`."""
+    logs_client, workspace_id = connect_log_analytics(refresh_workspace)
+    return run_query(logs_client, workspace_id, query, hours)
+
+
+def query_sliced(logs_client, workspace_id, query, start, end, slices=QUERY_SLICES, **params):
+    """
+    Run a span query over [start, end] as time slices in parallel and merge the rows.
+
+    The query's first two columns must be TimeGenerated and Id. Rows are
+    de-duplicated on Id keeping the latest TimeGenerated, as arg_max does
+    within one slice, and returned without the TimeGenerated column. A slice
+    that returns a partial result is split in half and re-queried; at
+    MIN_SLICE its partial rows are kept with a warning.
+    """
+    from azure.monitor.query import LogsQueryStatus
+
+    text = query.format(**params)
+    step = (end - start) / max(1, slices)
+    pending = [(start + step * i, start + step * (i + 1)) for i in range(max(1, slices))]
+    latest = {}
+    queried = 0
+
+    with ThreadPoolExecutor(max_workers=max(1, slices)) as pool:
+        while pending:
+            futures = {
+                pool.submit(logs_client.query_workspace, workspace_id=workspace_id, query=text,
+                            timespan=time_slice): time_slice
+                for time_slice in pending
+            }
+            queried += len(futures)
+            pending = []
+            for future in as_completed(futures):
+                slice_start, slice_end = futures[future]
+                result = future.result()
+                if result.status == LogsQueryStatus.SUCCESS:
+                    rows = result.tables[0].rows
+                elif result.status == LogsQueryStatus.PARTIAL and slice_end - slice_start >= 2 * MIN_SLICE:
+                    middle = slice_start + (slice_end - slice_start) / 2
+                    pending += [(slice_start, middle), (middle, slice_end)]
+                    continue
+                elif result.status == LogsQueryStatus.PARTIAL:
+                    print(f"Warning: slice {slice_start:%H:%M:%S}-{slice_end:%H:%M:%S} is still partial "
+                          f"({result.partial_error}); some spans may be missing")
+                    rows = result.partial_data[0].rows
+                else:
+                    print(f"Query error: {result.partial_error}")
+                    raise SystemExit(1)
+
+                # Slices share their boundary instant, and a span may be ingested twice
+                for row in rows:
+                    kept = latest.get(row[1])
+                    if kept is None or row[0] > kept[0]:
+                        latest[row[1]] = row
+
+    print(f"Fetched {len(latest)} spans in {queried} time slice query(s)\n")
+    return [tuple(row[1:]) for row in latest.values()]
+
+
+def query_latest_run(hours=LOOKBACK_HOURS, slices=QUERY_SLICES, refresh_workspace=False):
+    """Span rows of the latest run: its traces first, then their spans in parallel time slices."""
+    logs_client, workspace_id = connect_log_analytics(refresh_workspace)
+    traces = run_query(logs_client, workspace_id, LATEST_RUN_QUERY, hours)
+    if not traces:
+        return []
+
+    # Every span of a trace starts after its root span, so the fetch starts at the earliest root
+    operation_ids = ", ".join(json.dumps(op_id) for op_id, _ in traces)
+    start = min(started for _, started in traces)
+    return query_sliced(
+        logs_client, workspace_id, SPANS_QUERY, start, datetime.now(timezone.utc), slices,
+        operation_ids=operation_ids,
+    )
+
+
+def poll_log_analytics(hours=LOOKBACK_HOURS, refresh_workspace=False):
+    """
+    Yield, once per poll, the span rows of trail_guide_ traces ingested since
+    the previous poll. A trace's spans arrive together with its root span.
+
+    The watermark is the latest ingestion time seen plus the Ids ingested at
+    exactly that time: the query includes the watermark timestamp, so rows
+    that became visible late at that timestamp are not lost, and the Ids
+    keep the ones already returned from being returned twice.
+    """
+    logs_client, workspace_id = connect_log_analytics(refresh_workspace)
+    watermark = datetime.now(timezone.utc) - WATCH_START_LOOKBACK
+    watermark_ids = set()
+    while True:
+        rows = []
+        for ingested_at, *span_row in run_query(
+            logs_client, workspace_id, WATCH_QUERY, hours,
+            watermark=watermark.astimezone(timezone.utc).strftime(KQL_DATETIME_FORMAT),
+        ):
+            if ingested_at == watermark and span_row[0] in watermark_ids:
+                continue
+            if ingested_at > watermark:
+                watermark, watermark_ids = ingested_at, set()
+            watermark_ids.add(span_row[0])
+            rows.append(tuple(span_row))
+        yield rows
+
+
+def poll_trace_file(path):
+    """
+    Yield, once per poll, the span rows appended to a JSONL trace file since
+    the previous poll (the byte offset is the watermark). The first poll
+    skips spans that started before WATCH_START_LOOKBACK; later polls keep
+    everything new, since a long root span is only written when it ends.
+    """
+    since = datetime.now(timezone.utc) - WATCH_START_LOOKBACK
+    offset = 0
+    while True:
+        rows = []
+        if os.path.exists(path):
+            with open(path, "rb") as f:
+                f.seek(offset)
+                data = f.read()
+            # A partly written last line is left for the next poll
+            data = data[:data.rfind(b"\n") + 1]
+            offset += len(data)
+            for line in data.decode("utf-8").splitlines():
+                if not line.strip():
+                    continue
+                record = json.loads(line)
+                if since is None or datetime.fromisoformat(record["start_time"]) >= since:
+                    rows.append(span_record_to_row(record))
+            since = None
+        yield rows
+
+
+def watch(polls, interval=WATCH_INTERVAL_S, max_depth=None, max_children=None):
+    """Merge each poll's rows into the trees and reprint the traces they changed, until Ctrl+C."""
+    spans, children, by_op = {}, {}, {}
+    print(f"Watching for new spans every {interval:g}s (Ctrl+C to stop)...\n")
+    try:
+        for rows in polls:
+            if rows:
+                changed = merge_spans(spans, children, rows, by_op)
+                roots = {op_id: root_ids(spans, by_op[op_id]) for op_id in sorted(changed)}
+                print(f"[{time.strftime('%H:%M:%S')}] +{len(rows)} span(s) in "
+                      f"{len(changed)} trace(s), {len(spans)} in total\n")
+                print_trees(spans, children, roots, max_depth=max_depth, max_children=max_children)
+            time.sleep(interval)
+    except KeyboardInterrupt:
+        print(f"\nStopped watching. Total spans found: {len(spans)}")
+
+
+def read_trace_file(path, run_id=None):
+    """Rows of one run from a local JSONL trace file."""
+    if not os.path.exists(path):
+        print(f"ERROR: Trace file not found: {path}")
+        print("Set TELEMETRY_TRACE_FILE when running run_monitoring.py to write one.")
+        raise SystemExit(1)
+
+    rows, run_id = read_span_file(path, run_id)
+    label = "all runs" if run_id == "all" else f"run {run_id}"
+    print(f"Reading spans from {path} ({label})...\n")
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Print the span trees of the latest run_monitoring.py run.",
+    )
+    parser.add_argument(
+        "--file",
+        help="Read spans from a local JSONL trace file (TELEMETRY_TRACE_FILE) instead of Log Analytics",
+    )
+    parser.add_argument(
+        "--run-id",
+        help="With --file: the run to show (default: the last run in the file, 'all' for every run)",
+    )
+    parser.add_argument(
+        "--refresh-workspace", action="store_true",
+        help="Ignore the cached Log Analytics workspace and look it up again",
+    )
+    parser.add_argument(
+        "--summary", action="store_true",
+        help="Print per-version, per-test aggregates (computed server-side) instead of span trees",
+    )
+    parser.add_argument(
+        "--hours", type=float, default=LOOKBACK_HOURS,
+        help=f"How many hours back to query (default: {LOOKBACK_HOURS})",
+    )
+    parser.add_argument(
+        "--slices", type=int, default=QUERY_SLICES,
+        help=f"Time slices the span fetch is split into and queried in parallel (default: {QUERY_SLICES})",
+    )
+    parser.add_argument(
+        "--watch", action="store_true",
+        help="Keep polling and reprint each trace as new spans arrive (Ctrl+C to stop)",
+    )
+    parser.add_argument(
+        "--interval", type=float, default=WATCH_INTERVAL_S,
+        help=f"With --watch: seconds between polls (default: {WATCH_INTERVAL_S})",
+    )
+    parser.add_argument(
+        "--max-depth", type=int,
+        help="Only print spans down to this depth (a root span is depth 1); deeper spans are summarised",
+    )
+    parser.add_argument(
+        "--max-children", type=int,
+        help="Print at most this many children per span; the rest are summarised",
+    )
+    args = parser.parse_args()
+
+    if args.summary:
+        if args.file:
+            summary = summarize_rows(read_trace_file(args.file, args.run_id))
+        else:
+            print(f"Summarising test spans from the past {args.hours:g} hours server-side...\n")
+            summary = query_log_analytics(SUMMARY_QUERY, args.hours, args.refresh_workspace)
+        if not summary:
+            print("No test spans found.")
+            raise SystemExit(0)
+        print_summary(summary)
+        print(f"\nTest spans summarised: {sum(row[2] for row in summary)}")
+        return
+
+    if args.watch:
+        if args.file:
+            polls = poll_trace_file(args.file)
+        else:
+            polls = poll_log_analytics(args.hours, args.refresh_workspace)
+        watch(polls, args.interval, args.max_depth, args.max_children)
+        return
+
+    if args.file:
+        rows = read_trace_file(args.file, args.run_id)
+    else:
+        print(f"Querying spans from the past {args.hours:g} hours and building the tree for the latest run...\n")
+        rows = query_latest_run(args.hours, args.slices, args.refresh_workspace)
+    if not rows:
+        if args.file:
+            print("No spans found in the trace file.")
+        else:
+            print("No traces found yet — wait 2-3 more minutes and run again.")
+        raise SystemExit(0)
+
+    spans, children, roots = build_span_tree(rows)
+    print_trees(spans, children, roots, max_depth=args.max_depth, max_children=args.max_children)
+
+    print(f"Total spans found: {len(spans)}")
+
+
+if __name__ == "__main__":
+    main()
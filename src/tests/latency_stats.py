@@ -0,0 +1,89 @@
+"""
+Small helpers for summarising request latencies in the test runners.
+
+Kept dependency-free so any script in src/tests can import it.
+"""
+
+
+def percentile(values, pct):
+    """
+    Return the pct-th percentile of values using linear interpolation.
+
+    Args:
+        values: Iterable of numbers (does not need to be sorted)
+        pct: Percentile between 0 and 100
+
+    Returns None when values is empty.
+    """
+    ordered = sorted(values)
+    if not ordered:
+        return None
+    rank = (len(ordered) - 1) * pct / 100
+    lower = int(rank)
+    upper = min(lower + 1, len(ordered) - 1)
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (rank - lower)
+
+
+def summarize_latencies(latencies, wall_time_s):
+    """
+    Summarise a run as throughput plus p50/p95 latency.
+
+    Args:
+        latencies: Per-request latencies in seconds
+        wall_time_s: Total elapsed time for the whole run in seconds
+    """
+    latencies = list(latencies)
+    return {
+        "count": len(latencies),
+        "wall_time_s": round(wall_time_s, 3),
+        "throughput_per_s": round(len(latencies) / wall_time_s, 3) if wall_time_s > 0 else None,
+        "p50_s": _round(percentile(latencies, 50)),
+        "p95_s": _round(percentile(latencies, 95)),
+    }
+
+
+def _round(value):
+    return round(value, 3) if value is not None else None
+
+
+def summarize_stream(start, token_times, end, completion_tokens=None):
+    """
+    Summarise one streamed completion.
+
+    Args:
+        start: time.perf_counter() when the request was sent
+        token_times: perf_counter() of every chunk that carried content
+        end: perf_counter() when the stream finished
+        completion_tokens: Output token count from the final usage chunk
+            (falls back to the number of content chunks)
+
+    Returns time to first token, inter-token latency p50/p95 and output
+    tokens/s over the generation phase (first token to end of stream).
+    """
+    token_times = list(token_times)
+    gaps = [later - earlier for earlier, later in zip(token_times, token_times[1:])]
+    tokens = completion_tokens if completion_tokens is not None else len(token_times)
+    generation_s = end - token_times[0] if token_times else 0.0
+    return {
+        "ttft_s": _round(token_times[0] - start) if token_times else None,
+        "itl_p50_s": _round(percentile(gaps, 50)),
+        "itl_p95_s": _round(percentile(gaps, 95)),
+        "tokens_per_s": round(tokens / generation_s, 1) if generation_s > 0 else None,
+    }
+
+
+def latency_distribution(values, percentiles=(50, 95, 99)):
+    """
+    Mean, max and the given percentiles of a list of latencies in seconds.
+
+    Returns a dict with None values when there are no samples.
+    """
+    values = list(values)
+    summary = {
+        "count": len(values),
+        "mean_s": _round(sum(values) / len(values)) if values else None,
+        "max_s": _round(max(values)) if values else None,
+    }
+    for pct in percentiles:
+        summary[f"p{pct}_s"] = _round(percentile(values, pct))
+    return summary
@@ -0,0 +1,690 @@
+"""
+Local OpenAI-compatible stand-in server for offline performance testing.
+
+Implements the subset of the API the scripts in src/ call:
+  - POST /chat/completions                       (run_monitoring.py, local eval judge)
+  - POST /conversations, /conversations/{id}/items and /responses
+                                                 (run_batch_tests.py, run_load_test.py)
+  - POST /files, and /evals, /evals/{id}/runs, .../output_items
+                                                 (evaluate_agent.py cloud mode)
+
+Both generation endpoints support streaming (server-sent events) and return
+usage blocks. Latency and output length are drawn from configurable
+distributions, 429 / 500 errors can be injected at a given rate, and every
+random draw comes from a seeded RNG, so runs are repeatable on a laptop.
+
+Point the scripts at it with:
+    LOCAL_OPENAI_BASE_URL=http://127.0.0.1:8000/v1
+
+Usage:
+    python src/tests/mock_openai_server.py --port 8000 --ttft-ms 300 --itl-ms 15 --error-rate-429 0.05
+
+Timings: time to first token is log-normal around --ttft-ms; every further
+token takes --itl-ms (+/- 20%). Output length is normal(--tokens-mean,
+--tokens-std), clipped to [1, max_tokens]. Judge prompts (system prompt asking
+for a JSON "score") get a JSON score reply. Eval runs score --eval-parallelism
+items at a time, each taking --eval-item-ms, after --eval-queue-s in the queue.
+
+Prompt-prefix cache: a chat request whose system prompt was seen before and
+is at least --prefix-cache-min-tokens long reports it as cached_tokens (in
+128-token blocks, like Azure OpenAI), and its first-token delay is scaled by
+--cached-ttft-factor.
+"""
+
+import argparse
+import email.parser
+import hashlib
+import itertools
+import json
+import math
+import random
+import re
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+# Filler vocabulary for generated responses
+WORDS = (
+    "trail", "summit", "ridge", "pack", "water", "layers", "boots", "map", "weather",
+    "elevation", "camp", "route", "gear", "switchback", "forest", "lake", "permit",
+    "sunrise", "snow", "shelter", "the", "a", "and", "for", "with", "on", "your",
+)
+
+# Judge scores 1-5 are drawn with these weights (deterministic per item and criterion)
+SCORE_WEIGHTS = (0.05, 0.10, 0.20, 0.35, 0.30)
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (about 4 characters per token), good enough for usage blocks."""
+    return max(1, len(text) // 4)
+
+
+class MockState:
+    """
+    Everything the server remembers between requests, plus its RNG.
+
+    One lock guards the dicts and the request counter. Each request gets its
+    own random.Random seeded from (seed, request number), so a sequential
+    client sees the same latencies on every run.
+    """
+
+    def __init__(self, config):
+        self.config = config
+        self.lock = threading.Lock()
+        self.counter = itertools.count()
+        self.conversations = {}
+        self.files = {}
+        self.evals = {}
+        self.runs = {}
+        self.cached_prefixes = set()
+
+    def cached_tokens(self, messages):
+        """Cached prefix tokens for these messages, then remember their prefix."""
+        prefix = "".join(str(m.get("content", "")) for m in messages if m.get("role") == "system")
+        tokens = estimate_tokens(prefix) if prefix else 0
+        if tokens < self.config.prefix_cache_min_tokens:
+            return 0
+        key = hashlib.sha256(prefix.encode("utf-8")).hexdigest()
+        with self.lock:
+            hit = key in self.cached_prefixes
+            self.cached_prefixes.add(key)
+        return tokens // 128 * 128 if hit else 0
+
+    def rng(self):
+        with self.lock:
+            n = next(self.counter)
+        return random.Random(f"{self.config.seed}:{n}")
+
+    def new_id(self, prefix):
+        return f"{prefix}_{uuid.uuid4().hex[:24]}"
+
+
+class Generation:
+    """Sampled shape of one model reply: length, first-token delay and token gaps."""
+
+    def __init__(self, config, rng, max_tokens=None, fixed_text=None):
+        if fixed_text is not None:
+            self.tokens = re.findall(r"\S+\s*", fixed_text) or [fixed_text]
+        else:
+            count = max(1, int(round(rng.gauss(config.tokens_mean, config.tokens_std))))
+            if max_tokens:
+                count = min(count, max_tokens)
+            self.tokens = [rng.choice(WORDS) + " " for _ in range(count)]
+        self.ttft_s = rng.lognormvariate(math.log(config.ttft_ms / 1000), config.ttft_sigma)
+        self.gaps_s = [
+            config.itl_ms / 1000 * rng.uniform(0.8, 1.2) for _ in range(len(self.tokens) - 1)
+        ]
+
+    @property
+    def text(self):
+        return "".join(self.tokens).rstrip()
+
+    @property
+    def total_s(self):
+        return self.ttft_s + sum(self.gaps_s)
+
+    def timed_tokens(self):
+        """Yield tokens, sleeping as a real model would before each one."""
+        for index, token in enumerate(self.tokens):
+            time.sleep(self.ttft_s if index == 0 else self.gaps_s[index - 1])
+            yield token
+
+
+def _judge_reply(messages, rng):
+    """JSON score reply when the system prompt asks for one, else None."""
+    system = " ".join(str(m.get("content", "")) for m in messages if m.get("role") == "system")
+    if '"score"' not in system:
+        return None
+    score = rng.choices(range(1, 6), weights=SCORE_WEIGHTS)[0]
+    return json.dumps({"score": score, "reason": "Mock judge score."})
+
+
+def _item_score(item, criterion_name, seed):
+    """Deterministic 1-5 score for one dataset row and criterion."""
+    digest = hashlib.sha256(
+        f"{seed}:{criterion_name}:{json.dumps(item, sort_keys=True)}".encode("utf-8")
+    ).digest()
+    return random.Random(digest).choices(range(1, 6), weights=SCORE_WEIGHTS)[0]
+
+
+class MockHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server_version = "MockOpenAI/1.0"
+
+    @property
+    def state(self) -> MockState:
+        return self.server.state
+
+    # -- plumbing ----------------------------------------------------------
+
+    def log_message(self, format, *args):
+        if self.state.config.verbose:
+            super().log_message(format, *args)
+
+    def _route(self):
+        """Path split into parts, with any /openai and /v1 prefixes removed."""
+        parts = [p for p in urlsplit(self.path).path.split("/") if p]
+        while parts and parts[0] in ("openai", "v1"):
+            parts = parts[1:]
+        return parts
+
+    def _query(self):
+        return {k: v[-1] for k, v in parse_qs(urlsplit(self.path).query).items()}
+
+    def _body(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        return self.rfile.read(length) if length else b""
+
+    def _json_body(self):
+        body = self._body()
+        return json.loads(body) if body else {}
+
+    def _send_json(self, payload, status=200, headers=None):
+        data = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _send_error(self, status, message, error_type="invalid_request_error", headers=None):
+        self._send_json(
+            {"error": {"message": message, "type": error_type, "code": str(status)}},
+            status=status,
+            headers=headers,
+        )
+
+    def _start_stream(self):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+
+    def _send_event(self, payload, event=None):
+        """Write one SSE message as an HTTP chunk (payload may be a dict or '[DONE]')."""
+        data = payload if isinstance(payload, str) else json.dumps(payload)
+        message = (f"event: {event}\n" if event else "") + f"data: {data}\n\n"
+        encoded = message.encode("utf-8")
+        self.wfile.write(f"{len(encoded):x}\r\n".encode("ascii") + encoded + b"\r\n")
+        self.wfile.flush()
+
+    def _end_stream(self):
+        self.wfile.write(b"0\r\n\r\n")
+        self.wfile.flush()
+
+    def _injected_error(self, rng):
+        """Send a 429 or 500 at the configured rates; True if one was sent."""
+        config = self.state.config
+        roll = rng.random()
+        if roll < config.error_rate_429:
+            self._send_error(
+                429, "Rate limit exceeded (injected by mock server).", "rate_limit_exceeded",
+                headers={"Retry-After": f"{config.retry_after:g}"},
+            )
+            return True
+        if roll < config.error_rate_429 + config.error_rate_500:
+            self._send_error(500, "Internal server error (injected by mock server).", "server_error")
+            return True
+        return False
+
+    # -- dispatch ----------------------------------------------------------
+
+    def do_GET(self):
+        self._dispatch("GET")
+
+    def do_POST(self):
+        self._dispatch("POST")
+
+    def _dispatch(self, method):
+        parts = self._route()
+        routes = {
+            ("POST", ("chat", "completions")): self.create_chat_completion,
+            ("POST", ("responses",)): self.create_response,
+            ("POST", ("conversations",)): self.create_conversation,
+            ("POST", ("conversations", "*", "items")): self.create_conversation_items,
+            ("POST", ("files",)): self.create_file,
+            ("GET", ("evals",)): self.list_evals,
+            ("POST", ("evals",)): self.create_eval,
+            ("GET", ("evals", "*")): self.retrieve_eval,
+            ("POST", ("evals", "*", "runs")): self.create_run,
+            ("GET", ("evals", "*", "runs", "*")): self.retrieve_run,
+            ("GET", ("evals", "*", "runs", "*", "output_items")): self.list_output_items,
+        }
+        for (route_method, pattern), handler in routes.items():
+            if route_method == method and len(pattern) == len(parts) and all(
+                p == "*" or p == part for p, part in zip(pattern, parts)
+            ):
+                ids = [part for p, part in zip(pattern, parts) if p == "*"]
+                try:
+                    handler(*ids)
+                except (BrokenPipeError, ConnectionResetError):
+                    pass
+                return
+        self._send_error(404, f"No mock route for {method} {'/'.join(parts)}")
+
+    # -- chat completions --------------------------------------------------
+
+    def create_chat_completion(self):
+        request = self._json_body()
+        rng = self.state.rng()
+        if self._injected_error(rng):
+            return
+
+        messages = request.get("messages", [])
+        generation = Generation(
+            self.state.config, rng,
+            max_tokens=request.get("max_completion_tokens") or request.get("max_tokens"),
+            fixed_text=_judge_reply(messages, rng),
+        )
+        prompt_tokens = sum(estimate_tokens(str(m.get("content", ""))) for m in messages)
+        cached_tokens = self.state.cached_tokens(messages)
+        if cached_tokens:
+            generation.ttft_s *= self.state.config.cached_ttft_factor
+        usage = {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": len(generation.tokens),
+            "total_tokens": prompt_tokens + len(generation.tokens),
+            "prompt_tokens_details": {"cached_tokens": cached_tokens},
+        }
+        completion_id = self.state.new_id("chatcmpl")
+        model = request.get("model", "mock-model")
+        created = int(time.time())
+
+        if not request.get("stream"):
+            time.sleep(generation.total_s)
+            self._send_json({
+                "id": completion_id,
+                "object": "chat.completion",
+                "created": created,
+                "model": model,
+                "choices": [{
+                    "index": 0,
+                    "message": {"role": "assistant", "content": generation.text},
+                    "finish_reason": "stop",
+                }],
+                "usage": usage,
+            })
+            return
+
+        def chunk(delta, finish_reason=None):
+            return {
+                "id": completion_id,
+                "object": "chat.completion.chunk",
+                "created": created,
+                "model": model,
+                "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+            }
+
+        self._start_stream()
+        self._send_event(chunk({"role": "assistant", "content": ""}))
+        for token in generation.timed_tokens():
+            self._send_event(chunk({"content": token}))
+        self._send_event(chunk({}, "stop"))
+        if (request.get("stream_options") or {}).get("include_usage"):
+            self._send_event({**chunk({}), "choices": [], "usage": usage})
+        self._send_event("[DONE]")
+        self._end_stream()
+
+    # -- conversations and responses -----------------------------------------
+
+    def create_conversation(self):
+        request = self._json_body()
+        conversation_id = self.state.new_id("conv")
+        with self.state.lock:
+            self.state.conversations[conversation_id] = list(request.get("items") or [])
+        self._send_json({
+            "id": conversation_id,
+            "object": "conversation",
+            "created_at": int(time.time()),
+            "metadata": request.get("metadata") or {},
+        })
+
+    def create_conversation_items(self, conversation_id):
+        request = self._json_body()
+        items = request.get("items") or []
+        with self.state.lock:
+            conversation = self.state.conversations.get(conversation_id)
+            if conversation is not None:
+                conversation.extend(items)
+        if conversation is None:
+            self._send_error(404, f"Conversation {conversation_id} not found")
+            return
+        data = [{"id": self.state.new_id("msg"), **item} for item in items]
+        self._send_json({
+            "object": "list",
+            "data": data,
+            "first_id": data[0]["id"] if data else None,
+            "last_id": data[-1]["id"] if data else None,
+            "has_more": False,
+        })
+
+    def create_response(self):
+        request = self._json_body()
+        rng = self.state.rng()
+        if self._injected_error(rng):
+            return
+
+        conversation = request.get("conversation")
+        if isinstance(conversation, dict):
+            conversation = conversation.get("id")
+        with self.state.lock:
+            history = list(self.state.conversations.get(conversation, []))
+        prompt_text = json.dumps(history) + json.dumps(request.get("input") or "")
+
+        generation = Generation(self.state.config, rng, max_tokens=request.get("max_output_tokens"))
+        input_tokens = estimate_tokens(prompt_text)
+        response_id = self.state.new_id("resp")
+        message_id = self.state.new_id("msg")
+
+        def response_object(status, text):
+            output = [] if status != "completed" else [{
+                "type": "message",
+                "id": message_id,
+                "role": "assistant",
+                "status": "completed",
+                "content": [{"type": "output_text", "text": text, "annotations": []}],
+            }]
+            return {
+                "id": response_id,
+                "object": "response",
+                "created_at": int(time.time()),
+                "status": status,
+                "model": request.get("model") or "mock-agent",
+                "output": output,
+                "usage": {
+                    "input_tokens": input_tokens,
+                    "input_tokens_details": {"cached_tokens": 0},
+                    "output_tokens": len(generation.tokens),
+                    "output_tokens_details": {"reasoning_tokens": 0},
+                    "total_tokens": input_tokens + len(generation.tokens),
+                } if status == "completed" else None,
+            }
+
+        if not request.get("stream"):
+            time.sleep(generation.total_s)
+            self._send_json(response_object("completed", generation.text))
+            return
+
+        sequence = itertools.count()
+        self._start_stream()
+        self._send_event(
+            {"type": "response.created", "sequence_number": next(sequence),
+             "response": response_object("in_progress", "")},
+            event="response.created",
+        )
+        for token in generation.timed_tokens():
+            self._send_event(
+                {"type": "response.output_text.delta", "sequence_number": next(sequence),
+                 "item_id": message_id, "output_index": 0, "content_index": 0, "delta": token},
+                event="response.output_text.delta",
+            )
+        self._send_event(
+            {"type": "response.completed", "sequence_number": next(sequence),
+             "response": response_object("completed", generation.text)},
+            event="response.completed",
+        )
+        self._end_stream()
+
+    # -- files ---------------------------------------------------------------
+
+    def create_file(self):
+        """Accept a multipart upload and keep the JSONL rows for eval runs."""
+        body = self._body()
+        message = email.parser.BytesParser().parsebytes(
+            f"Content-Type: {self.headers.get('Content-Type')}\r\n\r\n".encode("utf-8") + body
+        )
+        filename, content, purpose = "upload.jsonl", b"", ""
+        for part in message.get_payload() if message.is_multipart() else []:
+            name = part.get_param("name", header="content-disposition")
+            if name == "file":
+                filename = part.get_filename() or filename
+                content = part.get_payload(decode=True) or b""
+            elif name == "purpose":
+                purpose = (part.get_payload(decode=True) or b"").decode("utf-8")
+
+        rows = [json.loads(line) for line in content.decode("utf-8").splitlines() if line.strip()]
+        file_id = self.state.new_id("file")
+        with self.state.lock:
+            self.state.files[file_id] = rows
+        self._send_json({
+            "id": file_id,
+            "object": "file",
+            "bytes": len(content),
+            "created_at": int(time.time()),
+            "filename": filename,
+            "purpose": purpose or "evals",
+            "status": "processed",
+        })
+
+    # -- evals ---------------------------------------------------------------
+
+    def _list(self, objects, query, key="created_at"):
+        """Cursor-paginated list response (order / after / limit)."""
+        ordered = sorted(objects, key=lambda o: (o[key], o["id"]), reverse=query.get("order", "asc") == "desc")
+        after = query.get("after")
+        if after:
+            ids = [o["id"] for o in ordered]
+            ordered = ordered[ids.index(after) + 1:] if after in ids else []
+        limit = int(query.get("limit", 20))
+        page = ordered[:limit]
+        return {
+            "object": "list",
+            "data": page,
+            "first_id": page[0]["id"] if page else None,
+            "last_id": page[-1]["id"] if page else None,
+            "has_more": len(ordered) > limit,
+        }
+
+    def create_eval(self):
+        request = self._json_body()
+        eval_object = {
+            "id": self.state.new_id("eval"),
+            "object": "eval",
+            "created_at": time.time(),
+            "name": request.get("name"),
+            "metadata": request.get("metadata") or {},
+            "data_source_config": request.get("data_source_config"),
+            "testing_criteria": request.get("testing_criteria") or [],
+        }
+        with self.state.lock:
+            self.state.evals[eval_object["id"]] = eval_object
+        self._send_json(eval_object)
+
+    def list_evals(self):
+        with self.state.lock:
+            evals = list(self.state.evals.values())
+        self._send_json(self._list(evals, self._query()))
+
+    def retrieve_eval(self, eval_id):
+        eval_object = self.state.evals.get(eval_id)
+        if eval_object is None:
+            self._send_error(404, f"Eval {eval_id} not found")
+            return
+        self._send_json(eval_object)
+
+    def create_run(self, eval_id):
+        request = self._json_body()
+        eval_object = self.state.evals.get(eval_id)
+        source = ((request.get("data_source") or {}).get("source") or {})
+        rows = self.state.files.get(source.get("id"))
+        if eval_object is None or rows is None:
+            self._send_error(404, f"Eval {eval_id} or file {source.get('id')} not found")
+            return
+
+        config = self.state.config
+        rng = self.state.rng()
+        now = time.time()
+        batch_s = config.eval_item_ms / 1000
+        run = {
+            "id": self.state.new_id("evalrun"),
+            "object": "eval.run",
+            "eval_id": eval_id,
+            "name": request.get("name"),
+            "created_at": now,
+            "rows": rows,
+            "criteria": [c.get("name") for c in eval_object["testing_criteria"]],
+            # Item i is scored in batch i // parallelism
+            "started_at": now + config.eval_queue_s,
+            "done_at": [
+                now + config.eval_queue_s + (i // config.eval_parallelism + 1) * batch_s
+                for i in range(len(rows))
+            ],
+            "item_errors": [rng.random() < config.eval_item_error_rate for _ in rows],
+            "fails": rng.random() < config.eval_run_failure_rate,
+        }
+        with self.state.lock:
+            self.state.runs[run["id"]] = run
+        self._send_json(self._run_view(run))
+
+    def _run_view(self, run):
+        """Public run object for the current time."""
+        now = time.time()
+        done = sum(1 for t in run["done_at"] if t <= now)
+        if now < run["started_at"]:
+            status = "queued"
+        elif run["fails"] and done >= len(run["rows"]) // 2:
+            status, done = "failed", len(run["rows"]) // 2
+        elif done < len(run["rows"]):
+            status = "in_progress"
+        else:
+            status = "completed"
+
+        errored = sum(run["item_errors"][:done])
+        passed = sum(
+            1 for i in range(done)
+            if not run["item_errors"][i] and all(
+                _item_score(run["rows"][i], name, self.state.config.seed) >= 3 for name in run["criteria"]
+            )
+        )
+        return {
+            "id": run["id"],
+            "object": "eval.run",
+            "eval_id": run["eval_id"],
+            "name": run["name"],
+            "created_at": int(run["created_at"]),
+            "status": status,
+            "error": {"code": "mock_failure", "message": "Injected run failure"} if status == "failed" else None,
+            "report_url": f"http://{self.headers.get('Host')}/evals/{run['eval_id']}/runs/{run['id']}",
+            "result_counts": {
+                "total": len(run["rows"]),
+                "passed": passed,
+                "failed": done - errored - passed,
+                "errored": errored,
+            },
+        }
+
+    def retrieve_run(self, eval_id, run_id):
+        run = self.state.runs.get(run_id)
+        if run is None or run["eval_id"] != eval_id:
+            self._send_error(404, f"Run {run_id} not found")
+            return
+        self._send_json(self._run_view(run))
+
+    def list_output_items(self, eval_id, run_id):
+        run = self.state.runs.get(run_id)
+        if run is None or run["eval_id"] != eval_id:
+            self._send_error(404, f"Run {run_id} not found")
+            return
+
+        view = self._run_view(run)
+        counts = view["result_counts"]
+        done = counts["passed"] + counts["failed"] + counts["errored"]
+        seed = self.state.config.seed
+        items = []
+        for i in range(done):
+            row = run["rows"][i]
+            results = [] if run["item_errors"][i] else [
+                {"name": name, "type": "azure_ai_evaluator", "score": score, "passed": score >= 3}
+                for name in run["criteria"]
+                for score in [_item_score(row, name, seed)]
+            ]
+            items.append({
+                "id": f"outputitem_{run_id}_{i:08d}",
+                "object": "eval.run.output_item",
+                "created_at": int(run["done_at"][i]),
+                "eval_id": eval_id,
+                "run_id": run_id,
+                "datasource_item_id": i,
+                "datasource_item": row,
+                "status": "error" if run["item_errors"][i] else (
+                    "pass" if all(r["passed"] for r in results) else "fail"
+                ),
+                "results": results,
+            })
+        self._send_json(self._list(items, self._query()))
+
+
+class MockServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, config):
+        super().__init__(address, MockHandler)
+        self.state = MockState(config)
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        description="Local OpenAI-compatible stand-in server with configurable latency, "
+                    "token counts and injected errors.",
+        epilog="Then run e.g.: LOCAL_OPENAI_BASE_URL=http://127.0.0.1:8000/v1 "
+               "python src/tests/run_batch_tests.py offline --concurrency 8",
+    )
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--seed", type=int, default=0, help="Seed for every random draw (default: 0)")
+    parser.add_argument("--ttft-ms", type=float, default=300.0,
+                        help="Median time to first token in ms (default: 300)")
+    parser.add_argument("--ttft-sigma", type=float, default=0.3,
+                        help="Log-normal sigma of time to first token (default: 0.3)")
+    parser.add_argument("--itl-ms", type=float, default=15.0,
+                        help="Mean inter-token latency in ms (default: 15)")
+    parser.add_argument("--tokens-mean", type=float, default=150.0,
+                        help="Mean output tokens per reply (default: 150)")
+    parser.add_argument("--tokens-std", type=float, default=40.0,
+                        help="Standard deviation of output tokens (default: 40)")
+    parser.add_argument("--error-rate-429", type=float, default=0.0,
+                        help="Fraction of generation requests answered with 429 (default: 0)")
+    parser.add_argument("--error-rate-500", type=float, default=0.0,
+                        help="Fraction of generation requests answered with 500 (default: 0)")
+    parser.add_argument("--retry-after", type=float, default=1.0,
+                        help="Retry-After seconds sent with injected 429s (default: 1)")
+    parser.add_argument("--eval-queue-s", type=float, default=2.0,
+                        help="Seconds an eval run waits in the queue (default: 2)")
+    parser.add_argument("--eval-item-ms", type=float, default=200.0,
+                        help="Time to score one eval item in ms (default: 200)")
+    parser.add_argument("--eval-parallelism", type=int, default=8,
+                        help="Eval items scored at once per run (default: 8)")
+    parser.add_argument("--eval-item-error-rate", type=float, default=0.0,
+                        help="Fraction of eval items that error (default: 0)")
+    parser.add_argument("--eval-run-failure-rate", type=float, default=0.0,
+                        help="Fraction of eval runs that fail halfway (default: 0)")
+    parser.add_argument("--prefix-cache-min-tokens", type=int, default=1024,
+                        help="Shortest system prompt (tokens) the prefix cache keeps (default: 1024)")
+    parser.add_argument("--cached-ttft-factor", type=float, default=0.5,
+                        help="Time-to-first-token multiplier on a prefix cache hit (default: 0.5)")
+    parser.add_argument("--verbose", action="store_true", help="Log every request")
+    return parser
+
+
+def serve(config):
+    """Run the server until interrupted."""
+    server = MockServer((config.host, config.port), config)
+    print(f"Mock OpenAI server listening on http://{config.host}:{server.server_port}/v1")
+    print(f"  TTFT ~{config.ttft_ms:g}ms, {config.itl_ms:g}ms/token, "
+          f"{config.tokens_mean:g}±{config.tokens_std:g} tokens, "
+          f"429 rate {config.error_rate_429:g}, 500 rate {config.error_rate_500:g}, seed {config.seed}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    serve(build_parser().parse_args())
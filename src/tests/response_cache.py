@@ -0,0 +1,108 @@
+"""
+On-disk, content-addressed cache of agent responses for run_batch_tests.py.
+
+Entries are keyed by (agent name, agent version, model, prompt hash), so a
+prompt is only sent to the agent again when the prompt text or the agent
+definition changes. The cache is bounded by total size on disk and evicts the
+least recently used entries first (file mtime is refreshed on every hit).
+"""
+import os
+import json
+import hashlib
+from pathlib import Path
+
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+
+
+def _sha256(text):
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    """
+    Size-bounded LRU cache of result records, one JSON file per entry.
+
+    Args:
+        cache_dir: Directory holding the cache entries (created if missing)
+        max_bytes: Total size budget; older entries are evicted beyond it
+        read: When False, lookups always miss but new results are still stored
+              (used by --refresh to re-run everything and overwrite the cache)
+    """
+
+    def __init__(self, cache_dir, max_bytes=DEFAULT_MAX_BYTES, read=True):
+        self.cache_dir = Path(cache_dir)
+        self.max_bytes = max_bytes
+        self.read = read
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        # path -> size in bytes, used to track the total without rescanning
+        self._sizes = {p: p.stat().st_size for p in self.cache_dir.glob("*.json")}
+
+    @staticmethod
+    def make_key(agent_name, agent_version, model, prompt_text):
+        """Content address for one (agent, version, model, prompt) combination."""
+        return _sha256(json.dumps([agent_name, agent_version, model, _sha256(prompt_text)]))
+
+    def _path(self, key):
+        return self.cache_dir / f"{key}.json"
+
+    def get(self, key):
+        """Return the cached result record for key, or None on a miss."""
+        path = self._path(key)
+        if not self.read or path not in self._sizes:
+            self.misses += 1
+            return None
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            # Unreadable or half-written entry: drop it and treat as a miss
+            self._remove(path)
+            self.misses += 1
+            return None
+        os.utime(path)  # mark as most recently used
+        self.hits += 1
+        return entry
+
+    def put(self, key, entry):
+        """Store a result record and evict old entries if over budget."""
+        path = self._path(key)
+        tmp_path = path.with_suffix(".tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(entry, f)
+        os.replace(tmp_path, path)
+        self._sizes[path] = path.stat().st_size
+        self._evict()
+
+    def _remove(self, path):
+        try:
+            path.unlink()
+        except FileNotFoundError:
+            pass
+        self._sizes.pop(path, None)
+
+    def _evict(self):
+        total = sum(self._sizes.values())
+        if total <= self.max_bytes:
+            return
+        # Oldest mtime first = least recently used
+        for path in sorted(self._sizes, key=lambda p: p.stat().st_mtime if p.exists() else 0):
+            if total <= self.max_bytes:
+                break
+            total -= self._sizes[path]
+            self._remove(path)
+            self.evictions += 1
+
+    def stats(self):
+        """Counters saved alongside the results in agent-responses.json."""
+        return {
+            "enabled": True,
+            "refresh": not self.read,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "entries": len(self._sizes),
+            "size_bytes": sum(self._sizes.values()),
+        }
@@ -4,21 +4,59 @@ Run all test prompts against the deployed agent and store responses.
 This script:
 1. Loads test prompts from test-prompts/ directory
 2. Retrieves the most recent agent version by name
-3. Calls the agent for each prompt
-4. Captures responses with metadata
-5. Saves results to experiments/{experiment-name}/agent-responses.json
+3. Serves unchanged (agent version, prompt) pairs from the local response cache
+4. Prints a pre-flight token/time estimate for the remaining prompts (token_accounting.py)
+5. Calls the agent for each remaining prompt (sequentially, or concurrently with --concurrency)
+6. Captures responses with metadata
+7. Saves results to experiments/{experiment-name}/agent-responses.json
+
+Set LOCAL_OPENAI_BASE_URL (e.g. http://127.0.0.1:8000/v1, see
+mock_openai_server.py) to run offline against a local OpenAI-compatible server.
 """
 import os
 import json
+import time
+import random
+import asyncio
+import argparse
+from contextlib import asynccontextmanager
 from pathlib import Path
+from types import SimpleNamespace
 from datetime import datetime
 from dotenv import load_dotenv
 from azure.identity import DefaultAzureCredential
+from azure.identity.aio import DefaultAzureCredential as AsyncDefaultAzureCredential
 from azure.ai.projects import AIProjectClient
+from azure.ai.projects.aio import AIProjectClient as AsyncAIProjectClient
+from openai import APIConnectionError, APIStatusError, AsyncOpenAI, OpenAI
+
+from latency_stats import summarize_latencies
+from response_cache import DEFAULT_MAX_BYTES, ResponseCache
+from token_accounting import estimate_batch, format_estimate
 
 # Load environment variables from .env file
 load_dotenv()
 
+# How many times each API call of a prompt is retried after a 429 / 5xx / connection error.
+# The OpenAI clients are created with max_retries=0 so this is the only retry loop.
+MAX_RETRIES = 5
+
+# Upper bound on the wait between attempts, for both backoff and Retry-After
+MAX_RETRY_DELAY_S = 30
+
+# Local OpenAI-compatible server used instead of the Foundry project when set
+LOCAL_OPENAI_BASE_URL = os.environ.get("LOCAL_OPENAI_BASE_URL")
+LOCAL_OPENAI_API_KEY = os.environ.get("LOCAL_OPENAI_API_KEY", "not-needed")
+
+# Completion tokens projected per prompt when no previous responses are cached
+DEFAULT_COMPLETION_TOKENS = 500
+
+# Model used to pick the tokenizer when the agent definition does not name one
+DEFAULT_MODEL = os.environ.get("MODEL_NAME", "gpt-4.1")
+
+# Responses from previous runs, keyed by agent name/version, model and prompt hash
+CACHE_DIR = Path(__file__).parent.parent.parent / '.cache' / 'agent-responses'
+
 def load_test_prompts(test_prompts_dir):
     """Load all test prompt files from the test-prompts directory."""
     prompts = {}
@@ -28,12 +66,240 @@ def load_test_prompts(test_prompts_dir):
             prompts[test_name] = f.read().strip()
     return prompts
 
-def run_batch_tests(experiment_name):
+def _local_agent(agent_name):
+    """Stand-in for the Foundry agent object when LOCAL_OPENAI_BASE_URL is set."""
+    latest = SimpleNamespace(version=f"local:{LOCAL_OPENAI_BASE_URL}", definition=SimpleNamespace(model="local"))
+    return SimpleNamespace(name=agent_name, id=f"local-{agent_name}", object="agent",
+                           versions=SimpleNamespace(latest=latest))
+
+@asynccontextmanager
+async def async_openai_client(**client_options):
+    """
+    AsyncOpenAI client for the Foundry project, or for LOCAL_OPENAI_BASE_URL when set.
+
+    client_options (e.g. max_retries) are passed to the AsyncOpenAI constructor.
+    """
+    if LOCAL_OPENAI_BASE_URL:
+        async with AsyncOpenAI(
+            base_url=LOCAL_OPENAI_BASE_URL, api_key=LOCAL_OPENAI_API_KEY, **client_options,
+        ) as openai_client:
+            yield openai_client
+        return
+
+    async with AsyncDefaultAzureCredential() as credential, AsyncAIProjectClient(
+        endpoint=os.environ["AZURE_AI_PROJECT_ENDPOINT"],
+        credential=credential,
+    ) as project_client:
+        async with project_client.get_openai_client(**client_options) as openai_client:
+            yield openai_client
+
+def _is_retryable(error):
+    """Return True for throttling (429), server (5xx) and connection errors."""
+    if isinstance(error, APIStatusError):
+        return error.status_code == 429 or error.status_code >= 500
+    return isinstance(error, APIConnectionError)
+
+def _retry_delay(error, attempt):
+    """
+    Seconds to wait before the next attempt: Retry-After if sent, else exponential
+    backoff with jitter. Either way at most MAX_RETRY_DELAY_S.
+    """
+    response = getattr(error, "response", None)
+    retry_after = response.headers.get("retry-after") if response is not None else None
+    try:
+        return min(max(float(retry_after), 0.0), MAX_RETRY_DELAY_S)
+    except (TypeError, ValueError):
+        return min(2 ** attempt, MAX_RETRY_DELAY_S) * (0.5 + random.random() / 2)
+
+def user_message(prompt_text):
+    """Conversation item carrying the user prompt."""
+    return {
+        "type": "message",
+        "role": "user",
+        "content": prompt_text,
+    }
+
+def agent_reference(agent_name):
+    """extra_body that routes a Responses API call to the named agent."""
+    return {"agent_reference": {"name": agent_name, "type": "agent_reference"}}
+
+def _build_result(test_name, prompt_text, response, latency):
+    """Turn a Responses API response into the result record saved to agent-responses.json."""
+    # Extract text from the response; fall back to str(response) if shape changes
+    try:
+        response_text = response.output[0].content[0].text
+    except Exception:
+        response_text = str(response)
+
+    usage = getattr(response, "usage", None)
+    token_usage = {
+        "prompt_tokens": getattr(usage, "input_tokens", None) if usage else None,
+        "completion_tokens": getattr(usage, "output_tokens", None) if usage else None,
+        "total_tokens": getattr(usage, "total_tokens", None) if usage else None,
+    }
+
+    return {
+        "test_name": test_name,
+        "prompt": prompt_text,
+        "response": response_text,
+        "token_usage": token_usage,
+        "run_id": getattr(response, "id", None),
+        "latency_s": round(latency, 3),
+    }
+
+def _build_error_result(test_name, prompt_text, error):
+    """Result record for a prompt that still failed after all retries."""
+    return {
+        "test_name": test_name,
+        "prompt": prompt_text,
+        "response": None,
+        "token_usage": {"prompt_tokens": None, "completion_tokens": None, "total_tokens": None},
+        "run_id": None,
+        "latency_s": None,
+        "error": f"{error.__class__.__name__}: {error}",
+    }
+
+def _with_retries(test_name, call):
+    """Return call(), retrying it on transient errors; the last error is re-raised."""
+    for attempt in range(MAX_RETRIES + 1):
+        try:
+            return call()
+        except Exception as error:
+            if attempt == MAX_RETRIES or not _is_retryable(error):
+                raise
+            delay = _retry_delay(error, attempt)
+            print(f"   {test_name}: {error.__class__.__name__}, retrying in {delay:.1f}s")
+            time.sleep(delay)
+
+async def _with_retries_async(test_name, call):
+    """Async counterpart of _with_retries(); call() returns an awaitable."""
+    for attempt in range(MAX_RETRIES + 1):
+        try:
+            return await call()
+        except Exception as error:
+            if attempt == MAX_RETRIES or not _is_retryable(error):
+                raise
+            delay = _retry_delay(error, attempt)
+            print(f"   {test_name}: {error.__class__.__name__}, retrying in {delay:.1f}s")
+            await asyncio.sleep(delay)
+
+def run_prompt(openai_client, agent_name, test_name, prompt_text):
+    """
+    Send one prompt to the agent in a fresh conversation, retrying transient errors.
+
+    Each call is retried on its own, so a throttled response is re-requested
+    in the same conversation instead of opening a new one. latency_s covers
+    every attempt, backoff included.
+    """
+    start = time.perf_counter()
+    try:
+        # Create a fresh conversation for this test
+        conversation = _with_retries(test_name, openai_client.conversations.create)
+
+        # Send user message into the conversation
+        _with_retries(test_name, lambda: openai_client.conversations.items.create(
+            conversation_id=conversation.id,
+            items=[user_message(prompt_text)],
+        ))
+
+        # Ask the agent to respond using the Responses API with agent_reference
+        response = _with_retries(test_name, lambda: openai_client.responses.create(
+            conversation=conversation.id,
+            extra_body=agent_reference(agent_name),
+            input="",
+        ))
+    except Exception as error:
+        return _build_error_result(test_name, prompt_text, error)
+    return _build_result(test_name, prompt_text, response, time.perf_counter() - start)
+
+async def run_prompt_async(openai_client, agent_name, test_name, prompt_text):
+    """Async counterpart of run_prompt() for use with an AsyncOpenAI client."""
+    start = time.perf_counter()
+    try:
+        conversation = await _with_retries_async(test_name, openai_client.conversations.create)
+        await _with_retries_async(test_name, lambda: openai_client.conversations.items.create(
+            conversation_id=conversation.id,
+            items=[user_message(prompt_text)],
+        ))
+        response = await _with_retries_async(test_name, lambda: openai_client.responses.create(
+            conversation=conversation.id,
+            extra_body=agent_reference(agent_name),
+            input="",
+        ))
+    except Exception as error:
+        return _build_error_result(test_name, prompt_text, error)
+    return _build_result(test_name, prompt_text, response, time.perf_counter() - start)
+
+async def _run_prompts_concurrently(test_prompts, agent_name, concurrency):
+    """
+    Run every prompt with at most `concurrency` requests in flight.
+
+    Results are returned in the same order as test_prompts.
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+    completed = 0
+
+    # SDK retries off: run_prompt_async() does its own backoff
+    async with async_openai_client(max_retries=0) as openai_client:
+
+        async def run_one(test_name, prompt_text):
+            nonlocal completed
+            async with semaphore:
+                result = await run_prompt_async(openai_client, agent_name, test_name, prompt_text)
+            completed += 1
+            _print_result(result, prefix=f"[{completed}/{len(test_prompts)}] ")
+            return result
+
+        return await asyncio.gather(
+            *(run_one(test_name, prompt_text) for test_name, prompt_text in test_prompts.items())
+        )
+
+def _print_result(result, prefix=""):
+    if result.get("cached"):
+        print(f"   {prefix}{result['test_name']}: served from cache "
+              f"({result['token_usage']['total_tokens']} tokens)")
+    elif result.get("error"):
+        print(f"   {prefix}{result['test_name']}: FAILED ({result['error']})")
+    else:
+        print(f"   {prefix}{result['test_name']}: response captured "
+              f"({result['token_usage']['total_tokens']} tokens, {result['latency_s']:.2f}s)")
+
+def _agent_version_and_model(agent):
+    """Return (version, model) of the agent's latest version, or None for unknown fields."""
+    latest = getattr(agent.versions, "latest", None)
+    definition = getattr(latest, "definition", None)
+    return getattr(latest, "version", None), getattr(definition, "model", None)
+
+def _preflight_estimate(agent, agent_model, pending, cached_results, tpm_quota):
+    """
+    Token and time estimate for the prompts about to be sent.
+
+    Completion tokens are projected from the average of the cached responses
+    when there are any, otherwise DEFAULT_COMPLETION_TOKENS per prompt.
+    """
+    latest = getattr(agent.versions, "latest", None)
+    instructions = getattr(getattr(latest, "definition", None), "instructions", None)
+    system = [{"role": "system", "content": instructions}] if instructions else []
+    requests = [system + [{"role": "user", "content": prompt_text}] for prompt_text in pending.values()]
+
+    completions = [r["token_usage"]["completion_tokens"] for r in cached_results
+                   if r["token_usage"].get("completion_tokens")]
+    completion_tokens = round(sum(completions) / len(completions)) if completions else DEFAULT_COMPLETION_TOKENS
+    return estimate_batch(requests, agent_model or DEFAULT_MODEL, completion_tokens, tpm_quota)
+
+def run_batch_tests(experiment_name, concurrency=1, use_cache=True, refresh=False,
+                    cache_max_bytes=DEFAULT_MAX_BYTES, tpm_quota=None, estimate_only=False):
     """
     Run all test prompts against the deployed agent and capture responses.
     
     Args:
         experiment_name: Name of the experiment (e.g., 'optimized-concise')
+        concurrency: Maximum number of prompts in flight at once (1 = sequential)
+        use_cache: Serve unchanged (agent version, prompt) pairs from the local cache
+        refresh: Ignore cached responses but store the new ones (implies use_cache)
+        cache_max_bytes: Size budget of the cache directory before LRU eviction
+        tpm_quota: Tokens-per-minute quota of the deployment, used for the time estimate
+        estimate_only: Print the pre-flight estimate and exit without calling the agent
     """
     # Load test prompts
     test_prompts_dir = Path(__file__).parent / 'test-prompts'
@@ -46,24 +312,30 @@ def run_batch_tests(experiment_name):
     print(f"Running {len(test_prompts)} test prompts for experiment: {experiment_name}")
     print("=" * 80)
     
-    # Create project client
-    client = AIProjectClient(
-        endpoint=os.environ["AZURE_AI_PROJECT_ENDPOINT"],
-        credential=DefaultAzureCredential(),
-    )
-
-    openai_client = client.get_openai_client()
-    
     # Get the agent by name (assumes trail_guide_agent.py already created it)
     agent_name = os.environ.get("AGENT_NAME", "trail-guide")
-    
-    # List agents and find the one with our name
-    agents = client.agents.list()
-    agent = None
-    for a in agents:
-        if a.name == agent_name:
-            agent = a
-            break
+
+    if LOCAL_OPENAI_BASE_URL:
+        print(f"Using local OpenAI-compatible server: {LOCAL_OPENAI_BASE_URL}")
+        openai_client = OpenAI(base_url=LOCAL_OPENAI_BASE_URL, api_key=LOCAL_OPENAI_API_KEY, max_retries=0)
+        agent = _local_agent(agent_name)
+    else:
+        # Create project client
+        client = AIProjectClient(
+            endpoint=os.environ["AZURE_AI_PROJECT_ENDPOINT"],
+            credential=DefaultAzureCredential(),
+        )
+
+        # SDK retries off: run_prompt() does its own backoff
+        openai_client = client.get_openai_client(max_retries=0)
+
+        # List agents and find the one with our name
+        agents = client.agents.list()
+        agent = None
+        for a in agents:
+            if a.name == agent_name:
+                agent = a
+                break
     
     if not agent:
         print(f"Error: No agent found with name '{agent_name}'")
@@ -83,54 +355,67 @@ def run_batch_tests(experiment_name):
         "test_results": []
     }
     
-    # Run each test prompt
+    # Look up previous responses for this exact agent version and prompt text
+    agent_version, agent_model = _agent_version_and_model(agent)
+    cache = None
+    if use_cache and agent_version is None:
+        print("Agent version unknown - response cache disabled for this run.")
+    elif use_cache:
+        cache = ResponseCache(CACHE_DIR, max_bytes=cache_max_bytes, read=not refresh)
+
+    results_by_test = {}
+    pending = {}
+    cache_keys = {}
     for test_name, prompt_text in test_prompts.items():
-        print(f"\nTesting: {test_name}")
-        print(f"   Prompt: {prompt_text[:60]}...")
+        entry = None
+        if cache:
+            cache_keys[test_name] = ResponseCache.make_key(agent.name, agent_version, agent_model, prompt_text)
+            entry = cache.get(cache_keys[test_name])
+        if entry:
+            results_by_test[test_name] = {**entry, "cached": True}
+        else:
+            pending[test_name] = prompt_text
 
-        # Create a fresh conversation for this test
-        conversation = openai_client.conversations.create()
+    if results_by_test:
+        print(f"\n{len(results_by_test)} of {len(test_prompts)} prompts unchanged - served from cache")
+        for result in results_by_test.values():
+            _print_result(result)
 
-        # Send user message into the conversation
-        openai_client.conversations.items.create(
-            conversation_id=conversation.id,
-            items=[{
-                "type": "message",
-                "role": "user",
-                "content": prompt_text,
-            }],
-        )
+    estimate = _preflight_estimate(agent, agent_model, pending, results_by_test.values(), tpm_quota)
+    results["preflight_estimate"] = estimate
+    print()
+    print(format_estimate(estimate))
+    if estimate_only:
+        return None
 
-        # Ask the agent to respond using the Responses API with agent_reference
-        response = openai_client.responses.create(
-            conversation=conversation.id,
-            extra_body={"agent_reference": {"name": agent_name, "type": "agent_reference"}},
-            input="",
+    # Run each remaining test prompt
+    start = time.perf_counter()
+    if concurrency > 1 and pending:
+        print(f"\nSending {len(pending)} prompts with up to {concurrency} requests in flight...")
+        fresh_results = asyncio.run(
+            _run_prompts_concurrently(pending, agent_name, concurrency)
         )
+    else:
+        fresh_results = []
+        for test_name, prompt_text in pending.items():
+            print(f"\nTesting: {test_name}")
+            print(f"   Prompt: {prompt_text[:60]}...")
+            result = run_prompt(openai_client, agent_name, test_name, prompt_text)
+            fresh_results.append(result)
+            _print_result(result)
+    wall_time = time.perf_counter() - start
 
-        # Extract text from the response; fall back to str(response) if shape changes
-        try:
-            response_text = response.output[0].content[0].text
-        except Exception:
-            response_text = str(response)
-
-        usage = getattr(response, "usage", None)
-        token_usage = {
-            "prompt_tokens": getattr(usage, "input_tokens", None) if usage else None,
-            "completion_tokens": getattr(usage, "output_tokens", None) if usage else None,
-            "total_tokens": getattr(usage, "total_tokens", None) if usage else None,
-        }
-
-        # Store result
-        results["test_results"].append({
-            "test_name": test_name,
-            "prompt": prompt_text,
-            "response": response_text,
-            "token_usage": token_usage,
-            "run_id": getattr(response, "id", None),
-        })
-
-        print(f"   Response captured ({token_usage['total_tokens']} tokens)")
+    for result in fresh_results:
+        results_by_test[result["test_name"]] = result
+        if cache and not result.get("error"):
+            cache.put(cache_keys[result["test_name"]], result)
+
+    # Keep results in the same order as the test prompts
+    results["test_results"] = [results_by_test[test_name] for test_name in test_prompts]
+    results["cache"] = cache.stats() if cache else {"enabled": False}
+
+    latencies = [r["latency_s"] for r in fresh_results if r["latency_s"] is not None]
+    results["run_stats"] = {"concurrency": concurrency, **summarize_latencies(latencies, wall_time)}
     
     # Save results to experiment folder (at repository root)
     repo_root = Path(__file__).parent.parent.parent
@@ -144,19 +429,68 @@ def run_batch_tests(experiment_name):
     print("\n" + "=" * 80)
     print(f"Results saved to: {results_file}")
     print(f"Total tests: {len(test_prompts)}")
-    print(f"Total tokens used: {sum(r['token_usage']['total_tokens'] for r in results['test_results'] if r['token_usage']['total_tokens'])}")
+    failed = [r for r in results["test_results"] if r.get("error")]
+    if failed:
+        print(f"Failed tests: {len(failed)} (see 'error' in {results_file.name})")
+    print(f"Total tokens used: {sum(r['token_usage']['total_tokens'] for r in fresh_results if r['token_usage']['total_tokens'])}")
+    if cache:
+        cache_stats = results["cache"]
+        print(f"Cache: {cache_stats['hits']} hits, {cache_stats['misses']} misses "
+              f"({sum(r['token_usage']['total_tokens'] or 0 for r in results['test_results'] if r.get('cached'))} tokens saved)")
+    stats = results["run_stats"]
+    if stats["count"]:
+        print(f"Wall time: {stats['wall_time_s']:.1f}s | Throughput: {stats['throughput_per_s']} prompts/s")
+        print(f"Latency: p50 {stats['p50_s']}s | p95 {stats['p95_s']}s")
+    else:
+        print(f"Wall time: {stats['wall_time_s']:.1f}s | Throughput: - (no prompts sent)")
     
     return results_file
 
 if __name__ == "__main__":
-    import sys
-    
-    if len(sys.argv) != 2:
-        print("Usage: python run-batch-tests.py <experiment-name>")
-        print("\nExample:")
-        print("  python run-batch-tests.py optimized-concise")
-        print("\nNote: Make sure to run 'python src/agents/trail_guide_agent/trail_guide_agent.py' first")
-        sys.exit(1)
-    
-    experiment_name = sys.argv[1]
-    run_batch_tests(experiment_name)
+    parser = argparse.ArgumentParser(
+        description="Run all test prompts against the deployed agent and store responses.",
+        epilog="Example: python src/tests/run_batch_tests.py optimized-concise --concurrency 8\n\n"
+               "Note: Make sure to run 'python src/agents/trail_guide_agent/trail_guide_agent.py' first",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+    )
+    parser.add_argument("experiment_name", help="Name of the experiment (e.g., 'optimized-concise')")
+    parser.add_argument(
+        "--concurrency", type=int, default=1,
+        help="Maximum number of prompts in flight at once (default: 1, sequential)",
+    )
+    parser.add_argument(
+        "--no-cache", action="store_true",
+        help="Do not read or write the local response cache",
+    )
+    parser.add_argument(
+        "--refresh", action="store_true",
+        help="Ignore cached responses, send every prompt and update the cache",
+    )
+    parser.add_argument(
+        "--cache-max-mb", type=float, default=DEFAULT_MAX_BYTES / (1024 * 1024),
+        help="Size budget of the response cache before least recently used entries are evicted",
+    )
+    parser.add_argument(
+        "--tpm", type=int, default=int(os.environ.get("TPM_QUOTA", 0)) or None,
+        help="Tokens-per-minute quota of the model deployment, for the time estimate (default: $TPM_QUOTA)",
+    )
+    parser.add_argument(
+        "--estimate-only", action="store_true",
+        help="Print the pre-flight token and time estimate without calling the agent",
+    )
+    args = parser.parse_args()
+
+    if args.concurrency < 1:
+        parser.error("--concurrency must be at least 1")
+    if args.no_cache and args.refresh:
+        parser.error("--no-cache and --refresh cannot be combined")
+
+    run_batch_tests(
+        args.experiment_name,
+        concurrency=args.concurrency,
+        use_cache=not args.no_cache,
+        refresh=args.refresh,
+        cache_max_bytes=int(args.cache_max_mb * 1024 * 1024),
+        tpm_quota=args.tpm,
+        estimate_only=args.estimate_only,
+    )
@@ -0,0 +1,398 @@
+"""
+Micro-benchmarks for the code paths that do real CPU work on our side.
+
+This script:
+1. Generates synthetic data at realistic-to-large sizes (product catalogs,
+   100k-span traces, 1M evaluation scores, large datasets and prompt sets)
+2. Times each hot path over repeated runs and reports calls/s, items/s and
+   peak memory (tracemalloc)
+3. Optionally saves the results as a baseline, or compares against one and
+   exits non-zero when a benchmark got slower than --threshold
+
+Benchmarks:
+  match_products      match_products() from the monitoring_agent lab script
+  span_tree_build     build_span_tree() used by check_traces.py
+  span_tree_render    print_trees() used by check_traces.py
+  span_tree_traces    build + render of ~10k small traces (many operations)
+  span_tree_deep      build + render of one deep chain of spans
+  score_aggregation   ScoreAggregator over streamed output items
+  score_analytics     percentiles + bootstrap CIs (score_analytics.py)
+  dataset_load        load_jsonl() + content_version() on a large JSONL file
+  prompt_load         load_test_prompts() over a large test-prompts directory
+
+Usage:
+    python src/tests/run_benchmarks.py                      # run everything
+    python src/tests/run_benchmarks.py --save-baseline      # record a baseline
+    python src/tests/run_benchmarks.py --compare            # fail on regressions
+    python src/tests/run_benchmarks.py --only span --scale 0.1
+"""
+import io
+import ast
+import sys
+import json
+import random
+import argparse
+import platform
+import statistics
+import tempfile
+import time
+import tracemalloc
+from itertools import cycle, islice
+from pathlib import Path
+from types import SimpleNamespace
+from datetime import datetime
+
+from opentelemetry import trace
+
+REPO_ROOT = Path(__file__).parent.parent.parent
+sys.path.insert(0, str(REPO_ROOT / "src" / "evaluators"))
+
+from eval_cache import content_version                      # noqa: E402
+from local_evaluator import load_jsonl                      # noqa: E402
+from score_aggregator import ScoreAggregator                # noqa: E402
+from score_analytics import analyze_scores                  # noqa: E402
+from span_tree import build_span_tree, print_trees          # noqa: E402
+from run_batch_tests import load_test_prompts               # noqa: E402
+
+LAB_SCRIPT = REPO_ROOT / "src" / "agents" / "monitoring_agent" / "solution-prompt.py"
+BASELINE_FILE = REPO_ROOT / ".cache" / "benchmarks" / "baseline.json"
+METRICS = ("intent_resolution", "relevance", "groundedness")
+
+# name -> setup(scale, rng, workdir) returning (items, fn); fn() is the timed call
+BENCHMARKS = {}
+
+
+def benchmark(name):
+    """Register a benchmark setup function under name."""
+    def register(setup):
+        BENCHMARKS[name] = setup
+        return setup
+    return register
+
+
+# ---------------------------------------------------------------------------
+# Synthetic data
+# ---------------------------------------------------------------------------
+
+ADJECTIVES = ("Alpine", "Waterproof", "Ultralight", "Thermal", "Insulated", "Compact",
+              "Carbon", "Trail", "Summit", "Rugged", "Breathable", "Packable")
+NOUNS = ("Boots", "Backpack", "Poles", "Tent", "Lantern", "Shoes", "Bottle", "Harness",
+         "Jacket", "Gloves", "Stove", "Filter", "Map", "Compass", "Headlamp", "Bivy")
+
+
+def make_catalog(size, rng):
+    """Product names like 'Rugged Carbon Headlamp 42'."""
+    return [
+        f"{rng.choice(ADJECTIVES)} {rng.choice(ADJECTIVES)} {rng.choice(NOUNS)} {i}"
+        for i in range(size)
+    ]
+
+
+def make_gear(size, rng):
+    """Recommended gear phrases, about half of which match some product."""
+    words = [w.lower() for w in NOUNS] + ["sunscreen", "snacks", "permit", "whistle"]
+    return [f"{rng.choice(('light', 'warm', 'sturdy'))} {rng.choice(words)}" for _ in range(size)]
+
+
+def make_span_rows(size, rng, traces=4):
+    """
+    Rows shaped like check_traces.py's query output for `size` spans.
+
+    Each trace is a random recursive tree: every span's parent is a random
+    earlier span of the same trace, which gives realistic depth (~log n) and
+    fan-out.
+    """
+    rows = []
+    per_trace = max(1, size // traces)
+    for t in range(traces):
+        op_id = f"op{t:04d}"
+        ids = []
+        for i in range(per_trace):
+            span_id = f"{t:04d}{i:08x}"
+            parent = rng.choice(ids) if ids else f"external-{t}"
+            ids.append(span_id)
+            has_tokens = i % 3 == 0
+            rows.append((
+                span_id, parent, op_id, f"v{t + 1}_span_{i}", rng.randint(5, 5000), True,
+                f"v{t + 1}", f"test-{i % 50}",
+                str(rng.randint(100, 2000)) if has_tokens else "",
+                str(rng.randint(50, 1000)) if has_tokens else "",
+                str(rng.randint(50, 1000)) if has_tokens else "",
+            ))
+    return rows
+
+
+def make_output_items(size, rng):
+    """Stream of cloud-shaped output items with 1-5 scores for every metric (1% errored)."""
+    weights = (0.05, 0.10, 0.20, 0.35, 0.30)
+    for _ in range(size):
+        if rng.random() < 0.01:
+            yield SimpleNamespace(status="error", error="synthetic", results=[])
+            continue
+        scores = rng.choices(range(1, 6), weights=weights, k=len(METRICS))
+        yield SimpleNamespace(
+            status="completed",
+            results=[SimpleNamespace(name=m, score=float(s), passed=s >= 3) for m, s in zip(METRICS, scores)],
+        )
+
+
+def load_lab_function(path, name, namespace):
+    """
+    Compile one top-level function out of a lab script without running the script.
+
+    The lab scripts connect to Azure at import time, so only the function's
+    own source is executed, against the given globals.
+    """
+    tree = ast.parse(path.read_text(encoding="utf-8"))
+    node = next(n for n in tree.body if isinstance(n, ast.FunctionDef) and n.name == name)
+    module = ast.Module(body=[node], type_ignores=[])
+    exec(compile(module, str(path), "exec"), namespace)
+    return namespace[name]
+
+
+# ---------------------------------------------------------------------------
+# Benchmarks
+# ---------------------------------------------------------------------------
+
+@benchmark("match_products")
+def bench_match_products(scale, rng, workdir):
+    catalog = make_catalog(max(1, int(10_000 * scale)), rng)
+    gear = make_gear(max(1, int(50 * scale)), rng)
+    namespace = {"tracer": trace.get_tracer(__name__), "mock_product_catalog": catalog}
+    match_products = load_lab_function(LAB_SCRIPT, "match_products", namespace)
+    return len(catalog) * len(gear), lambda: match_products(gear)
+
+
+@benchmark("span_tree_build")
+def bench_span_tree_build(scale, rng, workdir):
+    rows = make_span_rows(max(1, int(100_000 * scale)), rng)
+    return len(rows), lambda: build_span_tree(rows)
+
+
+@benchmark("span_tree_render")
+def bench_span_tree_render(scale, rng, workdir):
+    spans, children, roots = build_span_tree(make_span_rows(max(1, int(100_000 * scale)), rng))
+
+    def render():
+        print_trees(spans, children, roots, file=io.StringIO())
+
+    return len(spans), render
+
+
+@benchmark("span_tree_traces")
+def bench_span_tree_traces(scale, rng, workdir):
+    size = max(1, int(100_000 * scale))
+    rows = make_span_rows(size, rng, traces=max(1, size // 10))
+
+    def build_and_render():
+        spans, children, roots = build_span_tree(rows)
+        print_trees(spans, children, roots, file=io.StringIO())
+
+    return len(rows), build_and_render
+
+
+@benchmark("span_tree_deep")
+def bench_span_tree_deep(scale, rng, workdir):
+    # Output grows with depth² (indentation), so the chain stays a few thousand long
+    depth = max(1, int(5_000 * scale))
+    rows = [
+        (f"{i:08x}", f"{i - 1:08x}" if i else "external-0", "op0000", f"span_{i}",
+         rng.randint(5, 5000), True, "v1", "", "", "", "")
+        for i in range(depth)
+    ]
+
+    def build_and_render():
+        spans, children, roots = build_span_tree(rows)
+        print_trees(spans, children, roots, file=io.StringIO())
+
+    return len(rows), build_and_render
+
+
+@benchmark("score_aggregation")
+def bench_score_aggregation(scale, rng, workdir):
+    size = max(1, int(1_000_000 * scale))
+    # Cycle a pre-built pool so the timing is the aggregation, not item creation
+    pool = list(make_output_items(min(size, 10_000), rng))
+
+    def aggregate():
+        with ScoreAggregator(METRICS) as aggregator:
+            aggregator.consume(islice(cycle(pool), size))
+        return aggregator
+
+    return size, aggregate
+
+
+@benchmark("score_analytics")
+def bench_score_analytics(scale, rng, workdir):
+    size = max(1, int(1_000_000 * scale))
+    with ScoreAggregator(METRICS) as aggregator:
+        aggregator.consume(make_output_items(size, rng))
+    return size, lambda: analyze_scores(aggregator.analytics_inputs())
+
+
+@benchmark("dataset_load")
+def bench_dataset_load(scale, rng, workdir):
+    size = max(1, int(100_000 * scale))
+    path = workdir / "dataset.jsonl"
+    with open(path, "w", encoding="utf-8") as f:
+        for i in range(size):
+            f.write(json.dumps({
+                "query": f"What gear do I need for hike {i}?",
+                "response": " ".join(rng.choice(NOUNS).lower() for _ in range(60)),
+                "ground_truth": " ".join(rng.choice(NOUNS).lower() for _ in range(30)),
+            }) + "\n")
+
+    def load():
+        content_version(path)
+        return load_jsonl(path)
+
+    return size, load
+
+
+@benchmark("prompt_load")
+def bench_prompt_load(scale, rng, workdir):
+    size = max(1, int(2_000 * scale))
+    prompt_dir = workdir / "test-prompts"
+    prompt_dir.mkdir()
+    for i in range(size):
+        (prompt_dir / f"prompt-{i:05d}.txt").write_text(
+            " ".join(rng.choice(NOUNS).lower() for _ in range(80)), encoding="utf-8"
+        )
+    return size, lambda: load_test_prompts(prompt_dir)
+
+
+# ---------------------------------------------------------------------------
+# Runner
+# ---------------------------------------------------------------------------
+
+def measure(fn, items, min_time=1.0, min_runs=3, max_runs=50):
+    """
+    Time fn() until min_time has passed (at least min_runs, at most max_runs).
+
+    One untimed warm-up call comes first; peak memory is taken from a
+    separate tracemalloc-instrumented call so tracing doesn't skew timings.
+    """
+    fn()
+    times = []
+    started = time.perf_counter()
+    while len(times) < max_runs and (len(times) < min_runs or time.perf_counter() - started < min_time):
+        t0 = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - t0)
+
+    tracemalloc.start()
+    fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    median = statistics.median(times)
+    return {
+        "items": items,
+        "runs": len(times),
+        "median_s": round(median, 6),
+        "min_s": round(min(times), 6),
+        "ops_per_s": round(1 / median, 3) if median else None,
+        "items_per_s": round(items / median, 1) if median else None,
+        "peak_mb": round(peak / (1024 * 1024), 2),
+    }
+
+
+def compare(results, baseline, threshold):
+    """Return a list of (name, slowdown) for benchmarks slower than baseline by > threshold."""
+    regressions = []
+    for name, result in results.items():
+        base = baseline.get("results", {}).get(name)
+        if not base or base["items"] != result["items"]:
+            continue
+        slowdown = result["median_s"] / base["median_s"] - 1
+        result["vs_baseline"] = round(slowdown, 4)
+        if slowdown > threshold:
+            regressions.append((name, slowdown))
+    return regressions
+
+
+def print_table(results):
+    print(f"\n{'Benchmark':<20} {'items':>10} {'runs':>5} {'median':>11} {'calls/s':>10} "
+          f"{'items/s':>13} {'peak MB':>9} {'vs base':>9}")
+    print("-" * 93)
+    for name, r in results.items():
+        delta = f"{r['vs_baseline'] * 100:+.1f}%" if "vs_baseline" in r else "-"
+        print(f"{name:<20} {r['items']:>10,} {r['runs']:>5} {r['median_s'] * 1000:>9.2f}ms "
+              f"{r['ops_per_s']:>10,.2f} {r['items_per_s']:>13,.0f} {r['peak_mb']:>9.2f} {delta:>9}")
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Micro-benchmarks for local hot paths, with optional baseline comparison.",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="Benchmarks: " + ", ".join(BENCHMARKS),
+    )
+    parser.add_argument("--only", action="append", default=[],
+                        help="Run only benchmarks whose name contains this text (repeatable)")
+    parser.add_argument("--scale", type=float, default=1.0,
+                        help="Multiply every data size by this factor (default: 1.0)")
+    parser.add_argument("--min-time", type=float, default=1.0,
+                        help="Minimum seconds of timed runs per benchmark (default: 1.0)")
+    parser.add_argument("--seed", type=int, default=0, help="Seed for the synthetic data (default: 0)")
+    parser.add_argument("--baseline", type=Path, default=BASELINE_FILE,
+                        help=f"Baseline file (default: {BASELINE_FILE.relative_to(REPO_ROOT)})")
+    parser.add_argument("--save-baseline", action="store_true", help="Save these results as the baseline")
+    parser.add_argument("--compare", action="store_true",
+                        help="Compare against the baseline and exit 1 on regressions")
+    parser.add_argument("--threshold", type=float, default=0.2,
+                        help="Slowdown that counts as a regression, as a fraction (default: 0.2)")
+    parser.add_argument("--output", type=Path, help="Also write the results to this JSON file")
+    args = parser.parse_args()
+
+    selected = [name for name in BENCHMARKS if not args.only or any(o in name for o in args.only)]
+    if not selected:
+        parser.error(f"--only matched no benchmark (available: {', '.join(BENCHMARKS)})")
+
+    print(f"Running {len(selected)} benchmark(s) at scale {args.scale:g}")
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        for name in selected:
+            workdir = Path(tmp) / name
+            workdir.mkdir()
+            print(f"  {name}...", end=" ", flush=True)
+            items, fn = BENCHMARKS[name](args.scale, random.Random(args.seed), workdir)
+            results[name] = measure(fn, items, min_time=args.min_time)
+            print(f"{results[name]['median_s'] * 1000:.1f}ms")
+
+    report = {
+        "timestamp": datetime.now().isoformat(),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "scale": args.scale,
+        "seed": args.seed,
+        "results": results,
+    }
+
+    regressions = []
+    if args.compare:
+        if not args.baseline.exists():
+            parser.error(f"No baseline at {args.baseline} - run with --save-baseline first")
+        baseline = json.loads(args.baseline.read_text(encoding="utf-8"))
+        regressions = compare(results, baseline, args.threshold)
+
+    print_table(results)
+
+    if args.output:
+        args.output.write_text(json.dumps(report, indent=2), encoding="utf-8")
+        print(f"\nResults saved to: {args.output}")
+    if args.save_baseline:
+        args.baseline.parent.mkdir(parents=True, exist_ok=True)
+        args.baseline.write_text(json.dumps(report, indent=2), encoding="utf-8")
+        print(f"\nBaseline saved to: {args.baseline}")
+
+    if regressions:
+        print(f"\nREGRESSIONS (slower than baseline by more than {args.threshold:.0%}):")
+        for name, slowdown in regressions:
+            print(f"  {name}: {slowdown:+.1%}")
+        raise SystemExit(1)
+    if args.compare:
+        print(f"\nNo regressions against {args.baseline}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,397 @@
+"""
+Load test the deployed trail guide agent.
+
+This script:
+1. Loads test prompts from test-prompts/ directory (cycled for the whole test)
+2. Sends them through the same Responses API path as run_batch_tests.py
+   (fresh conversation -> user message -> responses.create with agent_reference)
+3. Generates load either open loop (--rps: requests arrive at a target rate,
+   whether or not earlier ones have finished) or closed loop (--users: each
+   virtual user sends its next request as soon as the previous one returns)
+4. Ramps load up over --ramp-up seconds and discards requests started during
+   the first --warm-up seconds
+5. Saves throughput, error rate and latency percentiles (p50/p95/p99, plus
+   time to first token with --stream) to experiments/{experiment-name}/load-test.json
+   and load-test.txt
+
+Requests are never retried, so throttling (429) shows up in the error rate
+instead of being hidden in the latency.
+"""
+import os
+import json
+import time
+import random
+import asyncio
+import argparse
+from collections import Counter
+from itertools import cycle
+from pathlib import Path
+from datetime import datetime
+from dotenv import load_dotenv
+from openai import APIStatusError
+
+from latency_stats import latency_distribution
+from run_batch_tests import agent_reference, async_openai_client, load_test_prompts, user_message
+
+# Load environment variables from .env file
+load_dotenv()
+
+TEST_PROMPTS_DIR = Path(__file__).parent / 'test-prompts'
+
+async def send_request(openai_client, agent_name, prompt_text, stream=False):
+    """
+    Send one prompt to the agent and time it.
+
+    Returns (latency_s, ttft_s, usage). ttft_s is the time until the first
+    output text delta and is only measured with stream=True; both timings
+    include creating the conversation, as a user of the agent would see them.
+    """
+    start = time.perf_counter()
+    conversation = await openai_client.conversations.create()
+    await openai_client.conversations.items.create(
+        conversation_id=conversation.id,
+        items=[user_message(prompt_text)],
+    )
+
+    if not stream:
+        response = await openai_client.responses.create(
+            conversation=conversation.id,
+            extra_body=agent_reference(agent_name),
+            input="",
+        )
+        return time.perf_counter() - start, None, getattr(response, "usage", None)
+
+    ttft = None
+    usage = None
+    events = await openai_client.responses.create(
+        conversation=conversation.id,
+        extra_body=agent_reference(agent_name),
+        input="",
+        stream=True,
+    )
+    async for event in events:
+        if event.type == "response.output_text.delta" and ttft is None:
+            ttft = time.perf_counter() - start
+        elif event.type == "response.completed":
+            usage = getattr(event.response, "usage", None)
+        elif event.type in ("response.failed", "error"):
+            raise RuntimeError(f"stream reported {event.type}")
+    return time.perf_counter() - start, ttft, usage
+
+def _error_label(error):
+    """Short label used to group errors in the report (e.g. 'HTTP 429')."""
+    if isinstance(error, APIStatusError):
+        return f"HTTP {error.status_code}"
+    return error.__class__.__name__
+
+class LoadTest:
+    """
+    Drives one load test and collects a sample per request.
+
+    Args:
+        openai_client: AsyncOpenAI client from the project client
+        agent_name: Agent to route requests to
+        test_prompts: test name -> prompt text, cycled in order
+        duration: Measured seconds after warm-up
+        warm_up: Seconds at the start whose requests are not measured
+        ramp_up: Seconds over which load rises linearly to the target
+        stream: Stream responses to measure time to first token
+        timeout: Per-request timeout in seconds
+    """
+
+    def __init__(self, openai_client, agent_name, test_prompts, duration, warm_up=0.0,
+                 ramp_up=0.0, stream=False, timeout=120.0):
+        self.openai_client = openai_client
+        self.agent_name = agent_name
+        self.prompts = cycle(test_prompts.items())
+        self.duration = duration
+        self.warm_up = warm_up
+        self.ramp_up = ramp_up
+        self.stream = stream
+        self.timeout = timeout
+        self.samples = []
+        self.dropped = 0
+        self.in_flight = 0
+        self.started_at = None
+        self.finished_at = None
+
+    def elapsed(self):
+        return time.perf_counter() - self.started_at
+
+    @property
+    def end_time(self):
+        return self.warm_up + self.duration
+
+    async def one_request(self):
+        """Send the next prompt and record a sample."""
+        test_name, prompt_text = next(self.prompts)
+        offset = self.elapsed()
+        self.in_flight += 1
+        sample = {"test_name": test_name, "start_s": round(offset, 3), "measured": offset >= self.warm_up}
+        try:
+            latency, ttft, usage = await asyncio.wait_for(
+                send_request(self.openai_client, self.agent_name, prompt_text, self.stream),
+                timeout=self.timeout,
+            )
+            sample.update(
+                ok=True,
+                latency_s=round(latency, 3),
+                ttft_s=round(ttft, 3) if ttft is not None else None,
+                total_tokens=getattr(usage, "total_tokens", None) if usage else None,
+            )
+        except Exception as error:
+            sample.update(ok=False, error=_error_label(error),
+                          latency_s=round(self.elapsed() - offset, 3))
+        finally:
+            self.in_flight -= 1
+        self.samples.append(sample)
+
+    async def run_open_loop(self, rps, max_in_flight, poisson=True, seed=0):
+        """
+        Start requests at `rps` per second regardless of completions.
+
+        Arrivals are Poisson (exponential gaps) or evenly spaced. The rate
+        rises linearly over the ramp-up. When max_in_flight requests are
+        outstanding a new arrival is dropped and counted, never delayed:
+        delaying it would quietly turn the test into a closed loop.
+        """
+        rng = random.Random(seed)
+        tasks = set()
+        self.started_at = time.perf_counter()
+        expected = 0.0
+        next_arrival = 0.0
+        while next_arrival < self.end_time:
+            await asyncio.sleep(max(0.0, next_arrival - self.elapsed()))
+            if self.in_flight >= max_in_flight:
+                if next_arrival >= self.warm_up:
+                    self.dropped += 1
+            else:
+                task = asyncio.create_task(self.one_request())
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+
+            expected += rng.expovariate(1.0) if poisson else 1.0
+            next_arrival = self._arrival_time(expected, rps)
+        if tasks:
+            await asyncio.wait(tasks)
+        self.finished_at = time.perf_counter()
+
+    def _arrival_time(self, expected, rps):
+        """
+        Time at which `expected` arrivals are due under a linear ramp to rps.
+
+        Inverts the cumulative arrival count rps * t^2 / (2 * ramp_up) during
+        the ramp (rps * t afterwards), so the rate follows the ramp exactly
+        instead of being sampled at each arrival.
+        """
+        ramp_arrivals = rps * self.ramp_up / 2
+        if expected <= ramp_arrivals:
+            return (2 * self.ramp_up * expected / rps) ** 0.5
+        return self.ramp_up + (expected - ramp_arrivals) / rps
+
+    async def run_closed_loop(self, users, think_time=0.0):
+        """
+        Run `users` virtual users, each sending requests back to back.
+
+        Users start evenly spaced over the ramp-up. Each waits think_time
+        seconds between receiving a response and sending its next request.
+        """
+        self.started_at = time.perf_counter()
+
+        async def virtual_user(index):
+            await asyncio.sleep(self.ramp_up * index / users)
+            while self.elapsed() < self.end_time:
+                await self.one_request()
+                if think_time:
+                    await asyncio.sleep(think_time)
+
+        await asyncio.gather(*(virtual_user(i) for i in range(users)))
+        self.finished_at = time.perf_counter()
+
+    def report(self):
+        """Aggregate the measured samples into the report dict."""
+        measured = [s for s in self.samples if s["measured"]]
+        ok = [s for s in measured if s["ok"]]
+        # Throughput counts successful responses over the measured window
+        window = None
+        if self.finished_at:
+            window = max(self.finished_at - self.started_at - self.warm_up, 1e-9)
+        return {
+            "requests": len(measured),
+            "succeeded": len(ok),
+            "failed": len(measured) - len(ok),
+            "dropped": self.dropped,
+            "error_rate": round((len(measured) - len(ok)) / len(measured), 4) if measured else None,
+            "errors": dict(Counter(s["error"] for s in measured if not s["ok"])),
+            "measured_window_s": round(window, 3) if window else None,
+            "throughput_per_s": round(len(ok) / window, 3) if window else None,
+            "latency": latency_distribution(s["latency_s"] for s in ok),
+            "ttft": latency_distribution(s["ttft_s"] for s in ok if s.get("ttft_s") is not None)
+                    if self.stream else None,
+            "total_tokens": sum(s["total_tokens"] or 0 for s in ok),
+            "warm_up_requests": len(self.samples) - len(measured),
+        }
+
+def format_report(config, report):
+    """Plain-text version of the report."""
+    lines = [
+        "Trail Guide Agent - Load Test",
+        "=" * 80,
+        f"Experiment : {config['experiment']}",
+        f"Agent      : {config['agent_name']}",
+        f"Mode       : " + (
+            f"open loop, {config['rps']} req/s ({config['arrival']} arrivals)"
+            if config["mode"] == "open" else
+            f"closed loop, {config['users']} virtual users (think time {config['think_time_s']}s)"
+        ),
+        f"Timing     : {config['warm_up_s']}s warm-up, {config['ramp_up_s']}s ramp-up, "
+        f"{config['duration_s']}s measured",
+        "",
+        f"Requests   : {report['requests']} measured "
+        f"({report['succeeded']} ok, {report['failed']} failed, {report['dropped']} dropped)",
+        f"Error rate : {report['error_rate'] * 100:.2f}%" if report["error_rate"] is not None else "Error rate : -",
+        f"Throughput : {report['throughput_per_s']} responses/s",
+    ]
+    for label, errors in report["errors"].items():
+        lines.append(f"  {label:<24} {errors}")
+
+    def distribution_line(title, dist):
+        if not dist or not dist["count"]:
+            return f"{title} : -"
+        return (f"{title} : p50 {dist['p50_s']}s | p95 {dist['p95_s']}s | p99 {dist['p99_s']}s | "
+                f"mean {dist['mean_s']}s | max {dist['max_s']}s")
+
+    lines.append(distribution_line("Latency   ", report["latency"]))
+    if report["ttft"] is not None:
+        lines.append(distribution_line("TTFT      ", report["ttft"]))
+    lines.append(f"Tokens     : {report['total_tokens']}")
+    return "\n".join(lines) + "\n"
+
+async def _run(config, test_prompts):
+    # Same client as run_batch_tests (the Foundry project, or LOCAL_OPENAI_BASE_URL
+    # when set), minus the SDK's automatic retries
+    async with async_openai_client(max_retries=0) as openai_client:
+        load_test = LoadTest(
+            openai_client,
+            config["agent_name"],
+            test_prompts,
+            duration=config["duration_s"],
+            warm_up=config["warm_up_s"],
+            ramp_up=config["ramp_up_s"],
+            stream=config["stream"],
+            timeout=config["timeout_s"],
+        )
+        if config["mode"] == "open":
+            await load_test.run_open_loop(
+                config["rps"], config["max_in_flight"],
+                poisson=config["arrival"] == "poisson", seed=config["seed"],
+            )
+        else:
+            await load_test.run_closed_loop(config["users"], config["think_time_s"])
+        return load_test
+
+def run_load_test(experiment_name, rps=None, users=None, duration=60.0, warm_up=10.0,
+                  ramp_up=10.0, think_time=0.0, stream=False, arrival="poisson",
+                  max_in_flight=256, timeout=120.0, seed=0):
+    """
+    Run a load test against the deployed agent and save the report.
+
+    Exactly one of rps (open loop) or users (closed loop) must be given.
+    """
+    test_prompts = load_test_prompts(TEST_PROMPTS_DIR)
+    if not test_prompts:
+        print(f"No test prompts found in {TEST_PROMPTS_DIR}")
+        return
+
+    config = {
+        "experiment": experiment_name,
+        "timestamp": datetime.now().isoformat(),
+        "agent_name": os.environ.get("AGENT_NAME", "trail-guide"),
+        "mode": "open" if rps else "closed",
+        "rps": rps,
+        "arrival": arrival,
+        "max_in_flight": max_in_flight,
+        "users": users,
+        "think_time_s": think_time,
+        "duration_s": duration,
+        "warm_up_s": warm_up,
+        "ramp_up_s": ramp_up,
+        "stream": stream,
+        "timeout_s": timeout,
+        "seed": seed,
+        "prompts": len(test_prompts),
+    }
+
+    print(f"Load testing agent '{config['agent_name']}' for experiment: {experiment_name}")
+    print(f"Total time: {warm_up + duration:.0f}s ({warm_up:.0f}s warm-up), "
+          f"{len(test_prompts)} prompts cycled")
+    print("=" * 80)
+
+    load_test = asyncio.run(_run(config, test_prompts))
+    report = load_test.report()
+    text = format_report(config, report)
+
+    repo_root = Path(__file__).parent.parent.parent
+    experiment_dir = repo_root / 'experiments' / experiment_name
+    experiment_dir.mkdir(parents=True, exist_ok=True)
+
+    json_file = experiment_dir / 'load-test.json'
+    with open(json_file, 'w') as f:
+        json.dump({"config": config, "report": report, "samples": load_test.samples}, f, indent=2)
+    text_file = experiment_dir / 'load-test.txt'
+    text_file.write_text(text, encoding="utf-8")
+
+    print(text)
+    print(f"Report saved to: {json_file} and {text_file.name}")
+    return json_file
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Load test the deployed agent with an open- or closed-loop generator.",
+        epilog="Examples:\n"
+               "  python src/tests/run_load_test.py baseline --rps 2 --duration 120\n"
+               "  python src/tests/run_load_test.py baseline --users 8 --stream\n\n"
+               "Note: Make sure to run 'python src/agents/trail_guide_agent/trail_guide_agent.py' first",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+    )
+    parser.add_argument("experiment_name", help="Name of the experiment (e.g., 'optimized-concise')")
+    load = parser.add_mutually_exclusive_group(required=True)
+    load.add_argument("--rps", type=float, help="Open loop: target requests per second")
+    load.add_argument("--users", type=int, help="Closed loop: number of virtual users")
+    parser.add_argument("--duration", type=float, default=60.0, help="Measured seconds after warm-up (default: 60)")
+    parser.add_argument("--warm-up", type=float, default=10.0,
+                        help="Seconds at the start whose requests are not measured (default: 10)")
+    parser.add_argument("--ramp-up", type=float, default=10.0,
+                        help="Seconds over which load rises to the target (default: 10)")
+    parser.add_argument("--think-time", type=float, default=0.0,
+                        help="Closed loop: seconds each user waits between requests (default: 0)")
+    parser.add_argument("--arrival", choices=("poisson", "constant"), default="poisson",
+                        help="Open loop: arrival process (default: poisson)")
+    parser.add_argument("--max-in-flight", type=int, default=256,
+                        help="Open loop: arrivals beyond this many outstanding requests are dropped (default: 256)")
+    parser.add_argument("--stream", action="store_true", help="Stream responses and measure time to first token")
+    parser.add_argument("--timeout", type=float, default=120.0, help="Per-request timeout in seconds (default: 120)")
+    parser.add_argument("--seed", type=int, default=0, help="Seed for Poisson arrivals (default: 0)")
+    args = parser.parse_args()
+
+    if args.rps is not None and args.rps <= 0:
+        parser.error("--rps must be positive")
+    if args.users is not None and args.users < 1:
+        parser.error("--users must be at least 1")
+    if args.duration <= 0:
+        parser.error("--duration must be positive")
+
+    run_load_test(
+        args.experiment_name,
+        rps=args.rps,
+        users=args.users,
+        duration=args.duration,
+        warm_up=args.warm_up,
+        ramp_up=args.ramp_up,
+        think_time=args.think_time,
+        stream=args.stream,
+        arrival=args.arrival,
+        max_in_flight=args.max_in_flight,
+        timeout=args.timeout,
+        seed=args.seed,
+    )
@@ -7,52 +7,135 @@ This script:
 3. Runs all test prompts against each version using direct chat completions
 4. Wraps each version in a named trace span for side-by-side comparison
 5. Captures token usage, latency, and response data per prompt
+6. Records latency and token throughput as OpenTelemetry metrics, tagged by
+   prompt version, test name and model, so dashboards can chart pre-aggregated
+   percentiles instead of scanning every span
+
+The version x prompt matrix runs on a thread pool; set MONITORING_CONCURRENCY
+to cap how many chat completions are in flight at once (default 4, 1 = serial).
+
+Set MONITORING_STREAM=1 to stream the completions and record time to first
+token, inter-token latency and output tokens/s on each test span.
+
+Every test span records response.cached_tokens (prompt tokens served from the
+provider's prompt-prefix cache), and a per-version report shows the cache hit
+ratio and the latency of cached vs uncached requests. Set MONITORING_PREFIX_ORDER=1
+to run one version at a time, after a warm-up request that seeds the cache
+with its system prompt, to measure how much prefix reuse saves. Note that
+Azure OpenAI only caches prompts of 1,024 tokens or more.
+
+Before sending anything, a pre-flight estimate of prompt and completion tokens
+for the whole matrix is printed (token_accounting.py); set TPM_QUOTA to the
+deployment's tokens-per-minute quota to also get the minimum run time, and
+MONITORING_COMPLETION_TOKENS to change the projected output per completion.
+
+Span batching, head/tail sampling and message content capture are set with
+TELEMETRY_* variables (see telemetry_config.py); exporter overhead and the
+estimated ingestion cost are printed at exit.
+
+Set LOCAL_OPENAI_BASE_URL (see mock_openai_server.py) to send the completions
+to a local OpenAI-compatible server instead; Azure Monitor is not configured
+in that case, so spans are only exported to TELEMETRY_TRACE_FILE if set.
+
+Set TELEMETRY_TRACE_FILE (e.g. .cache/traces.jsonl) to also write every span
+to a local file; `check_traces.py --file <path>` prints the trees from it.
 """
 
 import os
+import threading
 import time
 import uuid
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from pathlib import Path
 from dotenv import load_dotenv
 from azure.identity import DefaultAzureCredential, get_bearer_token_provider
 from azure.ai.projects import AIProjectClient
-from openai import AzureOpenAI
-from azure.monitor.opentelemetry import configure_azure_monitor
-from opentelemetry import trace
+from openai import AzureOpenAI, OpenAI
+from opentelemetry import metrics, trace
 from opentelemetry.instrumentation.openai_v2 import OpenAIInstrumentor
 
+from latency_stats import percentile, summarize_stream
+from telemetry_config import configure_telemetry
+from token_accounting import count_message_tokens, count_tokens, estimate_batch, format_estimate
+
 # Load environment variables from .env file
 load_dotenv()
 
-project_endpoint = os.environ["AZURE_AI_PROJECT_ENDPOINT"]
-openai_endpoint = os.environ["AZURE_OPENAI_ENDPOINT"]
 model_name = os.getenv("MODEL_NAME", "gpt-4.1")
+local_base_url = os.getenv("LOCAL_OPENAI_BASE_URL")
 
-# Connect to Azure AI Project and retrieve Application Insights connection string
-project_client = AIProjectClient(
-    endpoint=project_endpoint,
-    credential=DefaultAzureCredential(),
-)
-connection_string = project_client.telemetry.get_application_insights_connection_string()
-print(f"[DEBUG] Connection string: {connection_string}")
+if not local_base_url:
+    project_endpoint = os.environ["AZURE_AI_PROJECT_ENDPOINT"]
+    openai_endpoint = os.environ["AZURE_OPENAI_ENDPOINT"]
+
+    # Connect to Azure AI Project and retrieve Application Insights connection string
+    project_client = AIProjectClient(
+        endpoint=project_endpoint,
+        credential=DefaultAzureCredential(),
+    )
+    connection_string = project_client.telemetry.get_application_insights_connection_string()
+    print(f"[DEBUG] Connection string: {connection_string}")
 
-# Set as env var so all SDK components can discover it automatically
-os.environ["APPLICATIONINSIGHTS_CONNECTION_STRING"] = connection_string
+    # Set as env var so all SDK components can discover it automatically
+    os.environ["APPLICATIONINSIGHTS_CONNECTION_STRING"] = connection_string
 
-configure_azure_monitor(connection_string=connection_string)
+    configure_telemetry(connection_string=connection_string)
+else:
+    # No Azure Monitor; spans only go to TELEMETRY_TRACE_FILE when it is set
+    configure_telemetry()
 OpenAIInstrumentor().instrument()
 
 tracer = trace.get_tracer(__name__)
 
-token_provider = get_bearer_token_provider(
-    DefaultAzureCredential(),
-    "https://cognitiveservices.azure.com/.default",
+# Metric instruments; exported by the meter provider configure_telemetry set up
+meter = metrics.get_meter(__name__)
+request_duration = meter.create_histogram(
+    "trail_guide.request.duration",
+    unit="s",
+    description="Chat completion duration",
 )
-chat_client = AzureOpenAI(
-    azure_endpoint=openai_endpoint,
-    azure_ad_token_provider=token_provider,
-    api_version="2024-10-21",
+prompt_tokens_counter = meter.create_counter(
+    "trail_guide.tokens.prompt",
+    unit="{token}",
+    description="Prompt tokens sent",
 )
+completion_tokens_counter = meter.create_counter(
+    "trail_guide.tokens.completion",
+    unit="{token}",
+    description="Completion tokens received",
+)
+tokens_per_second = meter.create_histogram(
+    "trail_guide.tokens.per_second",
+    unit="{token}/s",
+    description="Output token throughput per completion",
+)
+cached_tokens_counter = meter.create_counter(
+    "trail_guide.tokens.cached",
+    unit="{token}",
+    description="Prompt tokens served from the prompt-prefix cache",
+)
+time_to_first_token = meter.create_histogram(
+    "trail_guide.request.time_to_first_token",
+    unit="s",
+    description="Time to first token (streaming mode only)",
+)
+
+if local_base_url:
+    print(f"Using local OpenAI-compatible server: {local_base_url}")
+    chat_client = OpenAI(
+        base_url=local_base_url,
+        api_key=os.getenv("LOCAL_OPENAI_API_KEY", "not-needed"),
+    )
+else:
+    token_provider = get_bearer_token_provider(
+        DefaultAzureCredential(),
+        "https://cognitiveservices.azure.com/.default",
+    )
+    chat_client = AzureOpenAI(
+        azure_endpoint=openai_endpoint,
+        azure_ad_token_provider=token_provider,
+        api_version="2024-10-21",
+    )
 
 # Paths to prompt versions and test prompts
 PROMPTS_DIR = Path(__file__).parent.parent / "agents" / "trail_guide_agent" / "prompts"
@@ -61,6 +144,29 @@ TEST_PROMPTS_DIR = Path(__file__).parent / "test-prompts"
 # Prompt versions to compare
 VERSIONS = ["v1", "v2", "v3"]
 
+# Max chat completions in flight across the whole version x prompt matrix
+MAX_CONCURRENCY = int(os.getenv("MONITORING_CONCURRENCY", "4"))
+
+# Stream completions and measure time to first token / inter-token latency
+STREAM_RESPONSES = os.getenv("MONITORING_STREAM", "").lower() in ("1", "true", "yes")
+
+# Run one version at a time, warming the prompt-prefix cache before each
+PREFIX_ORDER = os.getenv("MONITORING_PREFIX_ORDER", "").lower() in ("1", "true", "yes")
+
+# Prompt caching only applies from this many prompt tokens (Azure OpenAI)
+PREFIX_CACHE_MIN_TOKENS = 1024
+
+# Share of the input price saved on cached prompt tokens, for the cost estimate
+CACHED_TOKEN_DISCOUNT = float(os.getenv("MONITORING_CACHED_TOKEN_DISCOUNT", "0.75"))
+
+# Pre-flight estimate: projected completion tokens per test, and the
+# deployment's tokens-per-minute quota (unset = no time estimate)
+COMPLETION_TOKENS_ESTIMATE = int(os.getenv("MONITORING_COMPLETION_TOKENS", "500"))
+TPM_QUOTA = int(os.getenv("TPM_QUOTA", "0")) or None
+
+# Keeps each test's output block together when tests finish concurrently
+_print_lock = threading.Lock()
+
 
 def load_prompt(version: str) -> str:
     """Load a prompt version from the prompts directory."""
@@ -75,48 +181,321 @@ def load_test_prompts() -> dict:
     }
 
 
-def run_version(version: str, system_prompt: str, test_prompts: dict):
-    """Run all test prompts for a single prompt version, wrapped in a trace span."""
-    session_id = str(uuid.uuid4())
-    print(f"\n{'='*60}")
-    print(f"Running {version.upper()} — {len(test_prompts)} test prompts")
-    print(f"{'='*60}")
+def cached_prompt_tokens(usage) -> int:
+    """Prompt tokens the provider served from its prefix cache (0 when not reported)."""
+    details = getattr(usage, "prompt_tokens_details", None)
+    return getattr(details, "cached_tokens", None) or 0
+
+
+def warm_up(version, system_prompt, parent_context):
+    """
+    Send the version's system prompt once with a one-token reply, so the
+    provider's prefix cache holds it before the real tests run.
+    """
+    with tracer.start_as_current_span(f"{version}_warmup", context=parent_context) as span:
+        span.set_attribute("prompt.version", version)
+        span.set_attribute("request.warmup", True)
+        try:
+            response = chat_client.chat.completions.create(
+                model=model_name,
+                messages=[
+                    {"role": "system", "content": system_prompt},
+                    {"role": "user", "content": "Hi"},
+                ],
+                max_tokens=1,
+            )
+        except Exception as e:
+            print(f"\n  Warm-up [{version}] failed: {type(e).__name__}: {e}")
+            return
+        span.set_attribute("response.cached_tokens", cached_prompt_tokens(response.usage))
+
+
+def run_test_prompt(version, system_prompt, test_name, prompt_text, session_id, parent_context):
+    """
+    Run one test prompt in its own span under the version's root span.
+
+    parent_context carries the root span explicitly, because the worker
+    thread does not inherit the submitting thread's current span. The child
+    span is made current here, so the OpenAI instrumentation's spans nest
+    under it as well.
+    """
+    with tracer.start_as_current_span(f"{version}_{test_name}", context=parent_context) as span:
+        span.set_attribute("test.name", test_name)
+        span.set_attribute("prompt.version", version)
+        span.set_attribute("session.id", session_id)
+
+        messages = [
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": prompt_text},
+        ]
+        span.set_attribute("request.estimated_prompt_tokens", count_message_tokens(messages, model_name))
+        stream_stats = None
+        if STREAM_RESPONSES:
+            output, usage, duration, stream_stats = stream_completion(messages, span)
+        else:
+            start = time.time()
+            response = chat_client.chat.completions.create(
+                model=model_name,
+                messages=messages,
+            )
+            duration = time.time() - start
+
+            output = response.choices[0].message.content
+            usage = response.usage
+
+        span.set_attribute("response.duration_s", round(duration, 3))
+        span.set_attribute("response.prompt_tokens", usage.prompt_tokens)
+        span.set_attribute("response.completion_tokens", usage.completion_tokens)
+        span.set_attribute("response.total_tokens", usage.total_tokens)
+        cached_tokens = cached_prompt_tokens(usage)
+        span.set_attribute("response.cached_tokens", cached_tokens)
+
+    record_metrics(version, test_name, duration, usage, stream_stats)
+
+    with _print_lock:
+        print(f"\n  Test: {test_name} [{version}]")
+        print(f"    Duration : {duration:.2f}s")
+        if stream_stats:
+            print(f"    TTFT     : {stream_stats['ttft_s']}s | inter-token p50/p95: "
+                  f"{stream_stats['itl_p50_s']}s/{stream_stats['itl_p95_s']}s | "
+                  f"{stream_stats['tokens_per_s']} tokens/s")
+        print(f"    Tokens   : {usage.total_tokens} "
+              f"(prompt: {usage.prompt_tokens}, completion: {usage.completion_tokens}, "
+              f"cached: {cached_tokens})")
+        print(f"    Response : {output[:80]}...")
+
+    return {
+        "duration_s": duration,
+        "prompt_tokens": usage.prompt_tokens,
+        "cached_tokens": cached_tokens,
+        **(stream_stats or {}),
+    }
+
+
+def record_metrics(version, test_name, duration, usage, stream_stats=None):
+    """Record one completion on the metric instruments."""
+    attributes = {"prompt.version": version, "test.name": test_name, "model": model_name}
+    request_duration.record(duration, attributes)
+    prompt_tokens_counter.add(usage.prompt_tokens, attributes)
+    completion_tokens_counter.add(usage.completion_tokens, attributes)
+    cached_tokens_counter.add(cached_prompt_tokens(usage), attributes)
+
+    if stream_stats:
+        # Generation-phase throughput, so queueing before the first token doesn't count
+        rate = stream_stats.get("tokens_per_s")
+        if stream_stats.get("ttft_s") is not None:
+            time_to_first_token.record(stream_stats["ttft_s"], attributes)
+    else:
+        rate = usage.completion_tokens / duration if duration > 0 else None
+    if rate is not None:
+        tokens_per_second.record(rate, attributes)
+
+
+def stream_completion(messages, span):
+    """
+    Stream one chat completion and record its token timing on span.
+
+    Token usage arrives in the final chunk (stream_options.include_usage),
+    which has no choices. Adds the response.ttft_s, response.itl_p50_s,
+    response.itl_p95_s and response.tokens_per_s attributes, plus a
+    first_token event and a stream_complete event.
+
+    Returns (output, usage, duration_s, stream_stats).
+    """
+    start = time.perf_counter()
+    stream = chat_client.chat.completions.create(
+        model=model_name,
+        messages=messages,
+        stream=True,
+        stream_options={"include_usage": True},
+    )
+
+    parts = []
+    token_times = []
+    usage = None
+    for chunk in stream:
+        if chunk.usage is not None:
+            usage = chunk.usage
+        if chunk.choices and chunk.choices[0].delta.content:
+            now = time.perf_counter()
+            if not token_times:
+                span.add_event("first_token", {"ttft_s": round(now - start, 3)})
+            token_times.append(now)
+            parts.append(chunk.choices[0].delta.content)
+    end = time.perf_counter()
+
+    if usage is None:
+        raise RuntimeError("Stream ended without a usage chunk")
 
-    with tracer.start_as_current_span(f"trail_guide_{version}") as version_span:
+    stats = summarize_stream(start, token_times, end, usage.completion_tokens)
+    for key, value in stats.items():
+        if value is not None:
+            span.set_attribute(f"response.{key}", value)
+    span.add_event("stream_complete", {
+        "chunks": len(token_times),
+        "completion_tokens": usage.completion_tokens,
+    })
+    return "".join(parts), usage, end - start, stats
+
+
+def run_matrix(system_prompts: dict, test_prompts: dict, max_concurrency: int = MAX_CONCURRENCY,
+               prefix_order: bool = PREFIX_ORDER):
+    """
+    Run every test prompt against every prompt version in parallel.
+
+    With prefix_order, versions run one after another instead: a warm-up
+    request seeds the prefix cache with the version's system prompt, then all
+    of that version's tests run (still in parallel), so they share one cached
+    prefix rather than competing with other versions' prompts.
+
+    Each version gets a `trail_guide_{version}` root span, started when its
+    wave starts (so in prefix order it does not include the time spent on
+    earlier versions); every test runs in a child span of it, whichever
+    worker thread picks it up. A root span ends as soon as its own last test
+    finishes. A failed test is recorded on its
+    span and reported, without stopping the rest of the matrix.
+
+    Args:
+        system_prompts: version -> system prompt text
+        test_prompts: test name -> prompt text
+        max_concurrency: Max chat completions in flight at once
+        prefix_order: Run one version at a time, after a cache warm-up
+    """
+    roots = {}
+    remaining = {version: len(test_prompts) for version in system_prompts}
+
+    def start_root(version):
+        session_id = str(uuid.uuid4())
+        # Started but not made current: children attach through an explicit context
+        version_span = tracer.start_span(f"trail_guide_{version}")
         version_span.set_attribute("prompt.version", version)
         version_span.set_attribute("session.id", session_id)
         version_span.set_attribute("model", model_name)
+        roots[version] = (version_span, session_id, trace.set_span_in_context(version_span))
+
+    print(f"\n{'='*60}")
+    print(f"Running {', '.join(v.upper() for v in system_prompts)} — "
+          f"{len(test_prompts)} test prompts each, up to {max_concurrency} at a time"
+          f"{', one version at a time (prefix order)' if prefix_order else ''}")
+    print(f"{'='*60}")
 
-        for test_name, prompt_text in test_prompts.items():
-            print(f"\n  Test: {test_name}")
+    # One wave per version in prefix order, otherwise the whole matrix at once
+    waves = [[version] for version in system_prompts] if prefix_order else [list(system_prompts)]
 
-            with tracer.start_as_current_span(f"{version}_{test_name}") as span:
-                span.set_attribute("test.name", test_name)
-                span.set_attribute("prompt.version", version)
-                span.set_attribute("session.id", session_id)
+    failures = 0
+    results = {version: [] for version in system_prompts}
+    try:
+        with ThreadPoolExecutor(max_workers=max(1, max_concurrency)) as pool:
+            for wave in waves:
+                for version in wave:
+                    start_root(version)
+                if prefix_order:
+                    warm_up(wave[0], system_prompts[wave[0]], roots[wave[0]][2])
+                futures = {
+                    pool.submit(
+                        run_test_prompt,
+                        version, system_prompts[version], test_name, prompt_text,
+                        roots[version][1], roots[version][2],
+                    ): (version, test_name)
+                    for version in wave
+                    for test_name, prompt_text in test_prompts.items()
+                }
+                for future in as_completed(futures):
+                    version, test_name = futures[future]
+                    try:
+                        results[version].append(future.result())
+                    except Exception as e:
+                        failures += 1
+                        with _print_lock:
+                            print(f"\n  Test: {test_name} [{version}]")
+                            print(f"    Error    : {type(e).__name__}: {e}")
 
-                start = time.time()
-                response = chat_client.chat.completions.create(
-                    model=model_name,
-                    messages=[
-                        {"role": "system", "content": system_prompt},
-                        {"role": "user", "content": prompt_text},
-                    ],
-                )
-                duration = time.time() - start
+                    remaining[version] -= 1
+                    if remaining[version] == 0:
+                        roots[version][0].end()
+    finally:
+        # Never leave a root span open, even if the run was interrupted
+        for version_span, _, _ in roots.values():
+            if version_span.is_recording():
+                version_span.end()
 
-                output = response.choices[0].message.content
-                usage = response.usage
+    if failures:
+        print(f"\n{failures} test prompt(s) failed — see the spans for details.")
 
-                span.set_attribute("response.duration_s", round(duration, 3))
-                span.set_attribute("response.prompt_tokens", usage.prompt_tokens)
-                span.set_attribute("response.completion_tokens", usage.completion_tokens)
-                span.set_attribute("response.total_tokens", usage.total_tokens)
+    print_latency_summary(results)
+    print_prefix_cache_report(results, system_prompts)
 
-                print(f"    Duration : {duration:.2f}s")
-                print(f"    Tokens   : {usage.total_tokens} "
-                      f"(prompt: {usage.prompt_tokens}, completion: {usage.completion_tokens})")
-                print(f"    Response : {output[:80]}...")
+
+def print_latency_summary(results: dict):
+    """Print p50/p95 per version; adds TTFT and tokens/s when streaming."""
+    print(f"\n{'='*60}")
+    print("Latency by version (p50 / p95)")
+    print(f"{'='*60}")
+    for version, rows in results.items():
+        if not rows:
+            continue
+
+        def p(key, pct):
+            values = [row[key] for row in rows if row.get(key) is not None]
+            return f"{percentile(values, pct):.2f}" if values else "-"
+
+        line = f"  {version:<4} duration {p('duration_s', 50)}s / {p('duration_s', 95)}s"
+        if STREAM_RESPONSES:
+            line += (f" | TTFT {p('ttft_s', 50)}s / {p('ttft_s', 95)}s"
+                     f" | tokens/s {p('tokens_per_s', 50)} / {p('tokens_per_s', 95)}")
+        print(line)
+
+
+def print_prefix_cache_report(results: dict, system_prompts: dict):
+    """
+    Per version: how many requests hit the prompt-prefix cache, the share of
+    prompt tokens served from it, p50 latency of cached vs uncached requests,
+    and the estimated prompt-token cost saved.
+    """
+    print(f"\n{'='*60}")
+    print("Prompt-prefix cache by version")
+    print(f"{'='*60}")
+    for version, rows in results.items():
+        if not rows:
+            continue
+        hits = [row for row in rows if row["cached_tokens"]]
+        misses = [row for row in rows if not row["cached_tokens"]]
+        prompt_tokens = sum(row["prompt_tokens"] for row in rows)
+        cached_tokens = sum(row["cached_tokens"] for row in rows)
+        token_share = cached_tokens / prompt_tokens if prompt_tokens else 0.0
+
+        def p50(group, key="duration_s"):
+            values = [row[key] for row in group if row.get(key) is not None]
+            return f"{percentile(values, 50):.2f}s" if values else "-"
+
+        line = (f"  {version:<4} hits {len(hits)}/{len(rows)} ({len(hits) / len(rows):.0%}) | "
+                f"cached tokens {cached_tokens}/{prompt_tokens} ({token_share:.0%}) | "
+                f"p50 cached {p50(hits)} vs uncached {p50(misses)}")
+        if STREAM_RESPONSES:
+            line += f" | TTFT cached {p50(hits, 'ttft_s')} vs uncached {p50(misses, 'ttft_s')}"
+        print(line)
+        print(f"       ~{token_share * CACHED_TOKEN_DISCOUNT:.0%} of prompt-token cost saved "
+              f"(cached tokens at {CACHED_TOKEN_DISCOUNT:.0%} off)")
+
+        system_tokens = count_tokens(system_prompts[version], model_name)
+        if system_tokens < PREFIX_CACHE_MIN_TOKENS:
+            print(f"       note: system prompt is ~{system_tokens} tokens; prompts under "
+                  f"{PREFIX_CACHE_MIN_TOKENS} tokens are not cached")
+
+
+def estimate_matrix(system_prompts: dict, test_prompts: dict):
+    """Pre-flight token and time estimate for every (version, test) completion."""
+    requests = [
+        [{"role": "system", "content": system_prompt}, {"role": "user", "content": prompt_text}]
+        for system_prompt in system_prompts.values()
+        for prompt_text in test_prompts.values()
+    ]
+    return estimate_batch(requests, model_name, COMPLETION_TOKENS_ESTIMATE, TPM_QUOTA)
+
+
+def run_version(version: str, system_prompt: str, test_prompts: dict):
+    """Run all test prompts for a single prompt version, wrapped in a trace span."""
+    run_matrix({version: system_prompt}, test_prompts)
 
 
 if __name__ == "__main__":
@@ -128,17 +507,21 @@ if __name__ == "__main__":
     print(f"Loaded {len(test_prompts)} test prompts")
     print(f"Running versions: {', '.join(VERSIONS)}")
 
-    for version in VERSIONS:
-        system_prompt = load_prompt(version)
-        run_version(version, system_prompt, test_prompts)
+    system_prompts = {version: load_prompt(version) for version in VERSIONS}
+    print(format_estimate(estimate_matrix(system_prompts, test_prompts)))
+
+    run_matrix(system_prompts, test_prompts)
 
     print(f"\n{'='*60}")
     print("All versions complete.")
     print("Open Azure AI Foundry > Tracing to compare spans across versions.")
     print(f"{'='*60}")
 
-    # Force flush all telemetry before exit
+    # Force flush all telemetry (spans and metrics) before exit
     provider = trace.get_tracer_provider()
     if hasattr(provider, "force_flush"):
         provider.force_flush()
-        print("Telemetry flushed.")
+    meter_provider = metrics.get_meter_provider()
+    if hasattr(meter_provider, "force_flush"):
+        meter_provider.force_flush()
+    print("Telemetry flushed.")
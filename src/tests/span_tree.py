@@ -0,0 +1,250 @@
+"""Build and print the span tree for the rows returned by check_traces.py's query.
+
+Kept free of Azure imports so it can be reused (and benchmarked) offline.
+read_span_file() turns a local JSONL trace file (TELEMETRY_TRACE_FILE, see
+telemetry_config.py) into the same rows, so trees can be built without Azure.
+summarize_rows() computes check_traces.py --summary's table from such rows.
+"""
+
+import json
+
+from latency_stats import percentile
+
+# Column order of the rows produced by check_traces.py's KQL query
+SPAN_COLUMNS = (
+    "Id", "ParentId", "OperationId", "Name", "DurationMs", "Success",
+    "PromptVersion", "TestName", "TotalTokens", "PromptTokens", "CompletionTokens",
+)
+
+# Column order of the rows produced by check_traces.py's summary (summarize) query
+SUMMARY_COLUMNS = (
+    "PromptVersion", "TestName", "Spans", "SuccessRate", "P50Ms", "P95Ms", "P99Ms",
+    "PromptTokens", "CompletionTokens", "TotalTokens",
+)
+
+
+def span_record_to_row(record):
+    """One JSONL span record as a row in SPAN_COLUMNS order (missing values as "", like KQL tostring)."""
+    attributes = record.get("attributes", {})
+
+    def text(key):
+        value = attributes.get(key)
+        return "" if value is None else str(value)
+
+    return (
+        record["span_id"],
+        record.get("parent_span_id") or "",
+        record["trace_id"],
+        record["name"],
+        record["duration_ms"],
+        record.get("status") != "ERROR",
+        text("prompt.version"),
+        text("test.name"),
+        text("response.total_tokens"),
+        text("response.prompt_tokens"),
+        text("response.completion_tokens"),
+    )
+
+
+def read_span_file(path, run_id=None):
+    """
+    Read a JSONL trace file and return (rows, run_id).
+
+    Only the spans of one run are returned: run_id, or the last run written to
+    the file when run_id is None. Use run_id="all" to return every span.
+    """
+    with open(path, "r", encoding="utf-8") as f:
+        records = [json.loads(line) for line in f if line.strip()]
+    if run_id is None and records:
+        run_id = records[-1].get("run_id")
+    if run_id != "all":
+        records = [r for r in records if r.get("run_id") == run_id]
+    return [span_record_to_row(r) for r in records], run_id
+
+
+def span_from_row(row):
+    """One query row as the span dict used by the tree functions."""
+    span_id, parent_id, op_id, name, dur, ok, version, test_name, total, prompt, compl = row
+    return {
+        "id": span_id,
+        "parent": parent_id,
+        "op": op_id,
+        "name": name,
+        "dur": dur,
+        "ok": ok,
+        "version": version or "",
+        "test": test_name or "",
+        "total": total or "",
+        "prompt": prompt or "",
+        "compl": compl or "",
+    }
+
+
+def merge_spans(spans, children, rows, by_op=None):
+    """
+    Add rows to an existing (spans, children) pair in place.
+
+    A span that is already present is replaced. Only the child lists that
+    gained a span are re-sorted by name. by_op, when given, maps operation
+    ID → [span_id] and is kept up to date too. Returns the set of operation
+    IDs the rows belong to.
+    """
+    touched = set()
+    changed_ops = set()
+    for row in rows:
+        span = span_from_row(row)
+        span_id, parent_id = span["id"], span["parent"]
+        old = spans.get(span_id)
+        spans[span_id] = span
+        if old is None:
+            children.setdefault(parent_id, []).append(span_id)
+            if by_op is not None:
+                by_op.setdefault(span["op"], []).append(span_id)
+        elif old["parent"] != parent_id:
+            children[old["parent"]].remove(span_id)
+            children.setdefault(parent_id, []).append(span_id)
+        touched.add(parent_id)
+        changed_ops.add(span["op"])
+
+    for parent_id in touched:
+        children[parent_id].sort(key=lambda k: spans[k]["name"])
+    return changed_ops
+
+
+def root_ids(spans, span_ids):
+    """The span_ids whose ParentId is not among the known spans."""
+    return [span_id for span_id in span_ids if spans[span_id]["parent"] not in spans]
+
+
+def build_span_tree(rows):
+    """
+    Turn query rows into (spans, children, roots) in O(n).
+
+    spans maps span_id → span dict, children maps parent_id → [child span_id]
+    sorted by span name, and roots maps operation ID → [root span_id] for the
+    spans whose ParentId is not among the returned spans. Operations are in
+    sorted order so versions appear in order.
+    """
+    spans = {}
+    children = {}
+    by_op = {}
+    merge_spans(spans, children, rows, by_op)
+
+    roots = {}
+    for op_id in sorted(by_op):
+        op_roots = root_ids(spans, by_op[op_id])
+        if op_roots:
+            roots[op_id] = op_roots
+    return spans, children, roots
+
+
+def format_span(span):
+    """Span name plus its inline annotation (duration, and tokens for test spans)."""
+    if span["total"]:
+        return (
+            f"{span['name']}  [{span['dur']}ms | "
+            f"tokens: {span['total']} (↑{span['prompt']} ↓{span['compl']})]"
+        )
+    if span["dur"]:
+        return f"{span['name']}  [{span['dur']}ms]"
+    return span["name"]
+
+
+def iter_span_lines(spans, children, span_id, is_last=True, max_depth=None, max_children=None):
+    """
+    Yield the ASCII tree lines for a span and its descendants, depth first.
+
+    Uses an explicit stack, so trace depth is not limited by Python's
+    recursion limit. The span itself is depth 1; below max_depth, and past
+    max_children children of one span, a single summary line stands in for
+    the hidden spans.
+    """
+    # Entries are (span_id, prefix, is_last, depth); span_id None is a ready-made summary line
+    stack = [(span_id, "", is_last, 1)]
+    while stack:
+        span_id, prefix, last, depth = stack.pop()
+        if span_id is None:
+            yield prefix
+            continue
+
+        yield f"{prefix}{'└── ' if last else '├── '}{format_span(spans[span_id])}"
+
+        kids = children.get(span_id)
+        if not kids:
+            continue
+        child_prefix = prefix + ("    " if last else "│   ")
+        if max_depth is not None and depth >= max_depth:
+            yield f"{child_prefix}└── … {len(kids)} child span(s) below depth {max_depth}"
+            continue
+
+        shown = kids if max_children is None else kids[:max_children]
+        hidden = len(kids) - len(shown)
+        # Pushed in reverse, so the first child is popped (printed) first
+        if hidden:
+            stack.append((None, f"{child_prefix}└── … {hidden} more child span(s)", True, depth))
+        for i in range(len(shown) - 1, -1, -1):
+            stack.append((shown[i], child_prefix, i == len(shown) - 1 and not hidden, depth + 1))
+
+
+def iter_tree_lines(spans, children, roots, max_depth=None, max_children=None):
+    """Yield the lines of one tree per trace (operation), followed by a blank line each."""
+    for op_id, op_roots in roots.items():
+        yield f"Trace: {op_id}"
+        for i, root_id in enumerate(op_roots):
+            yield from iter_span_lines(
+                spans, children, root_id, is_last=(i == len(op_roots) - 1),
+                max_depth=max_depth, max_children=max_children,
+            )
+        yield ""
+
+
+def print_trees(spans, children, roots, file=None, max_depth=None, max_children=None):
+    """Print one tree per trace (operation), line by line as it is rendered."""
+    for line in iter_tree_lines(spans, children, roots, max_depth, max_children):
+        print(line, file=file)
+
+
+def summarize_rows(rows):
+    """
+    Aggregate span rows into SUMMARY_COLUMNS rows, one per (prompt version, test).
+
+    The client-side equivalent of check_traces.py's summary query, for rows
+    read from a trace file. Only test spans (those with a test name) count.
+    """
+    groups = {}
+    for row in rows:
+        _, _, _, _, dur, ok, version, test_name, total, prompt, compl = row
+        if not test_name:
+            continue
+        group = groups.setdefault((version or "", test_name), {
+            "durations": [], "ok": 0, "prompt": 0, "compl": 0, "total": 0,
+        })
+        group["durations"].append(float(dur))
+        group["ok"] += bool(ok)
+        group["prompt"] += int(prompt or 0)
+        group["compl"] += int(compl or 0)
+        group["total"] += int(total or 0)
+
+    summary = []
+    for (version, test_name), group in sorted(groups.items()):
+        durations = group["durations"]
+        summary.append((
+            version, test_name, len(durations), round(100 * group["ok"] / len(durations), 1),
+            percentile(durations, 50), percentile(durations, 95), percentile(durations, 99),
+            group["prompt"], group["compl"], group["total"],
+        ))
+    return summary
+
+
+def print_summary(summary, file=None):
+    """Print SUMMARY_COLUMNS rows as a compact table."""
+    header = (f"{'Version':<8} {'Test':<28} {'Spans':>6} {'OK %':>6} "
+              f"{'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'Prompt':>9} {'Compl':>9} {'Total':>10}")
+    print(header, file=file)
+    print("-" * len(header), file=file)
+    for version, test_name, count, ok_pct, p50, p95, p99, prompt, compl, total in summary:
+        print(
+            f"{version or '-':<8} {test_name[:28]:<28} {count:>6} {ok_pct:>6.1f} "
+            f"{p50:>8.0f} {p95:>8.0f} {p99:>8.0f} {prompt or 0:>9,} {compl or 0:>9,} {total or 0:>10,}",
+            file=file,
+        )
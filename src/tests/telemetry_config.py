@@ -0,0 +1,497 @@
+"""
+Telemetry configuration shared by the monitoring scripts.
+
+configure_telemetry() replaces the bare configure_azure_monitor() call. It
+keeps Azure Monitor for metrics and logs, but builds the trace pipeline
+itself so that it can be tuned for production volume. The pieces the Azure
+Monitor distro would have added to its own trace pipeline are added back:
+the live metrics and performance counter span processors, and Azure SDK
+(azure-core) spans.
+
+- Head sampling: keep a fixed ratio of traces, decided from the trace ID when
+  the root span starts (ApplicationInsightsSampler, so Application Insights
+  scales the counts back up)
+- Batching: batch size, export interval and queue size of the span processor
+- Tail sampling: buffer each trace until its root span ends, then always keep
+  errored traces (error status or profile.success == False) and traces with a
+  slow request span, and only a small share of the healthy ones (with their
+  sample rate scaled to match)
+- Message content capture: OTEL_INSTRUMENTATION_GENAI_CAPTURE_MESSAGE_CONTENT
+  exports every prompt and response in full, so it can be switched off
+- Overhead report: spans sampled and exported, time spent in the exporter,
+  and the estimated ingestion volume and cost
+- Local trace file: TELEMETRY_TRACE_FILE also writes every exported span to a
+  JSONL file, which check_traces.py --file reads back without Azure
+
+Every setting is read from the environment (TELEMETRY_*, see below), so the
+scripts do not need changing between a lab run and a production-sized one.
+"""
+
+import atexit
+import json
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from datetime import datetime, timezone
+from pathlib import Path
+
+from opentelemetry import trace
+from opentelemetry.sdk.resources import Resource
+from opentelemetry.sdk.trace import (
+    ReadableSpan,
+    SpanProcessor,
+    SynchronousMultiSpanProcessor,
+    TracerProvider,
+)
+from opentelemetry.sdk.trace.export import BatchSpanProcessor, SpanExporter, SpanExportResult
+from opentelemetry.sdk.trace.sampling import Sampler
+from opentelemetry.trace import StatusCode
+
+
+def _env_flag(name, default):
+    return os.getenv(name, default).lower() in ("1", "true", "yes")
+
+
+# Head sampling: share of traces recorded at all (1.0 = every trace)
+SAMPLING_RATIO = float(os.getenv("TELEMETRY_SAMPLING_RATIO", "1.0"))
+
+# Batch span processor: spans per export call, max wait between exports, and
+# how many ended spans may queue up before new ones are dropped
+BATCH_SIZE = int(os.getenv("TELEMETRY_BATCH_SIZE", "512"))
+EXPORT_INTERVAL_MS = int(os.getenv("TELEMETRY_EXPORT_INTERVAL_MS", "5000"))
+QUEUE_SIZE = int(os.getenv("TELEMETRY_QUEUE_SIZE", "2048"))
+
+# Tail sampling: errored traces and traces with a span (other than the root)
+# slower than SLOW_TRACE_MS are always exported; of the remaining healthy
+# traces only TAIL_KEEP_RATIO is kept
+TAIL_SAMPLING = _env_flag("TELEMETRY_TAIL_SAMPLING", "false")
+TAIL_KEEP_RATIO = float(os.getenv("TELEMETRY_TAIL_KEEP_RATIO", "0.1"))
+SLOW_TRACE_MS = float(os.getenv("TELEMETRY_SLOW_TRACE_MS", "10000"))
+# Traces held in memory while waiting for their root span; the oldest is
+# decided early when the limit is reached
+TAIL_MAX_TRACES = int(os.getenv("TELEMETRY_TAIL_MAX_TRACES", "1000"))
+
+# Span attribute holding the sampling percentage (set by ApplicationInsightsSampler);
+# Application Insights multiplies counts by 100 / this value
+SAMPLE_RATE_ATTRIBUTE = "_MS.sampleRate"
+
+# Record full prompts and responses on the gen_ai spans (the labs rely on it)
+CAPTURE_CONTENT = _env_flag("TELEMETRY_CAPTURE_CONTENT", "true")
+
+# Optional JSONL file that receives every exported span (see JsonlSpanExporter)
+TRACE_FILE = os.getenv("TELEMETRY_TRACE_FILE")
+
+# Application Insights pay-as-you-go ingestion price, used for the cost estimate
+INGESTION_COST_PER_GB = float(os.getenv("TELEMETRY_COST_PER_GB", "2.30"))
+
+# Print the overhead report when the script exits
+REPORT = _env_flag("TELEMETRY_REPORT", "true")
+
+
+def is_error_span(span) -> bool:
+    """True for spans that mark their trace as failed."""
+    return (
+        span.status.status_code == StatusCode.ERROR
+        or (span.attributes or {}).get("profile.success") is False
+    )
+
+
+class _CountingSampler(Sampler):
+    """Delegates to another sampler and counts its decisions for root spans (one per trace)."""
+
+    def __init__(self, sampler):
+        self._sampler = sampler
+        self._lock = threading.Lock()
+        self.sampled = 0
+        self.dropped = 0
+
+    def should_sample(self, parent_context, trace_id, name, kind=None, attributes=None,
+                      links=None, trace_state=None):
+        result = self._sampler.should_sample(
+            parent_context, trace_id, name, kind, attributes, links, trace_state
+        )
+        if trace.get_current_span(parent_context).get_span_context().is_valid:
+            return result
+        with self._lock:
+            if result.decision.is_sampled():
+                self.sampled += 1
+            else:
+                self.dropped += 1
+        return result
+
+    def get_description(self):
+        return self._sampler.get_description()
+
+
+class TailSamplingSpanProcessor(SpanProcessor):
+    """
+    Buffer each trace's spans until its local root ends, then keep or drop the whole trace.
+
+    Kept traces are handed to the wrapped processor (normally a
+    BatchSpanProcessor). Errored and slow traces are always kept; healthy ones
+    are kept when their trace ID falls within keep_ratio, so the choice is
+    stable for a given trace. The spans of those healthy traces get their
+    _MS.sampleRate scaled by keep_ratio, so Application Insights counts them
+    back up as it does for head sampling; errored and slow traces are all
+    kept and keep the head rate.
+
+    Slowness is judged on the spans below the local root (the request and
+    test spans), because the root usually wraps a whole batch or session
+    and would make every trace look slow; a trace that is only a root span
+    is judged on the root. The decision is per trace, though: in
+    run_monitoring.py one trace is a whole version batch, so a single slow
+    or failed request keeps every span of that batch.
+    """
+
+    def __init__(self, processor, keep_ratio=TAIL_KEEP_RATIO, slow_ms=SLOW_TRACE_MS,
+                 max_traces=TAIL_MAX_TRACES):
+        self._processor = processor
+        self._keep_ratio = keep_ratio
+        self._slow_ns = slow_ms * 1e6
+        self._max_traces = max_traces
+        self._traces = OrderedDict()
+        self._lock = threading.Lock()
+        self.kept = {"error": 0, "slow": 0, "sampled": 0}
+        self.dropped = 0
+        self.spans_dropped = 0
+
+    def on_start(self, span, parent_context=None):
+        self._processor.on_start(span, parent_context=parent_context)
+
+    def on_end(self, span):
+        trace_id = span.context.trace_id
+        is_local_root = self._is_local_root(span)
+        with self._lock:
+            spans = self._traces.setdefault(trace_id, [])
+            spans.append(span)
+            if is_local_root:
+                ready = [self._traces.pop(trace_id)]
+            elif len(self._traces) > self._max_traces:
+                ready = [self._traces.popitem(last=False)[1]]
+            else:
+                ready = []
+        for trace_spans in ready:
+            self._decide(trace_spans)
+
+    @staticmethod
+    def _is_local_root(span):
+        return span.parent is None or span.parent.is_remote
+
+    def _decide(self, spans):
+        timed = [s for s in spans if not self._is_local_root(s)] or spans
+        if any(is_error_span(s) for s in spans):
+            reason = "error"
+        elif max(s.end_time - s.start_time for s in timed) >= self._slow_ns:
+            reason = "slow"
+        elif (spans[0].context.trace_id & 0xFFFFFFFFFFFF) / 0x1000000000000 < self._keep_ratio:
+            reason = "sampled"
+        else:
+            with self._lock:
+                self.dropped += 1
+                self.spans_dropped += len(spans)
+            return
+        with self._lock:
+            self.kept[reason] += 1
+        if reason == "sampled":
+            spans = [self._scale_sample_rate(span) for span in spans]
+        for span in spans:
+            self._processor.on_end(span)
+
+    def _scale_sample_rate(self, span):
+        """A copy of an ended span whose sampling percentage includes keep_ratio."""
+        attributes = dict(span.attributes or {})
+        attributes[SAMPLE_RATE_ATTRIBUTE] = attributes.get(SAMPLE_RATE_ATTRIBUTE, 100.0) * self._keep_ratio
+        return ReadableSpan(
+            name=span.name,
+            context=span.context,
+            parent=span.parent,
+            resource=span.resource,
+            attributes=attributes,
+            events=span.events,
+            links=span.links,
+            kind=span.kind,
+            status=span.status,
+            start_time=span.start_time,
+            end_time=span.end_time,
+            instrumentation_scope=span.instrumentation_scope,
+        )
+
+    def _drain(self):
+        """Decide every trace still waiting for its root span."""
+        with self._lock:
+            pending = list(self._traces.values())
+            self._traces.clear()
+        for trace_spans in pending:
+            self._decide(trace_spans)
+
+    def force_flush(self, timeout_millis=30000):
+        self._drain()
+        return self._processor.force_flush(timeout_millis)
+
+    def shutdown(self):
+        self._drain()
+        self._processor.shutdown()
+
+
+class MeteredSpanExporter(SpanExporter):
+    """Wraps an exporter and records how many spans, batches, bytes and seconds it costs."""
+
+    def __init__(self, exporter):
+        self._exporter = exporter
+        self._lock = threading.Lock()
+        self.batches = 0
+        self.spans = 0
+        self.failed_spans = 0
+        self.payload_bytes = 0
+        self.export_seconds = 0.0
+
+    def export(self, spans):
+        # Serialized span size is a proxy for the ingested volume
+        size = sum(len(span.to_json(indent=None)) for span in spans)
+        start = time.perf_counter()
+        result = self._exporter.export(spans)
+        elapsed = time.perf_counter() - start
+        with self._lock:
+            self.batches += 1
+            self.export_seconds += elapsed
+            if result == SpanExportResult.SUCCESS:
+                self.spans += len(spans)
+                self.payload_bytes += size
+            else:
+                self.failed_spans += len(spans)
+        return result
+
+    def force_flush(self, timeout_millis=30000):
+        return self._exporter.force_flush(timeout_millis)
+
+    def shutdown(self):
+        self._exporter.shutdown()
+
+
+class JsonlSpanExporter(SpanExporter):
+    """
+    Append each span to a JSONL file, one JSON object per line.
+
+    Every record carries the run_id of the process that wrote it, so one file
+    can collect many runs and check_traces.py can pick out the latest.
+    """
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.run_id = uuid.uuid4().hex
+        self._lock = threading.Lock()
+
+    def _record(self, span):
+        parent = span.parent
+        return {
+            "run_id": self.run_id,
+            "trace_id": f"{span.context.trace_id:032x}",
+            "span_id": f"{span.context.span_id:016x}",
+            "parent_span_id": f"{parent.span_id:016x}" if parent else None,
+            "name": span.name,
+            "kind": span.kind.name,
+            "start_time": datetime.fromtimestamp(span.start_time / 1e9, timezone.utc).isoformat(),
+            "duration_ms": round((span.end_time - span.start_time) / 1e6, 3),
+            "status": span.status.status_code.name,
+            "attributes": dict(span.attributes or {}),
+        }
+
+    def export(self, spans):
+        lines = "".join(json.dumps(self._record(span), default=str) + "\n" for span in spans)
+        try:
+            with self._lock, open(self.path, "a", encoding="utf-8") as f:
+                f.write(lines)
+        except OSError:
+            return SpanExportResult.FAILURE
+        return SpanExportResult.SUCCESS
+
+    def shutdown(self):
+        pass
+
+
+class TelemetryPipeline:
+    """Handles to the configured trace pipeline, for flushing and reporting."""
+
+    def __init__(self, provider, sampler, tail_sampler, exporters):
+        self.provider = provider
+        self.sampler = sampler
+        self.tail_sampler = tail_sampler
+        self.exporters = exporters
+
+    def force_flush(self):
+        self.provider.force_flush()
+
+    def report(self) -> dict:
+        """Sampling decisions, exporter overhead and estimated ingestion cost so far."""
+        azure = self.exporters.get("azure_monitor")
+        exported_bytes = azure.payload_bytes if azure else 0
+        stats = {
+            "head_sampling": {
+                "ratio": SAMPLING_RATIO,
+                "traces_sampled": self.sampler.sampled,
+                "traces_dropped": self.sampler.dropped,
+            },
+            "exporters": {
+                name: {
+                    "batches": exporter.batches,
+                    "spans": exporter.spans,
+                    "failed_spans": exporter.failed_spans,
+                    "bytes": exporter.payload_bytes,
+                    "export_seconds": round(exporter.export_seconds, 3),
+                    "ms_per_span": round(exporter.export_seconds * 1000 / exporter.spans, 3)
+                    if exporter.spans else None,
+                }
+                for name, exporter in self.exporters.items()
+            },
+            "ingestion": {
+                "bytes": exported_bytes,
+                "estimated_cost": round(exported_bytes / 1e9 * INGESTION_COST_PER_GB, 6),
+                "cost_per_gb": INGESTION_COST_PER_GB,
+            },
+        }
+        if self.tail_sampler:
+            stats["tail_sampling"] = {
+                "keep_ratio": TAIL_KEEP_RATIO,
+                "slow_trace_ms": SLOW_TRACE_MS,
+                "traces_kept": dict(self.tail_sampler.kept),
+                "traces_dropped": self.tail_sampler.dropped,
+                "spans_dropped": self.tail_sampler.spans_dropped,
+            }
+        return stats
+
+    def print_report(self):
+        """Flush pending spans, then print report() in the scripts' plain-text style."""
+        self.force_flush()
+        stats = self.report()
+        head = stats["head_sampling"]
+        print("\nTelemetry overhead:")
+        print(f"  Head sampling : ratio {head['ratio']} "
+              f"({head['traces_sampled']} traces sampled, {head['traces_dropped']} dropped)")
+        if "tail_sampling" in stats:
+            tail = stats["tail_sampling"]
+            kept = tail["traces_kept"]
+            print(f"  Tail sampling : kept {kept['error']} errored, {kept['slow']} slow, "
+                  f"{kept['sampled']} healthy; dropped {tail['traces_dropped']} traces "
+                  f"({tail['spans_dropped']} spans)")
+        for name, exporter in stats["exporters"].items():
+            per_span = f", {exporter['ms_per_span']}ms/span" if exporter["ms_per_span"] is not None else ""
+            failed = f", {exporter['failed_spans']} failed" if exporter["failed_spans"] else ""
+            print(f"  Exporter {name}: {exporter['spans']} spans in {exporter['batches']} batches, "
+                  f"{exporter['export_seconds']}s exporting{per_span}{failed}")
+        ingestion = stats["ingestion"]
+        if "azure_monitor" in stats["exporters"]:
+            print(f"  Ingestion     : ~{ingestion['bytes'] / 1024:.1f} KB, "
+                  f"~${ingestion['estimated_cost']:.6f} at ${ingestion['cost_per_gb']}/GB")
+
+
+def _add_azure_monitor_span_processors(provider):
+    """
+    The live metrics and performance counter span processors the distro adds
+    to its own trace pipeline. They see every head-sampled span, including
+    traces that tail sampling drops, so request rates stay complete.
+
+    Both come from private modules of azure-monitor-opentelemetry-exporter,
+    which is not pinned; if an exporter release moves them, a warning is
+    printed and tracing goes on without these two processors.
+    """
+    try:
+        from azure.monitor.opentelemetry.exporter._performance_counters._processor import (
+            _PerformanceCountersSpanProcessor,
+        )
+        from azure.monitor.opentelemetry.exporter._quickpulse._processor import _QuickpulseSpanProcessor
+    except ImportError as e:
+        print(f"Warning: live metrics and performance counter span processors unavailable ({e})")
+        return
+    provider.add_span_processor(_QuickpulseSpanProcessor())
+    provider.add_span_processor(_PerformanceCountersSpanProcessor())
+
+
+def _enable_azure_sdk_tracing():
+    """Route azure-core (Azure SDK client) spans to OpenTelemetry, as the distro does."""
+    disabled = [name.strip() for name in os.getenv("OTEL_PYTHON_DISABLED_INSTRUMENTATIONS", "").split(",")]
+    if "azure_sdk" in disabled:
+        return
+    try:
+        from azure.core.settings import settings
+        from azure.core.tracing.ext.opentelemetry_span import OpenTelemetrySpan
+    except ImportError:
+        return
+    settings.tracing_implementation = OpenTelemetrySpan
+
+
+def configure_telemetry(connection_string=None, exporters=None, capture_content=CAPTURE_CONTENT,
+                        sampling_ratio=SAMPLING_RATIO, tail_sampling=TAIL_SAMPLING, report=REPORT,
+                        trace_file=TRACE_FILE):
+    """
+    Set up metrics/logs (Azure Monitor) and a tuned trace pipeline.
+
+    Args:
+        connection_string: Application Insights connection string; None skips
+            Azure Monitor entirely (e.g. local runs)
+        exporters: Extra span exporters by name, exported with the same
+            sampling and batching settings
+        capture_content: Record prompts and responses on gen_ai spans
+        sampling_ratio: Head sampling ratio (0.0-1.0)
+        tail_sampling: Buffer traces and keep only errored, slow and a share of healthy ones
+        report: Print the overhead report when the process exits
+        trace_file: Also write exported spans to this JSONL file
+
+    Call this before OpenAIInstrumentor().instrument(), so the content capture
+    setting is in place when the instrumentation reads it.
+    """
+    os.environ["OTEL_INSTRUMENTATION_GENAI_CAPTURE_MESSAGE_CONTENT"] = str(capture_content).lower()
+
+    all_exporters = dict(exporters or {})
+    if trace_file:
+        all_exporters["file"] = JsonlSpanExporter(trace_file)
+    if connection_string:
+        from azure.monitor.opentelemetry import configure_azure_monitor
+        from azure.monitor.opentelemetry.exporter import AzureMonitorTraceExporter
+
+        # Metrics, logs and live metrics as before; tracing is set up below. The
+        # distro only honours OTEL_TRACES_EXPORTER=none for skipping its own
+        # trace pipeline, whose exporter could be neither batched as configured
+        # here nor tail sampled.
+        os.environ["OTEL_TRACES_EXPORTER"] = "none"
+        configure_azure_monitor(connection_string=connection_string)
+        all_exporters["azure_monitor"] = AzureMonitorTraceExporter(connection_string=connection_string)
+
+    from azure.monitor.opentelemetry.exporter import ApplicationInsightsSampler
+
+    sampler = _CountingSampler(ApplicationInsightsSampler(sampling_ratio=sampling_ratio))
+    provider = TracerProvider(sampler=sampler, resource=Resource.create())
+
+    metered = {name: MeteredSpanExporter(exporter) for name, exporter in all_exporters.items()}
+    batch_processors = [
+        BatchSpanProcessor(
+            exporter,
+            max_queue_size=QUEUE_SIZE,
+            schedule_delay_millis=EXPORT_INTERVAL_MS,
+            max_export_batch_size=BATCH_SIZE,
+        )
+        for exporter in metered.values()
+    ]
+    tail_sampler = None
+    if tail_sampling and batch_processors:
+        # One tail sampler in front of all exporters, so they all keep the same traces
+        fan_out = SynchronousMultiSpanProcessor()
+        for processor in batch_processors:
+            fan_out.add_span_processor(processor)
+        tail_sampler = TailSamplingSpanProcessor(fan_out)
+        provider.add_span_processor(tail_sampler)
+    else:
+        for processor in batch_processors:
+            provider.add_span_processor(processor)
+    if connection_string:
+        _add_azure_monitor_span_processors(provider)
+
+    trace.set_tracer_provider(provider)
+    _enable_azure_sdk_tracing()
+
+    pipeline = TelemetryPipeline(provider, sampler, tail_sampler, metered)
+    if report and metered:
+        atexit.register(pipeline.print_report)
+    return pipeline
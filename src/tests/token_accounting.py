@@ -0,0 +1,128 @@
+"""
+Token accounting with a real BPE tokenizer (tiktoken).
+
+Counts tokens the way the model does, and estimates a whole batch before it
+is sent: prompt tokens, projected completion tokens, and how long the batch
+takes at least under a deployment's tokens-per-minute (TPM) quota.
+
+Encodings are loaded once per model and cached. Model or deployment names
+tiktoken does not know (e.g. a custom deployment name) fall back to
+o200k_base, the encoding of the GPT-4o / GPT-4.1 family.
+
+tiktoken downloads an encoding's BPE file on first use (then caches it; see
+TIKTOKEN_CACHE_DIR). If that fails, e.g. on an offline machine, counts fall
+back to a rough 4-characters-per-token estimate and a warning is printed.
+"""
+
+from functools import lru_cache
+
+import tiktoken
+
+FALLBACK_ENCODING = "o200k_base"
+
+# Chat format overhead: every message is wrapped in a few special tokens, and
+# the reply is primed with a few more
+TOKENS_PER_MESSAGE = 3
+TOKENS_PER_REPLY = 3
+
+# Azure OpenAI grants 6 requests per minute for every 1,000 TPM of quota
+RPM_PER_1000_TPM = 6
+
+
+class _CharacterEstimate:
+    """Stand-in encoding used when no BPE file can be loaded: ~4 characters per token."""
+
+    name = "approximate (4 chars/token)"
+
+    def encode(self, text, disallowed_special=()):
+        return range((len(text) + 3) // 4)
+
+
+@lru_cache(maxsize=None)
+def encoding_for_model(model: str):
+    """tiktoken encoding for a model or deployment name (cached per name)."""
+    try:
+        try:
+            return tiktoken.encoding_for_model(model)
+        except KeyError:
+            return tiktoken.get_encoding(FALLBACK_ENCODING)
+    except Exception as e:
+        print(f"Warning: could not load a tokenizer for '{model}' ({type(e).__name__}); "
+              f"token counts are approximate")
+        return _CharacterEstimate()
+
+
+def count_tokens(text: str, model: str) -> int:
+    """Number of tokens in text for the given model."""
+    return len(encoding_for_model(model).encode(text or "", disallowed_special=()))
+
+
+def count_message_tokens(messages, model: str) -> int:
+    """Prompt tokens of a chat request: message contents plus chat format overhead."""
+    encoding = encoding_for_model(model)
+    total = TOKENS_PER_REPLY
+    for message in messages:
+        total += TOKENS_PER_MESSAGE
+        for value in message.values():
+            if isinstance(value, str):
+                total += len(encoding.encode(value, disallowed_special=()))
+    return total
+
+
+def estimate_batch(requests, model: str, completion_tokens_per_request: int, tpm_quota=None):
+    """
+    Pre-flight estimate for a batch of chat requests.
+
+    Args:
+        requests: Iterable of message lists (one per request)
+        model: Model or deployment name used to pick the encoding
+        completion_tokens_per_request: Projected output tokens per request
+        tpm_quota: Tokens-per-minute quota of the deployment (optional)
+
+    Returns a dict with request and token totals and, when tpm_quota is set,
+    the minimum minutes the batch needs under the TPM and derived RPM limits.
+    """
+    # Running sums, so requests can be a generator over a large dataset
+    request_count = prompt_tokens = max_prompt_tokens = 0
+    for messages in requests:
+        tokens = count_message_tokens(messages, model)
+        request_count += 1
+        prompt_tokens += tokens
+        max_prompt_tokens = max(max_prompt_tokens, tokens)
+    completion_tokens = completion_tokens_per_request * request_count
+    estimate = {
+        "model": model,
+        "encoding": encoding_for_model(model).name,
+        "requests": request_count,
+        "prompt_tokens": prompt_tokens,
+        "max_prompt_tokens": max_prompt_tokens,
+        "projected_completion_tokens": completion_tokens,
+        "projected_total_tokens": prompt_tokens + completion_tokens,
+        "tpm_quota": tpm_quota,
+        "projected_minutes": None,
+    }
+    if tpm_quota:
+        rpm_quota = tpm_quota / 1000 * RPM_PER_1000_TPM
+        estimate["projected_minutes"] = round(max(
+            estimate["projected_total_tokens"] / tpm_quota,
+            request_count / rpm_quota if rpm_quota else 0,
+        ), 2)
+    return estimate
+
+
+def format_estimate(estimate) -> str:
+    """One-paragraph, human-readable version of an estimate_batch() result."""
+    lines = [
+        f"Pre-flight estimate ({estimate['model']}, {estimate['encoding']}):",
+        f"  Requests            : {estimate['requests']}",
+        f"  Prompt tokens       : {estimate['prompt_tokens']:,} "
+        f"(largest request {estimate['max_prompt_tokens']:,})",
+        f"  Completion tokens   : ~{estimate['projected_completion_tokens']:,} (projected)",
+        f"  Total tokens        : ~{estimate['projected_total_tokens']:,}",
+    ]
+    if estimate["projected_minutes"] is not None:
+        lines.append(
+            f"  Time under quota    : at least {estimate['projected_minutes']:.1f} min "
+            f"({estimate['tpm_quota']:,} TPM)"
+        )
+    return "\n".join(lines)